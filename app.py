@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, stream_with_context, Response, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, session, flash, stream_with_context, Response, jsonify, send_from_directory, send_file, abort
 import os
 import json
 import sys
@@ -26,15 +26,18 @@ import traceback
 from utils.download_album import download_and_extract_album
 from utils.auth import login_required # type: ignore
 from utils.slideshow_manager import is_slideshow_running, start_slideshow, stop_slideshow, restart_slideshow_process, restart_slideshow_for_update
-from utils.config_manager import load_config, save_config
+from utils.slideshow_channel import send_command, subscribe_events
+from utils.config_manager import load_config, save_config, get_config, wait_for_config_change, config_store
 from utils.playlist_manager import load_playlists, save_playlists
 from utils.auth_manager import change_password
 from utils.network_manager import get_interface_status, set_interface_state
 from utils.wifi_manager import set_wifi_config # Import the new utility
 from utils.display_manager import get_display_output_name, set_display_power
-from utils.prepare_all_photos import prepare_all_photos_with_progress
+from utils.prepare_all_photos import prepare_all_photos_with_progress, BackgroundPreparer, refresh_pan_zoom_masters
+from utils.pan_zoom_master import get_pan_zoom_factor
+from utils.gallery_thumbnails import ensure_thumbnail, thumbnail_version, thumbnail_format, remove_thumbnails
 from utils.import_usb_photos import import_usb_photos  # Déplacé dans utils
-from utils.metadata_utils import get_photo_metadata # Import get_photo_metadata
+from utils.media_index import get_prepared_media, index_media, remove_media, remove_source
 from utils.import_samba import import_samba_photos
 from utils.image_filters import apply_filter_to_image, add_text_to_polaroid, add_text_to_image, create_polaroid_effect
 from utils.voice_control_manager import start_voice_control, stop_voice_control, is_voice_control_running
@@ -207,7 +210,6 @@ INVITATIONS_PATH = 'config/invitations.json'
 TELEGRAM_GUEST_USERS_PATH = 'config/telegram_guest_users.json'
 NEW_POSTCARD_FLAG_PATH = 'cache/new_postcard.flag'
 CUSTOM_PLAYLIST_FILE = "/tmp/pimmich_custom_playlist.json"
-CURRENT_PHOTO_FILE = "/tmp/pimmich_current_photo.txt"
 PREPARED_DIR = BASE_DIR / "static" / "prepared"
 
 # Dictionnaire central pour les fichiers de log
@@ -328,15 +330,31 @@ def check_credentials(username, password):
 
     return username == stored_username and check_password_hash(stored_hash, password)
 
+_json_state_cache = {}
+
+def _load_json_state(path, default, encoding=None):
+    """
+    Charge un fichier d'état JSON en le gardant en mémoire tant qu'il n'a pas été modifié.
+    Retourne une copie : l'appelant peut la modifier puis la sauvegarder.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return default.copy()
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _json_state_cache.get(path)
+    if cached is None or cached[0] != signature:
+        try:
+            with open(path, 'r', encoding=encoding) as f:
+                cached = (signature, json.load(f))
+        except (json.JSONDecodeError, IOError):
+            return default.copy()
+        _json_state_cache[path] = cached
+    return cached[1].copy()
+
 def load_filter_states():
     """Charge les états des filtres depuis un fichier JSON."""
-    if not os.path.exists(FILTER_STATES_PATH):
-        return {}
-    try:
-        with open(FILTER_STATES_PATH, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return {}
+    return _load_json_state(FILTER_STATES_PATH, {})
 
 def save_filter_states(states):
     """Sauvegarde les états des filtres dans un fichier JSON."""
@@ -348,13 +366,7 @@ def save_filter_states(states):
 
 def load_favorites():
     """Charge la liste des photos favorites depuis un fichier JSON."""
-    if not os.path.exists(FAVORITES_PATH):
-        return []
-    try:
-        with open(FAVORITES_PATH, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return []
+    return _load_json_state(FAVORITES_PATH, [])
 
 def save_favorites(favorites_list):
     """Sauvegarde la liste des photos favorites dans un fichier JSON."""
@@ -366,13 +378,7 @@ def save_favorites(favorites_list):
 
 def load_polaroid_texts():
     """Charge les textes des polaroids depuis un fichier JSON."""
-    if not os.path.exists(POLAROID_TEXTS_PATH):
-        return {}
-    try:
-        with open(POLAROID_TEXTS_PATH, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return {}
+    return _load_json_state(POLAROID_TEXTS_PATH, {})
 
 def save_polaroid_texts(texts_dict):
     """Sauvegarde les textes des polaroids dans un fichier JSON."""
@@ -384,13 +390,7 @@ def save_polaroid_texts(texts_dict):
 
 def load_text_states():
     """Charge les textes des photos depuis un fichier JSON."""
-    if not os.path.exists(TEXT_STATES_PATH):
-        return {}
-    try:
-        with open(TEXT_STATES_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return {}
+    return _load_json_state(TEXT_STATES_PATH, {}, encoding='utf-8')
 
 def save_text_states(states):
     """Sauvegarde les textes des photos dans un fichier JSON."""
@@ -447,89 +447,65 @@ def get_prepared_photos_by_source():
     Récupère les médias préparés (photos et vidéos), organisés par leur source.
     Retourne un dictionnaire où les clés sont les noms des sources et les valeurs sont des listes de dictionnaires.
     Ex: {'immich': [{'path': 'immich/media.jpg', 'type': 'image', 'has_polaroid': True}, ...]}
+    Les données viennent de l'index des médias préparés (utils.media_index) : aucun parcours de dossier.
     """
-    # Charger la configuration pour obtenir les noms des invités
-    config = load_config()
-    guest_users = config.get('telegram_guest_users', {})
-
-    base_prepared_dir = PREPARED_DIR
     media_by_source = {}
     filter_states = load_filter_states()
-    favorites = load_favorites()
+    favorites = set(load_favorites())
     polaroid_texts = load_polaroid_texts()
     text_states = load_text_states()
     
     # Charger la config pour le boost anniversaire
     app_config = load_config()
     anniversary_boost_enabled = app_config.get("anniversary_boost_enabled", False)
-    if base_prepared_dir.exists():
-        for source_dir in base_prepared_dir.iterdir():
-            if source_dir.is_dir():
-                source_name = source_dir.name
-                
-                # Lister tous les fichiers (images et vidéos)
-                all_files_in_dir = list(source_dir.iterdir())
-                all_filenames = {f.name for f in all_files_in_dir}
-                
-                # Identifier les médias de base (non-polaroid, non-vignette, non-postcard)
-                base_media = sorted(
-                    [f for f in all_files_in_dir if f.is_file() and not f.name.endswith(('_polaroid.jpg', '_thumbnail.jpg', '_postcard.jpg'))]
-                )
+    today = datetime.now().strftime("%m-%d")
+
+    for source_name, indexed_media in get_prepared_media().items():
+        media_data_list = []
+        for entry in indexed_media:
+            media_name = entry["name"]
+            media_relative_path = f"{source_name}/{media_name}"
+            media_type = entry["type"]
+            
+            media_item = {
+                "path": media_relative_path,
+                "type": media_type,
+                "is_favorite": media_relative_path in favorites,
+                "is_anniversary": False # Default to False
+            }
 
-                media_data_list = []
-                for media_path_obj in base_media:
-                    media_name = media_path_obj.name
-                    media_relative_path = f"{source_name}/{media_name}"
-                    media_type = 'video' if media_path_obj.suffix.lower() in VIDEO_EXTENSIONS else 'image'
-                    
-                    media_item = {
-                        "path": media_relative_path,
-                        "type": media_type,
-                        "is_favorite": media_relative_path in favorites,
-                        "is_anniversary": False # Default to False
-                    }
-
-                    # Vérifier si c'est une photo anniversaire
-                    if anniversary_boost_enabled and media_type == 'image':
-                        photo_metadata = get_photo_metadata(media_path_obj)
-                        if photo_metadata:
-                            date_priority = [
-                                "subSecDateTimeOriginal", "dateTimeOriginal", "SubSecDateTimeOriginal", "DateTimeOriginal",
-                                "subSecCreateDate", "createDate", "SubSecCreateDate", "CreateDate",
-                                "subSecModifyDate", "modifyDate", "SubSecModifyDate",
-                                "mediaCreateDate", "dateTimeCreated", "MediaCreateDate", "DateTimeCreated",
-                                "fileModifiedAt", "fileCreatedAt"
-                            ]
-                            date_taken_str = next((photo_metadata.get(field) for field in date_priority if photo_metadata.get(field)), None)
-                            
-                            if date_taken_str:
-                                try:
-                                    photo_date = datetime.fromisoformat(date_taken_str.replace('Z', '+00:00'))
-                                    if photo_date.month == datetime.now().month and photo_date.day == datetime.now().day:
-                                        media_item["is_anniversary"] = True
-                                except Exception as e:
-                                    logger.debug(f"Erreur lors de la lecture de la date pour l'icône anniversaire: {e}")
-
-                    # Les options de filtre ne s'appliquent qu'aux images
-                    if media_type == 'image':
-                        base_name = media_path_obj.stem
-                        has_polaroid = f"{base_name}_polaroid.jpg" in all_filenames
-                        has_postcard = f"{base_name}_postcard.jpg" in all_filenames
-                        media_item["has_polaroid"] = has_polaroid
-                        media_item["has_postcard"] = has_postcard
-                        media_item["polaroid_text"] = polaroid_texts.get(media_relative_path, "")
-                        media_item["text"] = text_states.get(media_relative_path, "")
-                        media_item["active_filter"] = filter_states.get(media_relative_path, "none")
-                    elif media_type == 'video':
-                        # Chercher la vignette correspondante pour la vidéo
-                        thumbnail_name = f"{media_path_obj.stem}_thumbnail.jpg"
-                        if thumbnail_name in all_filenames:
-                            media_item["thumbnail_path"] = f"{source_name}/{thumbnail_name}"
-                    
-                    media_data_list.append(media_item)
-                
-                if media_data_list:
-                    media_by_source[source_name] = media_data_list
+            # Vérifier si c'est une photo anniversaire (date ISO pré-calculée : AAAA-MM-JJ...)
+            if anniversary_boost_enabled and media_type == 'image' and entry["date_taken"]:
+                media_item["is_anniversary"] = entry["date_taken"][5:10] == today
+
+            # Les options de filtre ne s'appliquent qu'aux images
+            media_stem = Path(media_name).stem
+            preview_path = None
+            if media_type == 'image':
+                media_item["has_polaroid"] = bool(entry["has_polaroid"])
+                media_item["has_postcard"] = bool(entry["has_postcard"])
+                media_item["polaroid_text"] = polaroid_texts.get(media_relative_path, "")
+                media_item["text"] = text_states.get(media_relative_path, "")
+                media_item["active_filter"] = filter_states.get(media_relative_path, "none")
+                preview_path = media_relative_path
+                if media_item["active_filter"] == 'polaroid' and media_item["has_polaroid"]:
+                    preview_path = f"{source_name}/{media_stem}_polaroid.jpg"
+                elif media_item["active_filter"] == 'postcard' and media_item["has_postcard"]:
+                    preview_path = f"{source_name}/{media_stem}_postcard.jpg"
+            elif media_type == 'video' and entry["has_thumbnail"]:
+                # Vignette correspondante pour la vidéo
+                media_item["thumbnail_path"] = f"{source_name}/{media_stem}_thumbnail.jpg"
+                preview_path = media_item["thumbnail_path"]
+
+            # Petite vignette affichée dans la galerie, versionnée par la date de l'image préparée (cache navigateur d'un an)
+            if preview_path:
+                media_item["preview_path"] = preview_path
+                media_item["preview_version"] = thumbnail_version(PREPARED_DIR / preview_path)
+            
+            media_data_list.append(media_item)
+        
+        if media_data_list:
+            media_by_source[source_name] = media_data_list
                     
     return media_by_source
 
@@ -572,6 +548,7 @@ def handle_new_telegram_photo(temp_photo_path_str, caption, user_name=None):
             config = load_config()
             screen_width, screen_height = config.get("display_width", 1920), config.get("display_height", 1080)
             prepare_photo(str(source_photo_path), str(prepared_photo_path), screen_width, screen_height, source_type='telegram', caption=final_caption)
+            index_media('telegram', prepared_photo_path.name)
             
             # 4. Gérer la légende
             if final_caption:
@@ -898,6 +875,7 @@ def configure():
         )
 
     if request.method == 'POST':
+        previous_pan_zoom_factor = get_pan_zoom_factor(config)
         # Gérer le champ 'source' qui correspond à 'photo_source' dans le config
         if 'source' in request.form:
             config['photo_source'] = request.form.get('source')
@@ -1038,6 +1016,7 @@ def configure():
         config["button_enabled"] = 'button_enabled' in request.form
         config["smart_plug_enabled"] = 'smart_plug_enabled' in request.form
         config["transition_enabled"] = 'transition_enabled' in request.form # New checkbox handling
+        config["slideshow_debug_hud"] = 'slideshow_debug_hud' in request.form
         config["clock_background_enabled"] = 'clock_background_enabled' in request.form
         config["slideshow_video_enabled"] = 'slideshow_video_enabled' in request.form
         config["video_audio_enabled"] = 'video_audio_enabled' in request.form
@@ -1071,6 +1050,15 @@ def configure():
             config['voice_control_device_index'] = request.form['voice_control_device_index']
 
         save_config(config)
+        # Nouveau facteur de zoom : les versions pan/zoom des photos sont régénérées en arrière-plan
+        # (en attendant, le diaporama agrandit l'image de base comme avant)
+        pan_zoom_factor = get_pan_zoom_factor(config)
+        if pan_zoom_factor and pan_zoom_factor != previous_pan_zoom_factor:
+            threading.Thread(
+                target=refresh_pan_zoom_masters,
+                args=(config['display_width'], config['display_height']),
+                daemon=True
+            ).start()
         restart_slideshow_process() # Redémarre uniquement le processus du diaporama
         flash(_("Configuration enregistrée. Le diaporama a été relancé pour appliquer les changements."), "success")
         return redirect(url_for('configure'))
@@ -1147,13 +1135,20 @@ def import_immich():
         q = queue.Queue()
         
         def run_import():
+            # Les photos sont préparées au fil du téléchargement
+            preparer = BackgroundPreparer("immich", config.get("display_width"), config.get("display_height"))
             try:
-                for update in download_and_extract_album(config):
+                for update in download_and_extract_album(config, on_file_ready=preparer.submit):
+                    if update.get("type") == "done":
+                        # Attendre les préparations en cours avant d'annoncer la fin de l'import
+                        preparer.close()
                     q.put(update)
                 q.put(None)
             except Exception as e:
                 q.put({"type": "error", "message": f"Erreur critique : {str(e)}"})
                 q.put(None)
+            finally:
+                preparer.close()
 
         t = threading.Thread(target=run_import)
         t.daemon = True
@@ -1756,6 +1751,30 @@ def schedule_worker():
         # Attendre 60 secondes avant la prochaine vérification
         time.sleep(60)
 
+def wait_for_next_update(enabled_key, interval_key, status_manager):
+    """
+    Attend la prochaine exécution d'un worker de mise à jour automatique, en restant abonné à la configuration :
+    activer ou désactiver la mise à jour relance aussitôt le worker, un nouvel intervalle recalcule l'échéance
+    depuis le début de l'attente au lieu de laisser courir l'ancien délai (jusqu'à plusieurs heures).
+    """
+    started = time.monotonic()
+    was_enabled = get_config().get(enabled_key, False)
+    rescheduled = False
+    while True:
+        config = get_config()
+        is_enabled = config.get(enabled_key, False)
+        if is_enabled != was_enabled:
+            return
+        sleep_seconds = (config.get(interval_key, 24) * 3600) if is_enabled else (15 * 60)
+        remaining = sleep_seconds - (time.monotonic() - started)
+        if remaining <= 0:
+            return
+        if rescheduled:
+            status_manager.update_status(next_run=datetime.now() + timedelta(seconds=remaining))
+        if wait_for_config_change((enabled_key, interval_key), remaining) is None:
+            return
+        rescheduled = True
+
 def immich_update_worker():
     """
     Thread en arrière-plan qui vérifie et met à jour l'album Immich périodiquement.
@@ -1779,7 +1798,7 @@ def immich_update_worker():
             immich_status_manager.update_status(next_run=next_run_time)
             if is_enabled:
                 immich_status_manager.update_status(message="En attente...")
-            time.sleep(sleep_seconds)
+            wait_for_next_update("immich_auto_update", "immich_update_interval_hours", immich_status_manager)
             continue # Skip the rest of this iteration
         
         if is_enabled:
@@ -1796,18 +1815,23 @@ def immich_update_worker():
                 # Étape 1: Téléchargement
                 download_success = False
                 description_map = {} # Initialiser un mappage vide
-                for update in download_and_extract_album(config):
-                    # NOUVEAU: Afficher les messages de progression du worker dans les logs pour le débogage
-                    if update.get("message"):
-                        logger.info(f"🖼️🔄  {update.get('message')}")
+                # Les photos reçues sont préparées pendant le téléchargement
+                preparer = BackgroundPreparer("immich", config.get("display_width", 1920), config.get("display_height", 1080))
+                try:
+                    for update in download_and_extract_album(config, on_file_ready=preparer.submit):
+                        # NOUVEAU: Afficher les messages de progression du worker dans les logs pour le débogage
+                        if update.get("message"):
+                            logger.info(f"🖼️🔄  {update.get('message')}")
 
-                    if update.get("type") == "error":
-                        logger.error(f"🖼️🔄❌ Erreur lors du téléchargement : {update.get('message')}")
-                        immich_status_manager.update_status(message=f"Erreur téléchargement: {update.get('message')}")
-                    immich_status_manager.update_status(message=update.get('message', '')) # Update status with download message
-                    if update.get("type") == "done":
-                        download_success = True
-                        description_map = update.get("description_map", {}) # Récupérer le mappage
+                        if update.get("type") == "error":
+                            logger.error(f"🖼️🔄❌ Erreur lors du téléchargement : {update.get('message')}")
+                            immich_status_manager.update_status(message=f"Erreur téléchargement: {update.get('message')}")
+                        immich_status_manager.update_status(message=update.get('message', '')) # Update status with download message
+                        if update.get("type") == "done":
+                            download_success = True
+                            description_map = update.get("description_map", {}) # Récupérer le mappage
+                finally:
+                    preparer.close()
 
                 # Étape 2: Préparation et redémarrage du diaporama
                 if download_success:
@@ -1862,7 +1886,7 @@ def immich_update_worker():
         immich_status_manager.update_status(next_run=next_run_time) # Update next_run regardless of enabled state
         if is_enabled: # Only set message to "En attente..." if it's enabled
             immich_status_manager.update_status(message="En attente...")
-        time.sleep(sleep_seconds)
+        wait_for_next_update("immich_auto_update", "immich_update_interval_hours", immich_status_manager)
 
 def samba_update_worker():
     """
@@ -1887,7 +1911,7 @@ def samba_update_worker():
             samba_status_manager.update_status(next_run=next_run_time)
             if is_enabled:
                 samba_status_manager.update_status(message="En attente...")
-            time.sleep(sleep_seconds)
+            wait_for_next_update("smb_auto_update", "smb_update_interval_hours", samba_status_manager)
             continue # Skip the rest of this iteration
         
         if is_enabled:
@@ -1902,6 +1926,7 @@ def samba_update_worker():
                 print("[Auto-Update Samba] Lancement de l'import et de la préparation...")
                 
                 import_success = False
+                samba_changes = 0
                 for update in import_samba_photos(config):
                     if update.get("type") == "error":
                         logger.info(f"[Auto-Update Samba] Erreur lors de l'import : {update.get('message')}")
@@ -1909,6 +1934,7 @@ def samba_update_worker():
                     samba_status_manager.update_status(message=update.get('message', '')) # Update status with import message
                     if update.get("type") == "done":
                         import_success = True
+                        samba_changes = update.get("total_imported", 0) + update.get("total_deleted", 0)
 
                 if import_success:
                     with app.app_context():
@@ -1930,10 +1956,17 @@ def samba_update_worker():
                         if update.get("type") == "error":
                             samba_status_manager.update_status(message=f"Erreur préparation: {update.get('message')}")
                             break
+                        if update.get("type") == "stats":
+                            samba_changes += update.get("total", 0)
                         if update.get("type") == "done":
                             prep_successful = True
                     
-                    if prep_successful:
+                    if prep_successful and samba_changes == 0:
+                        # Partage inchangé : inutile d'interrompre le diaporama
+                        print("[Auto-Update Samba] Aucun changement sur le partage.")
+                        with app.app_context():
+                            samba_status_manager.update_status(last_run=datetime.now(), message=_("Dernière mise à jour réussie."))
+                    elif prep_successful:
                         with app.app_context():
                             samba_status_manager.update_status(message=_("Mise à jour terminée. Redémarrage du diaporama..."))
                         print("[Auto-Update Samba] Mise à jour terminée. Redémarrage du diaporama.")
@@ -1956,7 +1989,7 @@ def samba_update_worker():
         samba_status_manager.update_status(next_run=next_run_time) # Update next_run regardless of enabled state
         if is_enabled: # Only set message to "En attente..." if it's enabled
             samba_status_manager.update_status(message="En attente...")
-        time.sleep(sleep_seconds)
+        wait_for_next_update("smb_auto_update", "smb_update_interval_hours", samba_status_manager)
 
 def telegram_bot_worker():
     """
@@ -2049,6 +2082,35 @@ def toggle_slideshow():
 
     return redirect(url_for('configure'))
     
+# --- Vignettes de la galerie ---
+@app.route('/thumbnail/<path:filename>')
+@login_required
+def media_thumbnail(filename):
+    """
+    Vignette d'une image préparée ('source/nom.jpg'), générée à la demande si elle manque ou est périmée
+    (bibliothèques préparées avant les vignettes). Avec un paramètre de version, le navigateur la garde un an.
+    """
+    prepared_path = (PREPARED_DIR / filename).resolve()
+    if PREPARED_DIR.resolve() not in prepared_path.parents or not prepared_path.name.lower().endswith('.jpg'):
+        abort(404)
+    try:
+        thumbnail = ensure_thumbnail(prepared_path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"[Thumbnails] Impossible de générer la vignette de {filename} : {e}")
+        abort(404)
+    if thumbnail is None:
+        abort(404)
+
+    versioned = bool(request.args.get('v'))
+    response = send_file(thumbnail, mimetype=thumbnail_format()[2], conditional=True, etag=True,
+                         max_age=365 * 24 * 3600 if versioned else 0)
+    if versioned:
+        response.cache_control.immutable = True
+    else:
+        # URL sans version : le navigateur revalide avec l'ETag (réponse 304 sans contenu)
+        response.cache_control.no_cache = True
+    return response
+
 # --- Suppression photo ---
 @app.route('/delete_photo/<path:photo>', methods=['DELETE'])
 @login_required
@@ -2060,6 +2122,7 @@ def delete_photo(photo):
         # Déterminer les chemins des versions alternatives et de la sauvegarde
         polaroid_path = photo_path_obj.with_name(f"{photo_path_obj.stem}_polaroid.jpg")
         postcard_path = photo_path_obj.with_name(f"{photo_path_obj.stem}_postcard.jpg")
+        pan_zoom_path = photo_path_obj.with_name(f"{photo_path_obj.stem}_panzoom.jpg")
         backup_path = Path('static/.backups') / photo
 
         # Supprimer tous les fichiers associés
@@ -2069,8 +2132,12 @@ def delete_photo(photo):
             polaroid_path.unlink()
         if postcard_path.is_file():
             postcard_path.unlink()
+        if pan_zoom_path.is_file():
+            pan_zoom_path.unlink()
         if backup_path.is_file():
             backup_path.unlink()
+        remove_thumbnails(photo_path_obj.parent, photo_path_obj.stem)
+        remove_media(photo_path_obj.parent.name, photo_path_obj.name)
         
         # Supprimer l'état du filtre pour cette photo
         states = load_filter_states()
@@ -2106,6 +2173,7 @@ def delete_source_photos(source_name):
         if backup_dir.is_dir():
             shutil.rmtree(backup_dir)
             logger.info(f"Dossier de sauvegarde supprimé : {backup_dir}")
+        remove_source(source_name)
 
         # Supprimer les états de filtre pour cette source
         states = load_filter_states()
@@ -2279,12 +2347,14 @@ def play_playlist():
             "music_file": target_playlist.get('music_file') # Nouveau champ optionnel
         }
 
-        # Écrire les données dans le fichier temporaire que le diaporama lira
-        with open(CUSTOM_PLAYLIST_FILE, 'w') as f:
-            json.dump(playlist_data_to_save, f)
-        
-        # Redémarrer le diaporama pour charger la nouvelle playlist sans éteindre l'écran
-        restart_slideshow_for_update()
+        # Diaporama lancé : la playlist lui est transmise directement, sans redémarrage
+        if not _play_playlist_on_channel(playlist_data_to_save):
+            # Écrire les données dans le fichier temporaire que le diaporama lira
+            with open(CUSTOM_PLAYLIST_FILE, 'w') as f:
+                json.dump(playlist_data_to_save, f)
+
+            # Redémarrer le diaporama pour charger la nouvelle playlist sans éteindre l'écran
+            restart_slideshow_for_update()
 
         return jsonify({"success": True, "message": f"Lancement du diaporama pour la playlist '{target_playlist.get('name')}'."})
     except Exception as e:
@@ -2298,9 +2368,12 @@ def restart_standard_slideshow():
         # S'assurer que le fichier de playlist personnalisée est supprimé
         if os.path.exists(CUSTOM_PLAYLIST_FILE):
             os.remove(CUSTOM_PLAYLIST_FILE)
-        
-        # Redémarrer le diaporama en mode standard sans éteindre l'écran
-        restart_slideshow_for_update()
+
+        # Diaporama lancé : il revient au mode standard sans redémarrage
+        response = send_command("reload")
+        if not (response and response.get("ok")):
+            # Redémarrer le diaporama en mode standard sans éteindre l'écran
+            restart_slideshow_for_update()
         return jsonify({"success": True, "message": "Diaporama standard relancé."})
     except Exception as e:
         logger.info(f"Erreur lors du redémarrage du diaporama standard : {e}")
@@ -2646,10 +2719,7 @@ def play_source_as_playlist(source_name):
     if not source_dir.is_dir():
         return jsonify({"success": False, "message": f"La source '{source_name}' n'existe pas."}), 404
 
-    photos = [
-        f"{source_name}/{f.name}" for f in source_dir.iterdir() 
-        if f.is_file() and not f.name.endswith(('_polaroid.jpg', '_thumbnail.jpg', '_postcard.jpg'))
-    ]
+    photos = [f"{source_name}/{entry['name']}" for entry in get_prepared_media([source_name])[source_name]]
 
     if not photos:
         return jsonify({"success": False, "message": f"La source '{source_name}' est vide."}), 400
@@ -2657,12 +2727,13 @@ def play_source_as_playlist(source_name):
     playlist_data = {"name": f"Source: {source_name.capitalize()}", "photos": photos}
     
     try:
-        with open(CUSTOM_PLAYLIST_FILE, 'w', encoding='utf-8') as f:
-            json.dump(playlist_data, f)
-        
-        stop_slideshow()
-        time.sleep(1.5) # Donner un peu plus de temps pour l'arrêt
-        start_slideshow()
+        if not _play_playlist_on_channel(playlist_data):
+            with open(CUSTOM_PLAYLIST_FILE, 'w', encoding='utf-8') as f:
+                json.dump(playlist_data, f)
+
+            stop_slideshow()
+            time.sleep(1.5) # Donner un peu plus de temps pour l'arrêt
+            start_slideshow()
         
         return jsonify({"success": True, "message": f"Lancement du diaporama pour la source '{source_name}'."})
     except Exception as e:
@@ -2753,17 +2824,78 @@ def _send_slideshow_signal(sig):
     except (FileNotFoundError, ValueError, ProcessLookupError) as e:
         return jsonify({"success": False, "message": f"Impossible de communiquer avec le diaporama : {e}"}), 500
 
+def _send_slideshow_command(cmd, fallback_signal=None, **fields):
+    """
+    Envoie une commande au diaporama par le canal de contrôle (socket Unix, quelques millisecondes).
+    Si le canal est injoignable, on se rabat sur le signal équivalent.
+    """
+    response = send_command(cmd, **fields)
+    if response is None:
+        if fallback_signal is not None:
+            return _send_slideshow_signal(fallback_signal)
+        return jsonify({"success": False, "message": "Le diaporama n'est pas en cours."}), 404
+    if not response.get("ok"):
+        return jsonify({"success": False, "message": response.get("error", "Commande refusée par le diaporama.")}), 400
+    return jsonify({"success": True, **response.get("state", {})})
+
+def _play_playlist_on_channel(playlist_data):
+    """Transmet une playlist au diaporama en cours. Retourne False si elle doit passer par un redémarrage."""
+    response = send_command("play_playlist", **playlist_data)
+    return bool(response and response.get("ok"))
+
 @app.route('/api/slideshow/next', methods=['POST'])
 def slideshow_next():
-    return _send_slideshow_signal(signal.SIGUSR1)
+    return _send_slideshow_command("next", signal.SIGUSR1)
 
 @app.route('/api/slideshow/previous', methods=['POST'])
 def slideshow_previous():
-    return _send_slideshow_signal(signal.SIGUSR2)
+    return _send_slideshow_command("prev", signal.SIGUSR2)
 
 @app.route('/api/slideshow/toggle_pause', methods=['POST'])
 def slideshow_toggle_pause():
-    return _send_slideshow_signal(signal.SIGTSTP)
+    return _send_slideshow_command("pause", signal.SIGTSTP)
+
+@app.route('/api/slideshow/jump', methods=['POST'])
+@login_required
+def slideshow_jump():
+    """Affiche immédiatement une photo préparée (chemin relatif à static/prepared), puis reprend la playlist."""
+    photo = (request.get_json(silent=True) or {}).get('photo')
+    if not photo:
+        return jsonify({"success": False, "message": "Photo manquante."}), 400
+    return _send_slideshow_command("jump", photo=photo)
+
+def _slideshow_state_payload(state):
+    """Met en forme l'état publié par le diaporama comme les réponses de /current_photo_status et /api/slideshow/status."""
+    config = load_config()
+    photo = state.get("photo") if state is not None else None
+    return {
+        "running": state is not None,
+        "status": "running" if state is not None else "stopped",
+        "current_photo": url_for('static', filename=photo) if photo else None,
+        "paused": bool(state and state.get("paused")),
+        "is_custom": bool(state and state.get("is_custom")),
+        "notifications_enabled": config.get("display_telegram_notification_overlay", True),
+    }
+
+@app.route('/api/slideshow/events')
+@login_required
+def slideshow_events():
+    """Flux SSE de la photo affichée et de l'état du diaporama (remplace l'interrogation périodique)."""
+    @stream_with_context
+    def generate():
+        while True:
+            received = False
+            for event in subscribe_events(timeout=15.0):
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                received = True
+                yield f"data: {json.dumps(_slideshow_state_payload(event.get('state', {})), ensure_ascii=False)}\n\n"
+            # Diaporama arrêté (ou canal fermé) : on le signale puis on retente régulièrement
+            yield f"data: {json.dumps(_slideshow_state_payload(None), ensure_ascii=False)}\n\n"
+            time.sleep(1 if received else 5)
+
+    return Response(generate(), mimetype='text/event-stream', headers={"Cache-Control": "no-cache", "Connection": "keep-alive"})
 
 @app.route('/api/slideshow/toggle_notifications', methods=['POST'])
 def toggle_notifications_api():
@@ -2786,13 +2918,13 @@ def toggle_notifications_api():
 def slideshow_status():
     if not is_slideshow_running():
         return jsonify({"running": False, "paused": False})
-    try:
-        with open("/tmp/pimmich_slideshow_status.json", "r") as f:
-            status = json.load(f)
-        config = load_config()
-        return jsonify({"running": True, "notifications_enabled": config.get("display_telegram_notification_overlay", True), **status})
-    except (FileNotFoundError, json.JSONDecodeError):
+    response = send_command("status")
+    if not response:
         return jsonify({"running": True, "paused": False, "notifications_enabled": True})
+    state = response.get("state", {})
+    config = load_config()
+    return jsonify({"running": True, "notifications_enabled": config.get("display_telegram_notification_overlay", True),
+                    "paused": state.get("paused", False), "is_custom": state.get("is_custom", False)})
 
 @app.route('/api/get_available_resolutions')
 @login_required
@@ -2925,16 +3057,12 @@ def current_photo_status():
     if not is_slideshow_running():
         return jsonify({"current_photo": None, "status": "stopped"})
 
-    try:
-        if os.path.exists(CURRENT_PHOTO_FILE):
-            with open(CURRENT_PHOTO_FILE, "r") as f:
-                photo_path = f.read().strip()
-            if photo_path:
-                # Construire l'URL complète pour l'attribut src de l'image
-                return jsonify({"current_photo": url_for('static', filename=photo_path), "status": "running"})
-    except Exception as e:
-        logger.info(f"Erreur lecture fichier photo actuelle : {e}")
-        
+    response = send_command("status")
+    photo_path = response.get("state", {}).get("photo") if response else None
+    if photo_path:
+        # Construire l'URL complète pour l'attribut src de l'image
+        return jsonify({"current_photo": url_for('static', filename=photo_path), "status": "running"})
+
     return jsonify({"current_photo": None, "status": "running"})
 
 @app.route('/save_wifi_settings', methods=['POST'])
@@ -3178,12 +3306,17 @@ def get_system_info_api():
         })
         disk_usage_str = f"{disk.percent}% ({disk.used / (1024**3):.1f}GB / {disk.total / (1024**3):.1f}GB)"
 
+        # Statistiques de rendu du diaporama (None s'il est arrêté)
+        slideshow_response = send_command("status", timeout=0.5)
+        slideshow_render = slideshow_response.get("state", {}).get("telemetry") if slideshow_response else None
+
         return jsonify({
             "success": True,
             "cpu_temp": cpu_temp_str,
             "cpu_usage": cpu_usage_str,
             "ram_usage": ram_usage_str,
             "disk_usage": disk_usage_str,
+            "slideshow_render": slideshow_render,
             "cpu_temp_history": list(cpu_temp_history),
             "cpu_usage_history": list(cpu_usage_history),
             "ram_usage_history": list(ram_usage_history),
@@ -3442,9 +3575,11 @@ def apply_filter_api():
 
     try:
         apply_filter_to_image(str(photo_full_path), filter_name)
+        index_media(photo_full_path.parent.name, photo_full_path.name)
         # Le chemin ne change pas, mais on le renvoie pour forcer le rafraîchissement du cache du navigateur
         new_url = url_for('static', filename=f'prepared/{photo_relative_path}')
-        return jsonify({"success": True, "message": "Filtre appliqué !", "new_path": new_url})
+        thumbnail_url = url_for('media_thumbnail', filename=photo_relative_path, v=thumbnail_version(photo_full_path))
+        return jsonify({"success": True, "message": "Filtre appliqué !", "new_path": new_url, "thumbnail_url": thumbnail_url})
     except ValueError as e: # Pour les noms de filtres invalides
         return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
@@ -3759,6 +3894,9 @@ if __name__ == '__main__':
     # Lancer la migration des dossiers invités au démarrage
     migrate_guest_folders()
 
+    # Surveiller config.json : les modifications faites par le diaporama ou à la main réveillent aussi les workers
+    config_store.watch()
+
     # Démarrer les workers de mise à jour dans des threads séparés
     immich_thread = threading.Thread(target=immich_update_worker, daemon=True)
     immich_thread.start()
@@ -15,14 +15,25 @@ import collections
 import math
 from datetime import datetime, timedelta
 import json
+import threading
 import qrcode
 import psutil
 import logging
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 from utils.text_drawer import draw_text_with_outline
-from utils.metadata_utils import get_photo_metadata, load_photo_metadata_cache # Import from new utility
-from utils.config_manager import load_config
+from utils.metadata_utils import get_photo_metadata, get_photo_date_taken, get_date_taken # Import from new utility
+from utils.media_index import get_prepared_media
+from utils.slide_prefetcher import SlidePrefetcher, load_slide
+from utils.pan_zoom_master import pan_zoom_size, open_pan_zoom_master
+from utils.playlist_sampler import WeightedSampler, SampledPass
+from utils.config_manager import load_config, config_store
+from utils.file_watcher import FileWatcher, CONFIG_CHANGED, NEW_POSTCARD, LIBRARY_CHANGED
+from utils.slideshow_channel import SlideshowChannelServer
+from utils.surface_factory import SurfaceFactory
+from utils.transition_engine import TransitionEngine
+from utils.render_telemetry import RenderTelemetry
+from utils.device_profile import get_profile, get_tiers
 
 # Helper minimal pour l'extraction des traductions (Pybabel)
 def _(text, **kwargs):
@@ -34,12 +45,10 @@ def _(text, **kwargs):
 # Définition des chemins
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PREPARED_BASE_DIR = Path(BASE_DIR) / 'static' / 'prepared'
-STATUS_FILE = "/tmp/pimmich_slideshow_status.json"
 SOUNDS_DIR = Path(BASE_DIR) / 'static' / 'sounds'
 CUSTOM_PLAYLIST_FILE = "/tmp/pimmich_custom_playlist.json"
 ICONS_DIR = Path(BASE_DIR) / 'static' / 'icons'
 NEW_POSTCARD_FLAG = Path(BASE_DIR) / 'cache' / 'new_postcard.flag'
-CURRENT_PHOTO_FILE = "/tmp/pimmich_current_photo.txt"
 CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'config.json')
 FAVORITES_PATH = os.path.join(BASE_DIR, 'config', 'favorites.json')
 FILTER_STATES_PATH = os.path.join(BASE_DIR, 'config', 'filter_states.json')
@@ -54,9 +63,23 @@ paused = False
 next_photo_requested = False
 previous_photo_requested = False
 
-# État interne pour le fichier de statut
+# État publié sur le canal de contrôle (pause, playlist personnalisée)
 _current_status = {"paused": False, "is_custom": False}
 
+# Canal de contrôle (socket Unix) : commandes reçues de l'application web et événements « photo affichée »
+control_channel = None
+_control_wakeup = threading.Event()  # Réveille les attentes de l'affichage dès qu'une commande arrive
+_pending_jump = None  # Chemin absolu de la photo demandée par "jump"
+_pending_playlist = None  # Données de la playlist demandée par "play_playlist"
+_reload_requested = False
+
+# Surfaces réutilisées d'une diapositive à l'autre et moteur de transitions (créés avec l'écran)
+surface_factory = None
+transition_engine = None
+# Durées de rendu par phase (exportées vers l'interface web, HUD de débogage en option)
+render_telemetry = RenderTelemetry()
+HUD_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf"
+
 _current_background_music = None # Pour rejouer après une vidéo
 # Chemin et cache pour les codes pays ISO 3166 (drapeaux)
 COUNTRY_CODES_PATH = Path(BASE_DIR) / 'static' / 'flags' / 'country_codes.json'
@@ -139,15 +162,60 @@ def load_country_codes():
             _country_codes_cache = {}
     return _country_codes_cache
 
-def update_status_file(new_fields):
-    """Met à jour le fichier de statut JSON en préservant les autres champs."""
+def update_status(new_fields):
+    """Met à jour l'état du diaporama en préservant les autres champs et le pousse sur le canal de contrôle."""
     global _current_status
     _current_status.update(new_fields)
+    if control_channel is not None:
+        control_channel.publish("status", **_current_status)
+
+def publish_now_showing(photo_path, is_video):
+    """Annonce la photo affichée (chemin relatif à 'static', vignette pour une vidéo) pour l'aperçu en direct."""
+    if control_channel is None:
+        return
+    path_to_publish = Path(photo_path)
+    if is_video:
+        thumbnail_path = path_to_publish.with_name(f"{path_to_publish.stem}_thumbnail.jpg")
+        if thumbnail_path.exists():
+            path_to_publish = thumbnail_path
     try:
-        with open(STATUS_FILE, "w") as f:
-            json.dump(_current_status, f)
-    except IOError as e:
-        logger.info(f"Erreur écriture fichier statut : {e}")
+        relative_path = path_to_publish.relative_to(Path(BASE_DIR) / 'static')
+    except ValueError:
+        return
+    control_channel.publish("now_showing", photo=relative_path.as_posix())
+
+def wait_for_control(timeout):
+    """Attend au plus `timeout` secondes, en rendant la main dès qu'une commande arrive par le canal."""
+    if _control_wakeup.wait(timeout):
+        _control_wakeup.clear()
+
+def handle_channel_command(message):
+    """Applique une commande du canal de contrôle (exécutée dans le thread du canal)."""
+    global paused, next_photo_requested, previous_photo_requested, _pending_jump, _pending_playlist, _reload_requested
+    command = message["cmd"]
+    if command == "next":
+        next_photo_requested = True
+    elif command == "prev":
+        previous_photo_requested = True
+    elif command == "pause":
+        paused = bool(message["paused"]) if "paused" in message else not paused
+        update_status({"paused": paused})
+    elif command == "jump":
+        photo_path = (PREPARED_BASE_DIR / str(message.get("photo", ""))).resolve()
+        if PREPARED_BASE_DIR.resolve() not in photo_path.parents or not photo_path.is_file():
+            raise ValueError("Photo introuvable.")
+        _pending_jump = str(photo_path)
+        next_photo_requested = True
+    elif command == "play_playlist":
+        if not isinstance(message.get("photos"), list) or not message["photos"]:
+            raise ValueError("La playlist est vide.")
+        _pending_playlist = {"name": message.get("name"), "photos": message["photos"], "music_file": message.get("music_file")}
+        next_photo_requested = True
+    elif command == "reload":
+        _reload_requested = True
+        next_photo_requested = True
+    logger.info(f"📸 Commande reçue par le canal de contrôle : {command}")
+    _control_wakeup.set()
 
 def signal_handler_next(signum, frame):
     global next_photo_requested
@@ -160,7 +228,7 @@ def signal_handler_previous(signum, frame):
 def signal_handler_pause_toggle(signum, frame):
     global paused
     paused = not paused
-    update_status_file({"paused": paused})
+    update_status({"paused": paused})
 
 # NOUVELLE FONCTION POUR GERER LES EVENEMENTS (QUIT, TACTILE)
 def handle_slideshow_events(screen_width):
@@ -184,7 +252,7 @@ def handle_slideshow_events(screen_width):
                 else:
                     logger.info("📸 Zone centrale de l'écran touchée -> Pause/Reprise")
                     paused = not paused
-                    update_status_file({"paused": paused})
+                    update_status({"paused": paused})
 
 def play_background_music(filename):
     """Charge et joue une musique de fond en boucle."""
@@ -208,9 +276,12 @@ def reinit_pygame():
     pygame.display.init()
     pygame.font.init()
 
-    global _icon_cache
+    global _icon_cache, surface_factory, transition_engine
     _icon_cache = {}
-    logger.debug(f"📸 Cache des icônes météo vidé.")
+    reset_overlay_cache()
+    surface_factory = SurfaceFactory() # Les surfaces du pool appartenaient à l'ancien affichage
+    transition_engine = create_transition_engine()
+    logger.debug(f"📸 Cache des icônes météo et de l'overlay vidé.")
 
     info = pygame.display.Info()
     width, height = info.current_w, info.current_h
@@ -274,32 +345,6 @@ def get_local_ip():
         s.close()
     return ip
 
-# NOUVELLE FONCTION
-def get_pi_model():
-    """Détecte le modèle du Raspberry Pi pour un décodage vidéo optimal."""
-    try:
-        with open('/proc/device-tree/model', 'r') as f:
-            model_str = f.read()
-            if 'Raspberry Pi 4' in model_str:
-                return 4
-            if 'Raspberry Pi 5' in model_str:
-                return 5
-            if 'Raspberry Pi 3' in model_str:
-                return 3
-            if 'Raspberry Pi 2' in model_str:
-                return 2
-            if 'Zero' in model_str:
-                return 1
-            if 'Raspberry Pi' in model_str:
-                return 1
-    except FileNotFoundError:
-        # Pas un Raspberry Pi ou un système où ce fichier n'existe pas
-        return None
-    except Exception as e:
-        logger.info(f"[Pi Detect] Erreur lors de la détection du modèle de Pi : {e}")
-        return None
-    return None # Modèle non reconnu
-
 # Helper function to parse hex colors (including alpha)
 def parse_color(hex_color):
     hex_color = str(hex_color).lstrip('#')
@@ -310,108 +355,63 @@ def parse_color(hex_color):
     else:
         return (255, 255, 255) # Default to white if invalid
 
+def create_transition_engine():
+    """Sur un appareil lent (Pi 1 à 3), les transitions démarrent à mi-résolution ; le moteur s'ajuste ensuite aux temps mesurés."""
+    return TransitionEngine(initial_scale=get_tiers()["transition_scale"], telemetry=render_telemetry)
+
 # New function to perform a transition between two images
-def perform_transition(screen, old_image_surface, new_image_path, duration, screen_width, screen_height, main_font, config, transition_type):
-    clock = pygame.time.Clock()
+def perform_transition(screen, old_image_surface, new_image_path, duration, screen_width, screen_height, main_font, config, transition_type, prefetched=None):
     fps_config = config.get("transition_fps", "auto")
     if fps_config == "30":
         fps = 30
     elif fps_config == "60":
         fps = 60
     else: # "auto"
-        fps = 30 if get_pi_model() in [1, 2, 3] else 60
-    num_frames = int(duration * fps)
-    if num_frames == 0: # Avoid division by zero if duration is too small
-        num_frames = 1
+        fps = get_tiers()["transition_fps"]
 
-    # Load and prepare new image
-    try:
-        new_pil_image = Image.open(new_image_path)
-    except (FileNotFoundError, Image.UnidentifiedImageError) as e:
-        logger.info(f"[Transition] ERREUR: Impossible de charger l'image '{new_image_path}': {e}")
-        return None # Retourner None pour signaler l'échec
-    if new_pil_image.mode != 'RGB': # type: ignore
-        new_pil_image = new_pil_image.convert('RGB')
+    # Load and prepare new image (déjà décodée et redimensionnée par le pré-chargement si possible)
+    if prefetched is None:
+        try:
+            prefetched = load_slide(new_image_path, screen_width, screen_height, telemetry=render_telemetry)
+        except (FileNotFoundError, Image.UnidentifiedImageError) as e:
+            logger.info(f"[Transition] ERREUR: Impossible de charger l'image '{new_image_path}': {e}")
+            return None # Retourner None pour signaler l'échec
 
     # Scale new image to fit the screen (maintain aspect ratio, center)
     # This is the base image for the transition, not the pan/zoom scaled one
-    new_pil_image_scaled = new_pil_image.copy()
-    new_pil_image_scaled.thumbnail((screen_width, screen_height), Image.Resampling.LANCZOS)
-    
-    # Optimisation majeure : convert() pour aligner le format de pixels sur celui de l'écran
-    new_surface_scaled = pygame.Surface((screen_width, screen_height)).convert()
-    new_surface_scaled.fill((0,0,0)) # Black background for new image
-    
-    img_x = (screen_width - new_pil_image_scaled.width) // 2
-    img_y = (screen_height - new_pil_image_scaled.height) // 2
-    
-    # Optimisation majeure : convert() pour aligner le format de pixels de l'image sur celui de l'écran
-    temp_surf = pygame.image.fromstring(new_pil_image_scaled.tobytes(), new_pil_image_scaled.size, new_pil_image_scaled.mode).convert()
-    new_surface_scaled.blit(temp_surf, (img_x, img_y))
+    # Surface au format de l'écran reprise du pool : ni allocation ni convert() à chaque transition
+    with render_telemetry.measure("convert"):
+        new_surface_scaled = surface_factory.acquire((screen_width, screen_height))
+        new_surface_scaled.fill((0,0,0)) # Black background for new image
+
+        fit_width, fit_height = prefetched.fit_size
+        img_x = (screen_width - fit_width) // 2
+        img_y = (screen_height - fit_height) // 2
+
+        # Les octets pré-calculés sont lus sans copie ; le blit fait l'unique conversion vers le format de l'écran
+        new_surface_scaled.blit(surface_factory.wrap(prefetched.fit_bytes, prefetched.fit_size), (img_x, img_y))
 
     # Récupérer les métadonnées pour l'image en cours de transition
     photo_metadata = get_photo_metadata(new_image_path)
 
     # Pré-calculer l'overlay pour ne pas le redessiner à chaque frame (optimisation performances)
-    overlay_surface = pygame.Surface((screen_width, screen_height), pygame.SRCALPHA)
+    overlay_surface = surface_factory.acquire((screen_width, screen_height), alpha=True)
+    overlay_surface.fill((0, 0, 0, 0))
     draw_overlay(overlay_surface, screen_width, screen_height, config, main_font, photo_metadata)
 
-    # Pi 1, 2, 3 downscaling optimization for transitions
-    is_low_end_pi = (get_pi_model() in [1, 2, 3])
-    if is_low_end_pi:
-        small_width, small_height = screen_width // 2, screen_height // 2
-        old_image_small = pygame.transform.scale(old_image_surface, (small_width, small_height)).convert()
-        new_surface_small = pygame.transform.scale(new_surface_scaled, (small_width, small_height)).convert()
-        temp_surface_small = pygame.Surface((small_width, small_height)).convert()
-
-    for i in range(num_frames + 1):
-        progress = i / num_frames # 0.0 to 1.0
-
-        if transition_type == "fade":
-            alpha = int(255 * progress)
-            if is_low_end_pi:
-                new_surface_small.set_alpha(alpha)
-                temp_surface_small.blit(old_image_small, (0, 0))
-                temp_surface_small.blit(new_surface_small, (0, 0))
-                pygame.transform.scale(temp_surface_small, (screen_width, screen_height), screen)
-            else:
-                # Optimisation majeure : on modifie l'alpha directement sur la surface d'origine sans faire de copie lourde
-                new_surface_scaled.set_alpha(alpha)
-                screen.blit(old_image_surface, (0, 0))
-                screen.blit(new_surface_scaled, (0, 0))
-        elif transition_type.startswith("slide_"):
-            # Determine slide direction
-            direction = transition_type.split("_")[1]
-            
-            # Calculate offset for the new image
-            offset_x, offset_y = 0, 0
-            if direction == "left":
-                offset_x = int(screen_width * (1 - progress)) # New image starts off-screen right, slides left
-            elif direction == "right":
-                offset_x = int(-screen_width * (1 - progress)) # New image starts off-screen left, slides right
-            elif direction == "up":
-                offset_y = int(screen_height * (1 - progress)) # New image starts off-screen bottom, slides up
-            elif direction == "down":
-                offset_y = int(-screen_height * (1 - progress)) # New image starts off-screen top, slides down
-            
-            screen.blit(old_image_surface, (0, 0)) # Draw old image first
-            screen.blit(new_surface_scaled, (offset_x, offset_y)) # Draw new image sliding in
-        else: # Fallback to fade if unknown type
-            screen.blit(old_image_surface, (0, 0))
-            screen.blit(new_surface_scaled, (0, 0)) # Just blit new image directly
-        
-        # Draw overlay during transition
-        screen.blit(overlay_surface, (0, 0))
-
-        pygame.display.flip()
-        clock.tick(fps)
+    # Le moteur mesure le temps de chaque frame et réduit la résolution de rendu (ou saute des frames)
+    # pour tenir le budget de 1/fps ; la transition dure toujours au plus `duration`.
+    transition_engine.run(screen, old_image_surface, new_surface_scaled, overlay_surface, transition_type, duration, fps)
 
     # Ensure the new image is fully blitted at the end of the transition
+    new_surface_scaled.set_alpha(None)
     screen.blit(new_surface_scaled, (0, 0))
     draw_overlay(screen, screen_width, screen_height, config, main_font, photo_metadata)
     pygame.display.flip()
+    surface_factory.release(new_surface_scaled)
+    surface_factory.release(overlay_surface)
 
-    return new_pil_image
+    return prefetched
 
 # Vérifie si on est dans les heures actives
 def is_within_active_hours(config):
@@ -718,7 +718,11 @@ def draw_postcard_notification_icon(screen, screen_width, screen_height, count,
 
 def get_today_postcard_count():
     """Compte le nombre de cartes postales reçues aujourd'hui."""
-    global _postcard_count_cache, _last_postcard_count_check
+    global _postcard_count_cache, _last_postcard_count_check, _postcard_count_version
+    if file_watcher is not None and file_watcher.version(NEW_POSTCARD) != _postcard_count_version:
+        # Une carte vient d'arriver : recompter sans attendre l'expiration du cache
+        _postcard_count_version = file_watcher.version(NEW_POSTCARD)
+        _last_postcard_count_check = 0
     if time.time() - _last_postcard_count_check < 60:
         return _postcard_count_cache
 
@@ -747,36 +751,69 @@ def get_today_postcard_count():
     
     return count
 
-def get_path_to_display(photo_path_obj, source, filter_states):
+# Surveillance des fichiers (démarrée par start_slideshow) : la boucle d'affichage lit des compteurs
+# en mémoire au lieu d'interroger le disque à chaque image.
+file_watcher = None
+_live_config_version = None
+_postcard_count_version = None
+
+def get_live_config(config):
+    """
+    Retourne le snapshot courant de la configuration (lecture seule). Sans événement de la surveillance,
+    aucun appel système : l'appelant compare config.version pour savoir si quelque chose a changé.
+    """
+    global _live_config_version
+    if file_watcher is None:
+        return config_store.snapshot()
+    version = file_watcher.version(CONFIG_CHANGED)
+    if version != _live_config_version:
+        _live_config_version = version
+        return config_store.refresh()
+    return config_store.snapshot(check=False)
+
+def is_new_postcard_pending():
+    """Vrai si le drapeau de nouvelle carte postale est présent."""
+    if file_watcher is None:
+        return NEW_POSTCARD_FLAG.exists()
+    return file_watcher.postcard_pending
+
+def get_path_to_display(photo_path_obj, source, filter_states, index_entry=None):
     """
     Détermine le chemin de fichier correct à afficher en fonction de la source et des filtres.
+    Si l'entrée de l'index des médias est fournie, ses indicateurs évitent de tester l'existence des fichiers.
     """
     relative_path_str = f"{source}/{photo_path_obj.name}"
     active_filter = filter_states.get(relative_path_str, 'none')
     
     # Par défaut, on affiche l'image de base
     path_to_display = str(photo_path_obj)
+    polaroid_path = photo_path_obj.with_name(f"{photo_path_obj.stem}_polaroid.jpg")
+    postcard_path = photo_path_obj.with_name(f"{photo_path_obj.stem}_postcard.jpg")
+    if index_entry is not None:
+        has_polaroid = bool(index_entry["has_polaroid"])
+        has_postcard = bool(index_entry["has_postcard"])
+    else:
+        has_polaroid = polaroid_path.exists()
+        has_postcard = postcard_path.exists()
 
     # Priorité 1: Filtre explicite de l'utilisateur
     if active_filter == 'polaroid':
-        polaroid_path = photo_path_obj.with_name(f"{photo_path_obj.stem}_polaroid.jpg")
-        if polaroid_path.exists():
+        if has_polaroid:
             path_to_display = str(polaroid_path)
     elif active_filter == 'postcard':
-        postcard_path = photo_path_obj.with_name(f"{photo_path_obj.stem}_postcard.jpg")
-        if postcard_path.exists():
+        if has_postcard:
             path_to_display = str(postcard_path)
     # Priorité 2: Comportement par défaut pour la source Telegram (si aucun filtre n'est actif)
     elif source == 'telegram' and active_filter in ['none', 'original']:
-        postcard_path = photo_path_obj.with_name(f"{photo_path_obj.stem}_postcard.jpg")
-        if postcard_path.exists():
+        if has_postcard:
             path_to_display = str(postcard_path)
             
     return path_to_display
 
-def build_playlist(media_list, config, favorites):
+def build_playlist_weights(media_list, config, favorites, dates_taken=None):
     """
-    Construit la playlist finale en appliquant les boosts pour les favoris et les photos récentes.
+    Calcule le poids de tirage de chaque média : 1 plus les boosts des favoris, des photos Telegram récentes
+    et des anniversaires. dates_taken (chemin -> date ISO, issu de l'index des médias) évite de relire les métadonnées.
     """
     favorite_boost = int(config.get("favorite_boost_factor", 2))
     telegram_boost_enabled = config.get("telegram_boost_enabled", True)
@@ -785,41 +822,34 @@ def build_playlist(media_list, config, favorites):
     anniversary_boost_enabled = config.get("anniversary_boost_enabled", False)
     anniversary_boost_factor = int(config.get("anniversary_boost_factor", 2))
 
-    playlist = []
+    now = datetime.now()
+    today = now.strftime("%m-%d")
+    weights = []
     for media_path in media_list:
-        playlist.append(media_path)
+        weight = 1
         relative_path = str(Path(media_path).relative_to(PREPARED_BASE_DIR))
         normalized_relative_path = re.sub(r'(_polaroid|_postcard)\.jpg$', '.jpg', relative_path)
 
         if telegram_boost_enabled and 'telegram' in media_path:
             match = re.search(r'telegram_(\d+)_', Path(media_path).name)
-            if match and (datetime.now() - datetime.fromtimestamp(int(match.group(1)))).days < telegram_boost_duration_days:
-                for _ in range(telegram_boost_factor): playlist.append(media_path)
+            if match and (now - datetime.fromtimestamp(int(match.group(1)))).days < telegram_boost_duration_days:
+                weight += telegram_boost_factor
         if normalized_relative_path in favorites:
-            for _ in range(favorite_boost): playlist.append(media_path)
+            weight += favorite_boost
 
         # --- Boost d'anniversaire ---
         if anniversary_boost_enabled:
-            photo_metadata = get_photo_metadata(media_path)
-            if photo_metadata:
-                date_priority = [
-                    "subSecDateTimeOriginal", "dateTimeOriginal", "SubSecDateTimeOriginal", "DateTimeOriginal",
-                    "subSecCreateDate", "createDate", "SubSecCreateDate", "CreateDate",
-                    "subSecModifyDate", "modifyDate", "SubSecModifyDate",
-                    "mediaCreateDate", "dateTimeCreated", "MediaCreateDate", "DateTimeCreated",
-                    "fileModifiedAt", "fileCreatedAt"
-                ]
-                date_taken_str = next((photo_metadata.get(field) for field in date_priority if photo_metadata.get(field)), None)
-                
-                if date_taken_str:
-                    try:
-                        photo_date = datetime.fromisoformat(date_taken_str.replace('Z', '+00:00'))
-                        if photo_date.month == datetime.now().month and photo_date.day == datetime.now().day:
-                            logger.debug(f"📸 Boost anniversaire pour {Path(media_path).name} (prise le {photo_date.strftime('%d/%m')})")
-                            for _ in range(anniversary_boost_factor): playlist.append(media_path)
-                    except Exception as e:
-                        logger.debug(f"Erreur lors de la lecture de la date pour le boost anniversaire: {e}")
-    return playlist
+            if dates_taken is not None:
+                date_taken = dates_taken.get(media_path)
+                is_anniversary = bool(date_taken) and date_taken[5:10] == today
+            else:
+                photo_date = get_photo_date_taken(media_path)
+                is_anniversary = bool(photo_date) and photo_date.strftime("%m-%d") == today
+            if is_anniversary:
+                logger.debug(f"📸 Boost anniversaire pour {Path(media_path).name}")
+                weight += anniversary_boost_factor
+        weights.append(weight)
+    return weights
 
 try:
     import RPi.GPIO as GPIO
@@ -855,7 +885,262 @@ def control_fan(temperature, threshold=55, pin=14):
         set_gpio_output(pin, False)
 
 # New function to draw the overlay elements (clock, date, weather)
+# --- Compositeur de l'overlay ---
+# Chaque widget (horloge/météo, marées, métadonnées photo) est rendu une fois dans un calque
+# (surface SRCALPHA) associé à une clé décrivant son contenu. Tant que la clé ne change pas
+# (ex: horloge à la minute), chaque image ne coûte qu'un blit par calque visible.
+_overlay_layers = {}  # nom du calque -> (clé de contenu, (surface, position) ou None)
+_font_cache = {}  # (chemin, taille) -> pygame.font.Font ou None si le chargement a échoué
+_flag_cache = {}  # (code ISO, taille, opacité) -> (surface ou None, horodatage du chargement)
+FLAG_RETRY_SECONDS = 600
+
+def get_cached_font(font_path, font_size):
+    """Charge une police une seule fois par couple (chemin, taille). Retourne None en cas d'échec."""
+    font_key = (font_path, font_size)
+    if font_key not in _font_cache:
+        try:
+            _font_cache[font_key] = pygame.font.Font(font_path, font_size)
+        except Exception as e:
+            logger.info(f"[Display] Erreur chargement police '{font_path}' ({font_size}px) : {e}")
+            _font_cache[font_key] = None
+    return _font_cache[font_key]
+
+def reset_overlay_cache():
+    """Oublie les calques et polices en cache (à appeler après une réinitialisation de l'affichage)."""
+    _overlay_layers.clear()
+    _font_cache.clear()
+
+def blit_overlay_layer(screen, name, key, render):
+    """
+    Blitte le calque `name`. render() n'est appelé que si `key` a changé depuis le dernier rendu ;
+    il retourne (surface, position) ou None si le calque est vide.
+    """
+    cached = _overlay_layers.get(name)
+    if cached is None or cached[0] != key:
+        cached = (key, render())
+        _overlay_layers[name] = cached
+    if cached[1] is not None:
+        surface, position = cached[1]
+        screen.blit(surface, position)
+
+def get_background_rgba(config_key, config, default="#00000080"):
+    bg_color_rgba = parse_color(config.get(config_key, default))
+    if len(bg_color_rgba) == 3:
+        bg_color_rgba = bg_color_rgba + (128,) # Ajouter une semi-transparence par défaut
+    return bg_color_rgba
+
+def get_flag_surface(iso_code, config):
+    """Télécharge (une seule fois) le drapeau d'un pays et le retourne comme surface Pygame."""
+    flag_size = config.get("country_flag_size", "128x96")
+    opacity = config.get("country_flag_opacity", 0.7)
+    flag_key = (iso_code, flag_size, opacity)
+    cached = _flag_cache.get(flag_key)
+    if cached and (cached[0] is not None or time.time() - cached[1] < FLAG_RETRY_SECONDS):
+        return cached[0]
+
+    flag_surf = None
+    try:
+        from io import BytesIO
+
+        flag_url = f"https://flagcdn.com/{flag_size}/{iso_code}.png"
+        response = requests.get(flag_url, timeout=1.5)
+        if response.status_code == 200:
+            flag_pil = Image.open(BytesIO(response.content)).convert('RGBA')
+
+            # --- Appliquer une opacité au drapeau ---
+            r, g, b, a = flag_pil.split()
+            a = a.point(lambda p: int(p * opacity))
+            flag_pil = Image.merge('RGBA', (r, g, b, a))
+
+            flag_surf = pygame.image.fromstring(flag_pil.tobytes(), flag_pil.size, flag_pil.mode)
+    except Exception:
+        pass  # Silencieux : nouvel essai après FLAG_RETRY_SECONDS
+    _flag_cache[flag_key] = (flag_surf, time.time())
+    return flag_surf
+
+def _render_clock_layer(elements, screen_width, config, main_font, text_color, outline_color):
+    """Rend le bandeau du haut (heure, date, météo, cartes postales) dans un calque."""
+    surfaces = []
+    total_width = 0
+    max_height = 0
+    for el in elements:
+        if el[0] == 'text':
+            surface = main_font.render(el[1], True, text_color)
+            padding = 0
+        else:
+            surface = load_icon(el[1], main_font.get_height(), is_weather_icon=el[2])
+            if surface is None:
+                continue
+            padding = el[4]
+        surfaces.append((el, surface, padding))
+        total_width += surface.get_width() + padding
+        max_height = max(max_height, surface.get_height())
+
+    if not surfaces:
+        return None
+
+    offset_x = int(config.get("clock_offset_x", 0))
+    offset_y = int(config.get("clock_offset_y", 0))
+    position = config.get("clock_position", "center")
+
+    if position == "left":
+        block_x = offset_x
+    elif position == "right":
+        block_x = screen_width - total_width + offset_x
+    else: # center
+        block_x = (screen_width - total_width) // 2 + offset_x
+    
+    # Positionner le bloc en haut de l'écran avec un padding de 15px
+    block_y = 15 + offset_y
+
+    # --- Fond semi-transparent sur toute la largeur, sinon calque limité au texte (+ contour) ---
+    if config.get("clock_background_enabled", False):
+        layer = pygame.Surface((screen_width, max_height + 20), pygame.SRCALPHA)
+        layer.fill(get_background_rgba("clock_background_color", config))
+        layer_x = 0
+    else:
+        layer = pygame.Surface((total_width + 4, max_height + 20), pygame.SRCALPHA)
+        layer_x = block_x - 2
+    layer_y = block_y - 10
+
+    # --- Dessin des éléments séquentiellement ---
+    current_x = block_x - layer_x
+    for el, surface, padding in surfaces:
+        el_y = 10 + (max_height - surface.get_height()) // 2
+        current_x += padding
+
+        if el[0] == 'text':
+            draw_text_with_outline(layer, el[1], main_font, text_color, outline_color, (current_x, el_y), anchor="topleft")
+        elif el[3]:  # Icône visible (clignotement de l'enveloppe)
+            layer.blit(surface, (current_x, el_y))
+
+        current_x += surface.get_width()
+
+    return layer, (layer_x, layer_y)
+
+def _get_tide_text(config):
+    """Texte des prochaines marées (None si la fonction est désactivée) et indicateur de message d'erreur."""
+    tides_data = get_tides(config)
+    if not tides_data:
+        # Afficher un message si les données ne sont pas disponibles mais que la fonction est activée
+        return _("Données de marée non disponibles"), True
+
+    tide_parts = []
+    today = datetime.now().date()
+    tomorrow = today + timedelta(days=1)
+    day_map = {'Mon':'Lun', 'Tue':'Mar', 'Wed':'Mer', 'Thu':'Jeu', 'Fri':'Ven', 'Sat':'Sam', 'Sun':'Dim'}
+
+    # Afficher les 4 prochaines marées pour avoir une bonne visibilité sur les jours à venir
+    for tide in tides_data[:4]:
+        tide_dt = datetime.fromisoformat(tide['time']).astimezone()
+        tide_date = tide_dt.date()
+
+        if tide_date == today: day_str = "Auj."
+        elif tide_date == tomorrow: day_str = "Dem."
+        else: day_str = day_map.get(tide_dt.strftime('%a'), tide_dt.strftime('%a'))
+
+        type_str = "PM" if tide['type'] == 'high' else "BM"
+        time_str = tide_dt.strftime('%H:%M')
+        
+        tide_parts.append(f"{day_str} {type_str}: {time_str}")
+
+    return (" | ".join(tide_parts) if tide_parts else None), False
+
+def _render_tide_layer(tide_text, font_to_use, screen_width, screen_height, config, text_color, outline_color):
+    """Rend le bandeau des marées (bas de l'écran) dans un calque."""
+    tide_offset_x = int(config.get("tide_offset_x", 0))
+    tide_offset_y = int(config.get("tide_offset_y", 0))
+
+    tide_surface = font_to_use.render(tide_text, True, text_color)
+    tide_rect = tide_surface.get_rect(centerx=(screen_width // 2) + tide_offset_x, bottom=(screen_height - 15) + tide_offset_y)
+
+    # --- Fond pour les marées : toute la largeur, 5px de padding en haut et en bas ---
+    if config.get("clock_background_enabled", False):
+        layer = pygame.Surface((screen_width, tide_rect.height + 10), pygame.SRCALPHA)
+        layer.fill(get_background_rgba("clock_background_color", config))
+        layer_pos = (0, tide_rect.top - 5)
+    else:
+        layer = pygame.Surface((tide_rect.width + 4, tide_rect.height + 10), pygame.SRCALPHA)
+        layer_pos = (tide_rect.left - 2, tide_rect.top - 5)
+
+    text_pos = (tide_rect.left - layer_pos[0], tide_rect.top - layer_pos[1])
+    draw_text_with_outline(layer, tide_text, font_to_use, text_color, outline_color, text_pos, anchor="topleft")
+    return layer, layer_pos
+
+def _render_metadata_layer(metadata_text, metadata_font, screen_width, screen_height, config, metadata_text_color, metadata_outline_color):
+    """Rend le bloc des métadonnées photo (date, anniversaire, lieu) dans un calque."""
+    metadata_surface = metadata_font.render(metadata_text, True, metadata_text_color)
+
+    # Offsets optionnels
+    metadata_offset_x = int(config.get("photo_metadata_offset_x", 0))
+    metadata_offset_y = int(config.get("photo_metadata_offset_y", 0))
+
+    # Position selon la configuration
+    position = config.get("photo_metadata_position", "bottom_left")
+
+    if position == "bottom_right":
+        metadata_rect = metadata_surface.get_rect(
+            right=(screen_width - 15) + metadata_offset_x,
+            bottom=(screen_height - 15) + metadata_offset_y
+        )
+    elif position == "bottom_center":
+        metadata_rect = metadata_surface.get_rect(
+            centerx=(screen_width // 2) + metadata_offset_x,
+            bottom=(screen_height - 15) + metadata_offset_y
+        )
+    elif position == "top_left":
+        metadata_rect = metadata_surface.get_rect(
+            left=15 + metadata_offset_x,
+            top=15 + metadata_offset_y
+        )
+    elif position == "top_right":
+        metadata_rect = metadata_surface.get_rect(
+            right=(screen_width - 15) + metadata_offset_x,
+            top=15 + metadata_offset_y
+        )
+    else:  # bottom_left (par défaut)
+        metadata_rect = metadata_surface.get_rect(
+            left=15 + metadata_offset_x,
+            bottom=(screen_height - 15) + metadata_offset_y
+        )
+
+    # Fond (10px de marge horizontale, 5px verticale) si activé
+    layer = pygame.Surface((metadata_rect.width + 20, metadata_rect.height + 10), pygame.SRCALPHA)
+    if config.get("photo_metadata_background_enabled", True):
+        layer.fill(get_background_rgba("photo_metadata_background_color", config))
+
+    # Texte avec contour
+    draw_text_with_outline(layer, metadata_text, metadata_font, metadata_text_color, metadata_outline_color, (10, 5), anchor="topleft")
+    return layer, (metadata_rect.left - 10, metadata_rect.top - 5)
+
 def draw_overlay(screen, screen_width, screen_height, config, main_font, photo_metadata=None):
+    """Dessine l'overlay (heure, météo, métadonnées...), mesuré pour la télémétrie, et le HUD de débogage s'il est activé."""
+    with render_telemetry.measure("overlay"):
+        _draw_overlay_widgets(screen, screen_width, screen_height, config, main_font, photo_metadata)
+    if config.get("slideshow_debug_hud", False):
+        draw_telemetry_hud(screen)
+
+def _render_telemetry_hud():
+    font = get_cached_font(HUD_FONT_PATH, 18)
+    if font is None:
+        font = pygame.font.SysFont("monospace", 18)
+    lines = [font.render(line, True, (255, 255, 255)) for line in render_telemetry.hud_lines()]
+    padding = 8
+    width = max(line.get_width() for line in lines) + 2 * padding
+    height = sum(line.get_height() for line in lines) + 2 * padding
+    surface = pygame.Surface((width, height), pygame.SRCALPHA)
+    surface.fill((0, 0, 0, 170))
+    y = padding
+    for line in lines:
+        surface.blit(line, (padding, y))
+        y += line.get_height()
+    return surface, (10, 10)
+
+def draw_telemetry_hud(screen):
+    """Statistiques de rendu en haut à gauche ; le calque n'est recalculé qu'une fois par seconde."""
+    blit_overlay_layer(screen, "telemetry_hud", int(time.time()), _render_telemetry_hud)
+
+def _draw_overlay_widgets(screen, screen_width, screen_height, config, main_font, photo_metadata=None):
     now = datetime.now()
     text_color = parse_color(config.get("clock_color", "#FFFFFF"))
     outline_color = parse_color(config.get("clock_outline_color", "#000000"))
@@ -872,31 +1157,29 @@ def draw_overlay(screen, screen_width, screen_height, config, main_font, photo_m
         separator = "  |  "
         icon_padding = 10
 
-        # --- Préparation des éléments à afficher ---
+        # --- Description des éléments à afficher : ('text', texte) ou ('icon', nom, météo, visible, padding) ---
         elements = []
 
         # Heure
         time_str = now.strftime(config.get("clock_format", "%H:%M"))
-        elements.append({'type': 'text', 'text': time_str})
+        elements.append(('text', time_str))
 
         # Date
         if config.get("show_date", False):
             date_str = now.strftime(config.get("date_format", "%A %d %B %Y"))
-            elements.append({'type': 'text', 'text': separator + date_str})
+            elements.append(('text', separator + date_str))
 
         # Météo Actuelle (utilisant les données déjà récupérées)
         if weather_and_forecast and weather_and_forecast.get('current'):
             try:
                 current_weather = weather_and_forecast['current']
                 icon_code = current_weather['weather'][0]['icon']
-                icon_surface = load_icon(icon_code, main_font.get_height(), is_weather_icon=True)
-                if icon_surface:
-                    elements.append({'type': 'icon', 'surface': icon_surface, 'padding': icon_padding})
+                elements.append(('icon', icon_code, True, True, icon_padding))
 
                 temp = round(current_weather['main']['temp'])
                 description = current_weather['weather'][0]['description'].capitalize()
                 weather_str = f"{temp}°C, {description}"
-                elements.append({'type': 'text', 'text': " " + weather_str})
+                elements.append(('text', " " + weather_str))
             except Exception as e:
                 logger.info(f"[Display] Erreur préparation météo actuelle: {e}")
 
@@ -904,20 +1187,18 @@ def draw_overlay(screen, screen_width, screen_height, config, main_font, photo_m
         if weather_and_forecast and weather_and_forecast.get('forecast'):
             for forecast_day in weather_and_forecast.get('forecast', []):
                 try:
-                    elements.append({'type': 'text', 'text': separator})
+                    elements.append(('text', separator))
 
                     # Icône pour le jour de prévision
                     icon_code = forecast_day.get('icon')
                     if icon_code:
-                        icon_surface = load_icon(icon_code, main_font.get_height(), is_weather_icon=True)
-                        if icon_surface:
-                            elements.append({'type': 'icon', 'surface': icon_surface, 'padding': icon_padding})
+                        elements.append(('icon', icon_code, True, True, icon_padding))
 
                     # Texte de la prévision
                     day_name = forecast_day.get('day', '')
                     temp_str = f"{forecast_day['max_temp']}°/{forecast_day['min_temp']}°"
                     weather_str = f"{day_name}: {temp_str}"
-                    elements.append({'type': 'text', 'text': " " + weather_str})
+                    elements.append(('text', " " + weather_str))
                 except (IndexError, KeyError) as e:
                     logger.info(f"[Display] Erreur préparation météo pour un jour: {e}")
 
@@ -925,208 +1206,74 @@ def draw_overlay(screen, screen_width, screen_height, config, main_font, photo_m
             # --- Compteur de cartes postales du jour ---
             today_postcard_count = get_today_postcard_count()
             if today_postcard_count > 0:
-                elements.append({'type': 'text', 'text': separator})
+                elements.append(('text', separator))
 
                 # --- Logique de clignotement ---
-                global _envelope_blink_end_time
-                is_blinking = _envelope_blink_end_time and datetime.now() < _envelope_blink_end_time
-                
-                icon_surface = load_icon("postale", main_font.get_height(), is_weather_icon=False)
-                if icon_surface:
-                    # On ajoute toujours l'icône à la liste pour la largeur, mais on contrôle sa visibilité
-                    should_draw_icon = not is_blinking or (is_blinking and datetime.now().second % 2 == 0)
-                    elements.append({'type': 'icon', 'surface': icon_surface, 'padding': icon_padding, 'visible': should_draw_icon})
+                # L'icône compte toujours dans la largeur, seule sa visibilité change
+                is_blinking = _envelope_blink_end_time and now < _envelope_blink_end_time
+                should_draw_icon = not is_blinking or now.second % 2 == 0
+                elements.append(('icon', "postale", False, should_draw_icon, icon_padding))
                 
                 # Texte du compteur
-                elements.append({'type': 'text', 'text': f" {today_postcard_count}"})
-
-
-        # --- Calcul de la taille totale et positionnement du bloc ---
-        total_width = 0
-        max_height = 0
-        for el in elements:
-            if el['type'] == 'text':
-                el['surface'] = main_font.render(el['text'], True, text_color)
-            total_width += el['surface'].get_width()
-            if el.get('padding'):
-                total_width += el['padding']
-            if el['surface'].get_height() > max_height:
-                max_height = el['surface'].get_height()
-
-        offset_x = int(config.get("clock_offset_x", 0))
-        offset_y = int(config.get("clock_offset_y", 0))
-        position = config.get("clock_position", "center")
-
-        if position == "left":
-            block_x = offset_x
-        elif position == "right":
-            block_x = screen_width - total_width + offset_x
-        else: # center
-            block_x = (screen_width - total_width) // 2 + offset_x
-        
-        # Positionner le bloc en haut de l'écran avec un padding de 15px
-        block_y = 15 + offset_y
+                elements.append(('text', f" {today_postcard_count}"))
 
-        # --- Dessin du fond semi-transparent ---
-        if config.get("clock_background_enabled", False):
-            bg_color_hex = config.get("clock_background_color", "#00000080")
-            bg_color_rgba = parse_color(bg_color_hex)
-            
-            if len(bg_color_rgba) == 3:
-                bg_color_rgba = bg_color_rgba + (128,) # Ajouter une semi-transparence par défaut
-            
-            bg_surface = pygame.Surface((screen_width, max_height + 20), pygame.SRCALPHA)
-            bg_surface.fill(bg_color_rgba)
-            screen.blit(bg_surface, (0, block_y - 10))
-
-        # --- Dessin des éléments séquentiellement ---
-        current_x = block_x
-        for el in elements:
-            el_y = block_y + (max_height - el['surface'].get_height()) // 2
-            
-            if el.get('padding'):
-                current_x += el['padding']
-
-            # On ne dessine l'élément que s'il est visible (par défaut True)
-            if el.get('visible', True):
-                if el['type'] == 'text':
-                    draw_text_with_outline(screen, el['text'], main_font, text_color, outline_color, (current_x, el_y), anchor="topleft")
-                elif el['type'] == 'icon':
-                    screen.blit(el['surface'], (current_x, el_y))
-            
-            current_x += el['surface'].get_width()
+        clock_key = (
+            tuple(elements), id(main_font), main_font.get_height(), text_color, outline_color, screen_width,
+            config.get("clock_position", "center"), config.get("clock_offset_x", 0), config.get("clock_offset_y", 0),
+            config.get("clock_background_enabled", False), config.get("clock_background_color", "#00000080"),
+        )
+        blit_overlay_layer(
+            screen, "clock", clock_key,
+            lambda: _render_clock_layer(elements, screen_width, config, main_font, text_color, outline_color)
+        )
 
         # --- Bloc du bas pour les marées ---
         if config.get("show_tides", False):
-            tides_data = get_tides(config)
-            tide_text = None
+            tide_text, is_error_message = _get_tide_text(config)
             font_to_use = main_font
-
-            if tides_data:
-                tide_parts = []
-                today = datetime.now().date()
-                tomorrow = today + timedelta(days=1)
-                day_map = {'Mon':'Lun', 'Tue':'Mar', 'Wed':'Mer', 'Thu':'Jeu', 'Fri':'Ven', 'Sat':'Sam', 'Sun':'Dim'}
-
-                # Afficher les 4 prochaines marées pour avoir une bonne visibilité sur les jours à venir
-                for tide in tides_data[:4]:
-                    tide_dt = datetime.fromisoformat(tide['time']).astimezone()
-                    tide_date = tide_dt.date()
-
-                    if tide_date == today: day_str = "Auj."
-                    elif tide_date == tomorrow: day_str = "Dem."
-                    else: day_str = day_map.get(tide_dt.strftime('%a'), tide_dt.strftime('%a'))
-
-                    type_str = "PM" if tide['type'] == 'high' else "BM"
-                    time_str = tide_dt.strftime('%H:%M')
-                    
-                    tide_parts.append(f"{day_str} {type_str}: {time_str}")
-                
-                if tide_parts:
-                    tide_text = " | ".join(tide_parts)
-            else:
-                # Afficher un message si les données ne sont pas disponibles mais que la fonction est activée
-                tide_text = _("Données de marée non disponibles")
-                try:
-                    # Utiliser une police légèrement plus petite pour le message d'erreur
-                    font_path = config.get("clock_font_path", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
-                    font_size = int(main_font.get_height() * 0.8) # 80% de la taille de la police principale
-                    font_to_use = pygame.font.Font(font_path, font_size)
-                except Exception as e:
-                    logger.info(f"[Display] Erreur chargement police pour message marée: {e}")
-                    font_to_use = main_font # Fallback
+            if is_error_message:
+                # Utiliser une police légèrement plus petite pour le message d'erreur (80% de la police principale)
+                font_path = config.get("clock_font_path", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+                font_to_use = get_cached_font(font_path, int(main_font.get_height() * 0.8)) or main_font
 
             if tide_text:
-                tide_offset_x = int(config.get("tide_offset_x", 0))
-                tide_offset_y = int(config.get("tide_offset_y", 0))
-
-                tide_surface = font_to_use.render(tide_text, True, text_color)
-                tide_rect = tide_surface.get_rect(centerx=(screen_width // 2) + tide_offset_x, bottom=(screen_height - 15) + tide_offset_y)
-
-                # --- Ajout du fond pour les marées ---
-                if config.get("clock_background_enabled", False):
-                    bg_color_hex = config.get("clock_background_color", "#00000080")
-                    bg_color_rgba = parse_color(bg_color_hex)
-
-                    if len(bg_color_rgba) == 3:
-                        bg_color_rgba = bg_color_rgba + (128,)
-
-                    # Créer une surface de fond sur toute la largeur de l'écran
-                    bg_height = tide_rect.height + 10  # Ajouter 5px de padding en haut et en bas
-                    bg_surface = pygame.Surface((screen_width, bg_height), pygame.SRCALPHA)
-                    bg_surface.fill(bg_color_rgba)
-                    # Positionner le fond verticalement pour qu'il encadre le texte
-                    screen.blit(bg_surface, (0, tide_rect.top - 5))
-
-                draw_text_with_outline(screen, tide_text, font_to_use, text_color, outline_color, tide_rect.topleft, anchor="topleft")
+                tide_key = (
+                    tide_text, id(font_to_use), font_to_use.get_height(), text_color, outline_color, screen_width, screen_height,
+                    config.get("tide_offset_x", 0), config.get("tide_offset_y", 0),
+                    config.get("clock_background_enabled", False), config.get("clock_background_color", "#00000080"),
+                )
+                blit_overlay_layer(
+                    screen, "tides", tide_key,
+                    lambda: _render_tide_layer(tide_text, font_to_use, screen_width, screen_height, config, text_color, outline_color)
+                )
 
 
     # --- Modification Sigalou 25/01/2026 - Affichage des métadonnées photo en bas de l'écran ---
     # Ce bloc affiche la date de prise de vue et/ou la localisation de la photo
     # si ces informations sont disponibles dans les métadonnées Immich
-    has_any_date = False
-    if photo_metadata is not None:
-        has_any_date = any(photo_metadata.get(field) for field in [
-            "SubSecDateTimeOriginal", "DateTimeOriginal", "SubSecCreateDate", 
-            "CreateDate", "SubSecModifyDate", "MediaCreateDate", "DateTimeCreated", 
-            "subSecDateTimeOriginal", "dateTimeOriginal", "subSecCreateDate", "createDate",
-            "subSecModifyDate", "modifyDate", "mediaCreateDate", "dateTimeCreated",
-            "fileModifiedAt", "fileCreatedAt"
-        ])
-
-    if photo_metadata and (has_any_date or config.get("show_photo_location", False)):
-    
-    
-    
+    # Date de prise de vue pré-calculée par utils.metadata_utils
+    photo_date = get_date_taken(photo_metadata)
+
+    if photo_metadata and (photo_date or config.get("show_photo_location", False)):
         metadata_elements = []
         metadata_separator = "  •  "
-
-        # Récupérer la police personnalisée pour les métadonnées
-        metadata_font_path = config.get("photo_metadata_font_path", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
-        metadata_font_size = int(config.get("photo_metadata_font_size", 23))
-
-        try:
-            metadata_font = pygame.font.Font(metadata_font_path, metadata_font_size)
-        except Exception as e:
-            logger.info(f"[Display] Erreur chargement police métadonnées : {e}.")
-            metadata_font = main_font
-
-        # Couleurs personnalisées pour les métadonnées
-        metadata_text_color = parse_color(config.get("photo_metadata_color", "#ffffff"))
-        metadata_outline_color = parse_color(config.get("photo_metadata_outline_color", "#000000"))
-        
-        # Extraction de la date de prise de vue (priorité 16 champs)
-        date_priority = [
-            "subSecDateTimeOriginal", "dateTimeOriginal", "SubSecDateTimeOriginal", "DateTimeOriginal",
-            "subSecCreateDate", "createDate", "SubSecCreateDate", "CreateDate",
-            "subSecModifyDate", "modifyDate", "SubSecModifyDate",
-            "mediaCreateDate", "dateTimeCreated", "MediaCreateDate", "DateTimeCreated",
-            "fileModifiedAt", "fileCreatedAt"
-        ]
-        date_candidates = [photo_metadata.get(field) for field in date_priority]
-        date_taken_str = next((d for d in date_candidates if d), None)
+        country = photo_metadata.get("country", "")
 
         # Affichage de la date de prise de vue
-        if config.get("show_photo_date", False) and date_taken_str:
+        if config.get("show_photo_date", False) and photo_date:
             try:
-                photo_date = datetime.fromisoformat(date_taken_str.replace('Z', '+00:00'))
                 photo_date_format = config.get("photo_date_format", "%d %B %Y")
                 metadata_elements.append(photo_date.strftime(photo_date_format))
             except Exception as e:
                 logger.info(f"[Display] Erreur formatage date : {e}")
 
         # Mention "Anniversaire" (Il y a X ans)
-        if config.get("anniversary_boost_enabled", True) and date_taken_str:
-            try:
-                p_date = datetime.fromisoformat(date_taken_str.replace('Z', '+00:00'))
-                now = datetime.now()
-                if p_date.month == now.month and p_date.day == now.day:
-                    years_ago = now.year - p_date.year
-                    if years_ago > 0:
-                        msg = _("(Anniversaire) Il y a %(num)d an") if years_ago == 1 else _("(Anniversaire) Il y a %(num)d ans")
-                        metadata_elements.append(msg % {"num": years_ago})
-            except:
-                pass
+        if config.get("anniversary_boost_enabled", True) and photo_date:
+            if photo_date.month == now.month and photo_date.day == now.day:
+                years_ago = now.year - photo_date.year
+                if years_ago > 0:
+                    msg = _("(Anniversaire) Il y a %(num)d an") if years_ago == 1 else _("(Anniversaire) Il y a %(num)d ans")
+                    metadata_elements.append(msg % {"num": years_ago})
 
         # Localisation
         if config.get("show_photo_location", False):
@@ -1135,10 +1282,9 @@ def draw_overlay(screen, screen_width, screen_height, config, main_font, photo_m
             if location_format == "city":
                 location_str = photo_metadata.get("city", "")
             elif location_format == "country":
-                location_str = photo_metadata.get("country", "")
+                location_str = country
             else:  # city_country (par défaut)
                 city = photo_metadata.get("city", "")
-                country = photo_metadata.get("country", "")
                 if city and country:
                     location_str = f"{city}, {country}"
                 else:
@@ -1150,130 +1296,50 @@ def draw_overlay(screen, screen_width, screen_height, config, main_font, photo_m
         # Assembler et afficher les métadonnées
         if metadata_elements:
             metadata_text = metadata_separator.join(metadata_elements)
-            metadata_surface = metadata_font.render(metadata_text, True, metadata_text_color)
 
-            # Offsets optionnels
-            metadata_offset_x = int(config.get("photo_metadata_offset_x", 0))
-            metadata_offset_y = int(config.get("photo_metadata_offset_y", 0))
+            # Police personnalisée pour les métadonnées (chargée une seule fois)
+            metadata_font_path = config.get("photo_metadata_font_path", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+            metadata_font_size = int(config.get("photo_metadata_font_size", 23))
+            metadata_font = get_cached_font(metadata_font_path, metadata_font_size) or main_font
 
-            # Position selon la configuration
-            position = config.get("photo_metadata_position", "bottom_left")
+            # Couleurs personnalisées pour les métadonnées
+            metadata_text_color = parse_color(config.get("photo_metadata_color", "#ffffff"))
+            metadata_outline_color = parse_color(config.get("photo_metadata_outline_color", "#000000"))
 
-            if position == "bottom_left":
-                metadata_rect = metadata_surface.get_rect(
-                    left=15 + metadata_offset_x,
-                    bottom=(screen_height - 15) + metadata_offset_y
-                )
-            elif position == "bottom_right":
-                metadata_rect = metadata_surface.get_rect(
-                    right=(screen_width - 15) + metadata_offset_x,
-                    bottom=(screen_height - 15) + metadata_offset_y
-                )
-            elif position == "bottom_center":
-                metadata_rect = metadata_surface.get_rect(
-                    centerx=(screen_width // 2) + metadata_offset_x,
-                    bottom=(screen_height - 15) + metadata_offset_y
-                )
-            elif position == "top_left":
-                metadata_rect = metadata_surface.get_rect(
-                    left=15 + metadata_offset_x,
-                    top=15 + metadata_offset_y
-                )
-            elif position == "top_right":
-                metadata_rect = metadata_surface.get_rect(
-                    right=(screen_width - 15) + metadata_offset_x,
-                    top=15 + metadata_offset_y
-                )
-            else:  # Fallback
-                metadata_rect = metadata_surface.get_rect(
-                    left=15 + metadata_offset_x,
-                    bottom=(screen_height - 15) + metadata_offset_y
-                )
-
-            # Dessiner le fond si activé
-            if config.get("photo_metadata_background_enabled", True):
-                bg_color_hex = config.get("photo_metadata_background_color", "#00000080")
-                bg_color_rgba = parse_color(bg_color_hex)
-
-                if len(bg_color_rgba) == 3:
-                    bg_color_rgba = bg_color_rgba + (128,)
-
-                bg_width = metadata_rect.width + 20
-                bg_height = metadata_rect.height + 10
-                bg_surface = pygame.Surface((bg_width, bg_height), pygame.SRCALPHA)
-                bg_surface.fill(bg_color_rgba)
-                screen.blit(bg_surface, (metadata_rect.left - 10, metadata_rect.top - 5))
-
-            # Dessiner le texte avec contour
-            draw_text_with_outline(
-                screen, 
-                metadata_text, 
-                metadata_font, 
-                metadata_text_color, 
-                metadata_outline_color, 
-                metadata_rect.topleft, 
-                anchor="topleft"
+            metadata_key = (
+                metadata_text, id(metadata_font), metadata_font_path, metadata_font_size, metadata_text_color, metadata_outline_color, screen_width, screen_height,
+                config.get("photo_metadata_position", "bottom_left"),
+                config.get("photo_metadata_offset_x", 0), config.get("photo_metadata_offset_y", 0),
+                config.get("photo_metadata_background_enabled", True), config.get("photo_metadata_background_color", "#00000080"),
+            )
+            blit_overlay_layer(
+                screen, "metadata", metadata_key,
+                lambda: _render_metadata_layer(metadata_text, metadata_font, screen_width, screen_height, config, metadata_text_color, metadata_outline_color)
             )
     # --- Fin Modification Sigalou 25/01/2026 ---
 
         # --- DRAPEAU PAYS en haut à droite (ajout Sigalou 29/01/2026) ---
-        if photo_metadata and config.get("show_country_flag", True):
-            
-            if country:
-                iso_code = country_codes.get(country.lower())
-                iso_code_country_flag_url = None   
-
-                if iso_code:
-                    iso_code_country_flag_url = f"{iso_code}.png"
-                #else:
-                    #flag_url = None A VOIR SI ON AJOUTE UN DRAPEAU QUI DIT QUE C EST INCONNU
-                    try:
-                        import requests
-                        from PIL import Image
-                        from io import BytesIO
-                        
-                        flag_size = config.get("country_flag_size", "128x96")
-                        flag_url = f"https://flagcdn.com/{flag_size}/{iso_code_country_flag_url}"
-                            
-                        response = requests.get(flag_url, timeout=1.5)
-                        if response.status_code == 200:
-                            flag_pil = Image.open(BytesIO(response.content)).convert('RGBA')
-                            
-                            
-                            # --- AJOUT : Appliquer une opacité au drapeau ---
-                            opacity = config.get("country_flag_opacity", 0.7)
-                            # Séparer les canaux RGBA
-                            r, g, b, a = flag_pil.split()
-                            # Réduire l'opacité du canal alpha
-                            a = a.point(lambda p: int(p * opacity))
-                            # Recombiner les canaux
-                            flag_pil = Image.merge('RGBA', (r, g, b, a))
-                            # --- FIN AJOUT ---
-                            
-                            flag_surf = pygame.image.fromstring(
-                                flag_pil.tobytes(), flag_pil.size, flag_pil.mode
-                            )
-                            
-                            # Positionnement du drapeau
-                            flag_position = config.get("country_flag_position", "top_right")
-                            flag_offset_x = int(config.get("country_flag_offset_x", 15))
-                            flag_offset_y = int(config.get("country_flag_offset_y", 15))
-
-                            if flag_position == "top_left":
-                                flag_rect = flag_surf.get_rect(topleft=(flag_offset_x, flag_offset_y))
-                            elif flag_position == "bottom_left":
-                                flag_rect = flag_surf.get_rect(bottomleft=(flag_offset_x, screen_height - flag_offset_y))
-                            elif flag_position == "bottom_right":
-                                flag_rect = flag_surf.get_rect(bottomright=(screen_width - flag_offset_x, screen_height - flag_offset_y))
-                            else: # top_right (default)
-                                flag_rect = flag_surf.get_rect(topright=(screen_width - flag_offset_x, flag_offset_y))
-                            
-                            screen.blit(flag_surf, flag_rect)
-                            
-                    except ImportError:
-                        logger.info(f"[Display] pip install requests pillow")
-                    except Exception as e:
-                        pass  # Silencieux
+        if config.get("show_country_flag", True) and country:
+            iso_code = country_codes.get(country.lower())
+            #else:
+                #flag_url = None A VOIR SI ON AJOUTE UN DRAPEAU QUI DIT QUE C EST INCONNU
+            flag_surf = get_flag_surface(iso_code, config) if iso_code else None
+            if flag_surf:
+                # Positionnement du drapeau
+                flag_position = config.get("country_flag_position", "top_right")
+                flag_offset_x = int(config.get("country_flag_offset_x", 15))
+                flag_offset_y = int(config.get("country_flag_offset_y", 15))
+
+                if flag_position == "top_left":
+                    flag_rect = flag_surf.get_rect(topleft=(flag_offset_x, flag_offset_y))
+                elif flag_position == "bottom_left":
+                    flag_rect = flag_surf.get_rect(bottomleft=(flag_offset_x, screen_height - flag_offset_y))
+                elif flag_position == "bottom_right":
+                    flag_rect = flag_surf.get_rect(bottomright=(screen_width - flag_offset_x, screen_height - flag_offset_y))
+                else: # top_right (default)
+                    flag_rect = flag_surf.get_rect(topright=(screen_width - flag_offset_x, flag_offset_y))
+                
+                screen.blit(flag_surf, flag_rect)
         # --- Fin DRAPEAU ---
 
 def display_title_slide(screen, screen_width, screen_height, title, duration, config, photos_for_slide=None):
@@ -1434,13 +1500,14 @@ def display_title_slide(screen, screen_width, screen_height, title, duration, co
     start_sleep = time.time()
     while time.time() - start_sleep < duration:
         handle_slideshow_events(screen_width)
-        time.sleep(0.1)
+        wait_for_control(0.1)
 
 # Fonction pour afficher une image et l'heure                        
 
-def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height, config, main_font, photo_path=None, ignore_postcard_flag=False):
+def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height, config, main_font, photo_path=None, ignore_postcard_flag=False, prefetched=None):
     """
     Affiche une image préparée avec un effet de pan/zoom et gère les contrôles (pause, suivant, précédent).
+    prefetched : diapositive déjà décodée par le pré-chargement (évite de recalculer les octets et l'image agrandie).
     """
     global paused, next_photo_requested, previous_photo_requested
     # Modification Sigalou 25/01/2026 - Récupération des métadonnées de la photo
@@ -1448,14 +1515,18 @@ def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height,
     # Fin Modification Sigalou 25/01/2026
 
     # Préparer l'image et les métadonnées dès le début pour éviter les erreurs de définition (NameError)
+    if prefetched is not None:
+        pil_image = prefetched.image
     if pil_image.mode != 'RGB':
         pil_image = pil_image.convert('RGB')
-    pygame_image_base = pygame.image.fromstring(pil_image.tobytes(), pil_image.size, pil_image.mode)
+    # Vue sans copie sur les octets RGB (base_bytes reste référencé jusqu'à la fin de la fonction)
+    base_bytes = prefetched.base_bytes if prefetched is not None else pil_image.tobytes()
+    pygame_image_base = surface_factory.wrap(base_bytes, pil_image.size)
 
 
     # Boucle de pause : si le diaporama est en pause, on attend ici.
     while paused:
-        config = load_config() # Recharger pour réagir au changement de notification immédiat
+        config = get_live_config(config) # Recharger pour réagir au changement de notification immédiat
         handle_slideshow_events(screen_width)
         if next_photo_requested or previous_photo_requested: return
         
@@ -1467,20 +1538,16 @@ def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height,
             draw_postcard_notification_icon(screen, screen_width, screen_height, p_count, main_font)
             
         pygame.display.flip()
-        time.sleep(0.1) # Évite de surcharger le CPU pendant la pause
+        wait_for_control(0.1) # Évite de surcharger le CPU pendant la pause
 
     """Affiche une image préparée et l'heure sur l'écran."""
+    scaled_pygame_image = None
     try:
-        # Ensure it's in a compatible mode for Pygame (RGB is generally safe)
-        if pil_image.mode != 'RGB':
-            pil_image = pil_image.convert('RGB')
-
         pan_zoom_enabled = config.get("pan_zoom_enabled", False)
         display_duration = config.get("display_duration", 10)
         logger.info(f"⏳ Pause de {display_duration} secondes.") # Debug print
         
         # Always blit the base image first (this will be overwritten by animation if enabled)
-        pygame_image_base = pygame.image.fromstring(pil_image.tobytes(), pil_image.size, pil_image.mode)
         screen.blit(pygame_image_base, (0, 0))
         
         if not pan_zoom_enabled: # If pan/zoom is disabled, just show static image
@@ -1492,12 +1559,12 @@ def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height,
             while time.time() - start_sleep < display_duration:
                 handle_slideshow_events(screen_width)
                 # Vérification en temps réel de l'arrivée d'une nouvelle carte postale
-                if not ignore_postcard_flag and NEW_POSTCARD_FLAG.exists(): return
+                if not ignore_postcard_flag and is_new_postcard_pending(): return
 
                 if next_photo_requested or previous_photo_requested: return
                 was_paused = False
                 while paused:
-                    config = load_config() # Recharger pour réaction immédiate au bouton
+                    config = get_live_config(config) # Recharger pour réaction immédiate au bouton
                     was_paused = True
                     handle_slideshow_events(screen_width)
                     if next_photo_requested or previous_photo_requested: return
@@ -1514,11 +1581,11 @@ def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height,
                     elif p_count > 0: draw_postcard_notification_icon(screen, screen_width, screen_height, p_count, main_font)
                     
                     pygame.display.flip()
-                    time.sleep(0.1)
+                    wait_for_control(0.1)
                     start_sleep += 0.1
 
                 # Gestion du clignotement de l'icône postale pendant la lecture statique
-                config = load_config() # Rafraîchir la config ici aussi
+                config = get_live_config(config) # Rafraîchir la config ici aussi
                 ticks = pygame.time.get_ticks()
                 p_count = get_today_postcard_count() if config.get("display_telegram_notification_overlay", True) else 0
                 if was_paused or p_count > 0:
@@ -1528,18 +1595,27 @@ def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height,
                         draw_postcard_notification_icon(screen, screen_width, screen_height, p_count, main_font)
                     pygame.display.flip()
 
-                time.sleep(0.1)
+                wait_for_control(0.1)
         else:
             # Logique de l'effet Pan/Zoom
             zoom_factor = float(config.get("pan_zoom_factor", 1.15)) # Récupérer le facteur de zoom de la config
             
             # Calculate scaled image dimensions
-            scaled_width = int(screen_width * zoom_factor)
-            scaled_height = int(screen_height * zoom_factor)
+            scaled_width, scaled_height = pan_zoom_size(screen_width, screen_height, zoom_factor)
 
-            # Scale the image once using PIL for quality, then convert to Pygame surface
-            scaled_pil_image = pil_image.resize((scaled_width, scaled_height), Image.Resampling.LANCZOS)
-            scaled_pygame_image = pygame.image.fromstring(scaled_pil_image.tobytes(), scaled_pil_image.size, scaled_pil_image.mode)
+            # Image agrandie : version pan/zoom générée à la préparation, sinon agrandissement de l'image préparée.
+            # Elle est copiée dans une surface du pool au format de l'écran : la même mémoire
+            # sert à toutes les diapositives et chaque frame du pan/zoom est un blit sans conversion.
+            if prefetched is not None and prefetched.zoom_size == (scaled_width, scaled_height):
+                zoom_bytes, zoom_size = prefetched.zoom_bytes, prefetched.zoom_size
+            else:
+                with render_telemetry.measure("scale"):
+                    scaled_pil_image = open_pan_zoom_master(photo_path, (scaled_width, scaled_height)) if photo_path else None
+                    if scaled_pil_image is None:
+                        scaled_pil_image = pil_image.resize((scaled_width, scaled_height), Image.Resampling.LANCZOS)
+                    zoom_bytes, zoom_size = scaled_pil_image.tobytes(), scaled_pil_image.size
+            with render_telemetry.measure("convert"):
+                scaled_pygame_image = surface_factory.from_buffer(zoom_bytes, zoom_size)
 
             # --- NOUVELLE LOGIQUE DE PANNING AMÉLIORÉE ---
             max_x_offset = scaled_width - screen_width
@@ -1578,7 +1654,7 @@ def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height,
 
                 handle_slideshow_events(screen_width)
                 # Vérification en temps réel de l'arrivée d'une nouvelle carte postale
-                if not ignore_postcard_flag and NEW_POSTCARD_FLAG.exists(): return
+                if not ignore_postcard_flag and is_new_postcard_pending(): return
 
                 # Vérifier les signaux à chaque image de l'animation
                 if next_photo_requested or previous_photo_requested: return
@@ -1591,6 +1667,7 @@ def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height,
                 current_x = int(start_x + (end_x - start_x) * eased_progress)
                 current_y = int(start_y + (end_y - start_y) * eased_progress)
 
+                frame_start = time.perf_counter()
                 # Blit the portion of the scaled image onto the screen
                 screen.blit(scaled_pygame_image, (0, 0), (current_x, current_y, screen_width, screen_height))
 
@@ -1603,7 +1680,7 @@ def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height,
                 
                 if paused:
                     # En pause : Alternance entre l'icône de pause et l'enveloppe
-                    config = load_config() # Recharger pendant la pause de l'animation
+                    config = get_live_config(config) # Recharger pendant la pause de l'animation
                     p_count = get_today_postcard_count() if config.get("display_telegram_notification_overlay", True) else 0
                     if (ticks // 500) % 2 == 0:
                         draw_pause_icon(screen, screen_width, screen_height)
@@ -1611,7 +1688,7 @@ def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height,
                         draw_postcard_notification_icon(screen, screen_width, screen_height, p_count, main_font)
                     
                     pygame.display.flip()
-                    time.sleep(0.1)
+                    wait_for_control(0.1)
                     start_animation_time += 0.1 # On décale le temps pour ne pas "sauter" l'animation
                     continue # On recommence la boucle sans avancer l'image
 
@@ -1619,12 +1696,16 @@ def display_photo_with_pan_zoom(screen, pil_image, screen_width, screen_height,
                 if p_count > 0 and (ticks // 500) % 2 != 0:
                     draw_postcard_notification_icon(screen, screen_width, screen_height, p_count, main_font)
 
-                pygame.display.flip()
-                clock.tick(60) # Limit frame rate to 60 FPS for smoother animation
+                with render_telemetry.measure("flip"):
+                    pygame.display.flip()
+                render_telemetry.record("pan_zoom_frame", time.perf_counter() - frame_start)
+                render_telemetry.frame_interval(clock.tick(60), 60) # Limit frame rate to 60 FPS for smoother animation
                 
     except Exception as e:
         logger.info(f"Erreur affichage photo avec pan/zoom : {e}")
         traceback.print_exc()
+    finally:
+        surface_factory.release(scaled_pygame_image) # Rendue au pool pour la diapositive suivante
 
 def fade_to_black(screen, previous_surface, duration, clock):
     """Effectue un fondu au noir sur la surface donnée."""
@@ -1663,7 +1744,11 @@ def display_video(screen, video_path, screen_width, screen_height, config, main_
     audio_volume = int(config.get("video_audio_volume", 100))
     transition_duration = float(config.get("transition_duration", 1.0))
     hwdec_enabled = config.get("video_hwdec_enabled", True)
-    pi_model = get_pi_model()
+    device_profile = get_profile()
+    pi_model = device_profile["pi_model"]
+    # Sorties vidéo de mpv détectées (liste vide : inconnues, on tente comme avant)
+    mpv_outputs = device_profile["mpv_video_outputs"]
+    dmabuf_available = not mpv_outputs or "dmabuf-wayland" in mpv_outputs
 
     # 1. Afficher un bandeau de chargement avant le lancement
     if main_font:
@@ -1709,9 +1794,12 @@ def display_video(screen, video_path, screen_width, screen_height, config, main_
             # --- MODIFICATION SIGALOU 28/01/2026 ---
             # Logique de décodage matériel spécifique au modèle de Raspberry Pi
             # pour une performance optimale, notamment sur Pi 4.
-            if pi_model in [4, 5]:
+            if pi_model in [4, 5] and dmabuf_available:
                 logger.info(f"[Video Playback] Raspberry Pi 4/5 détecté. Mode DMABUF Haute Performance.")
                 command.extend(['-v', '--hwdec=v4l2m2m', '--vo=dmabuf-wayland', '--wayland-app-id=mpv', '--log-file=/tmp/mpv_pimmich.log'])
+            elif pi_model in [4, 5]:
+                logger.info(f"[Video Playback] Raspberry Pi 4/5 détecté, sortie dmabuf-wayland indisponible dans mpv. Mode GPU.")
+                command.extend(['-v', '--hwdec=v4l2m2m-copy', '--vo=gpu', '--wayland-app-id=mpv', '--log-file=/tmp/mpv_pimmich.log'])
             elif pi_model in [1, 2, 3]:
                 logger.info(f"[Video Playback] Raspberry Pi {pi_model} détecté. Mode compatibilité optimisé.")
                 command.append('-v') # Mode verbeux pour capturer l'erreur réelle
@@ -1764,7 +1852,7 @@ def display_video(screen, video_path, screen_width, screen_height, config, main_
         # Tenter d'abord le mode DMABUF Haute Performance (zéro-copie), puis le mode compatibilité en cas d'échec.
         # Le mode DMABUF est extrêmement fluide sur Pi 1, 2, 3 sous Wayland/Sway car il évite la recopie mémoire.
         commands_to_try = [command]
-        if hwdec_enabled and pi_model in [1, 2, 3]:
+        if hwdec_enabled and pi_model in [1, 2, 3] and dmabuf_available:
             cmd_high_perf = [
                 'mpv',
                 '--no-config',
@@ -1848,12 +1936,46 @@ def display_video(screen, video_path, screen_width, screen_height, config, main_
 
 
 # Boucle principale du diaporama
-def start_slideshow():
-    pi_model = get_pi_model()
+def start_custom_playlist(playlist_data):
+    """Active une playlist personnalisée (musique et état compris). Retourne (chemins absolus, nom)."""
     global _current_background_music
+    playlist_name = None
+    if isinstance(playlist_data, dict) and 'name' in playlist_data and 'photos' in playlist_data:
+        playlist_name = playlist_data['name']
+        custom_playlist_paths = playlist_data['photos']
+    else:
+        # Fallback pour l'ancienne structure (juste une liste de chemins)
+        custom_playlist_paths = playlist_data
+
+    # Convertir les chemins relatifs en chemins absolus
+    custom_playlist = [str(Path(BASE_DIR) / 'static' / 'prepared' / p) for p in custom_playlist_paths]
+
+    # Gestion de la musique
+    _current_background_music = playlist_data.get('music_file') if isinstance(playlist_data, dict) else None
+    if _current_background_music:
+        play_background_music(_current_background_music)
+
+    logger.info(f"📸 Playlist personnalisée '{playlist_name or 'Sans nom'}' chargée avec {len(custom_playlist)} photos.")
+    update_status({"is_custom": True})
+    return custom_playlist, playlist_name
+
+def get_prefetch_paths(playlist, playlist_index, count, backwards=False):
+    """Retourne les prochaines entrées de la playlist dans le sens de navigation courant (avec bouclage)."""
+    step = -1 if backwards else 1
+    count = min(count, len(playlist) - 1)
+    if isinstance(playlist, SampledPass):
+        # Passage tiré à la demande : pas de bouclage (il tirerait tout le passage), en arrière seulement dans l'historique
+        indices = (playlist_index + step * offset for offset in range(1, count + 1))
+        return [playlist[index] for index in indices if playlist.first_index <= index < len(playlist)]
+    return [playlist[(playlist_index + step * offset) % len(playlist)] for offset in range(1, count + 1)]
+
+def start_slideshow():
+    global _current_background_music, file_watcher, control_channel, surface_factory, transition_engine, _pending_jump, _pending_playlist, _reload_requested
+    slide_prefetcher = None
+    unsubscribe_config = None
     try:
         logger.debug(f"📸 Starting slideshow initialization.")
-        config = load_config()
+        config = config_store.snapshot()
         logger.debug(f"📸 Config loaded. show_clock: {config.get('show_clock')}, show_weather: {config.get('show_weather')}")
         
       
@@ -1897,6 +2019,8 @@ def start_slideshow():
         logger.debug(f"📸 Tentative de création de l'écran {SCREEN_WIDTH}x{SCREEN_HEIGHT}...")
         screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
         logger.info(f"✅ Écran créé avec succès : {screen.get_size()}")
+        surface_factory = SurfaceFactory() # Après set_mode : les surfaces réutilisées prennent le format de l'écran
+        transition_engine = create_transition_engine()
         
         pygame.mouse.set_visible(False)
         logger.debug(f"📸 Mouse cursor hidden.")       
@@ -1908,8 +2032,16 @@ def start_slideshow():
         signal.signal(signal.SIGTSTP, signal_handler_pause_toggle) # Pour "pause/reprendre"
         logger.debug(f"📸 Signal handlers registered.")
 
-        # Initialiser le fichier de statut
-        update_status_file({"paused": False})
+        # --- Canal de contrôle (les signaux restent acceptés pour compatibilité) ---
+        try:
+            control_channel = SlideshowChannelServer(handle_channel_command)
+            control_channel.start()
+        except OSError as e:
+            logger.error(f"❌ Impossible d'ouvrir le canal de contrôle : {e}")
+            control_channel = None
+
+        # Initialiser l'état publié
+        update_status({"paused": False})
 
         try:
             import locale
@@ -1943,33 +2075,43 @@ def start_slideshow():
         # --- Initialisation de la surface précédente pour la transition ---
         previous_photo_surface = None
 
+        # --- Pré-chargement des prochaines photos pendant l'affichage de la photo courante ---
+        slide_prefetcher = SlidePrefetcher(
+            SCREEN_WIDTH, SCREEN_HEIGHT,
+            max_items=int(config.get("slideshow_prefetch_count", 2)),
+            memory_budget_mb=int(config.get("slideshow_prefetch_memory_mb", 96)),
+            telemetry=render_telemetry,
+        )
+        slide_prefetcher.start()
+        # Les limites du pré-chargement suivent la configuration sans redémarrer le diaporama
+        unsubscribe_config = config_store.subscribe(lambda snapshot: slide_prefetcher.configure(
+            snapshot.get("slideshow_prefetch_count", 2), snapshot.get("slideshow_prefetch_memory_mb", 96)))
+        navigating_backwards = False
+
+        # Tirage pondéré de la playlist par défaut, conservé d'un passage à l'autre
+        playlist_sampler = WeightedSampler(int(config.get("slideshow_no_repeat_window", 50)))
+        last_library_state = None
+
+        # Surveillance de la configuration, des cartes postales et de la bibliothèque
+        file_watcher = FileWatcher(
+            Path(CONFIG_PATH).parent,
+            [Path(CONFIG_PATH).name, Path(FAVORITES_PATH).name, Path(FILTER_STATES_PATH).name],
+            NEW_POSTCARD_FLAG,
+            PREPARED_BASE_DIR,
+        )
+        file_watcher.start()
+
         # --- Vérification et chargement de la playlist personnalisée (une seule fois) ---
         custom_playlist = None
         playlist_name = None
         is_custom_run = False # Drapeau pour indiquer un cycle de playlist unique
+        # (fichier écrit par l'application quand le diaporama n'était pas lancé ; sinon la playlist arrive par le canal)
         if os.path.exists(CUSTOM_PLAYLIST_FILE):
             try:
                 with open(CUSTOM_PLAYLIST_FILE, 'r') as f:
                     playlist_data = json.load(f)
-                
-                if isinstance(playlist_data, dict) and 'name' in playlist_data and 'photos' in playlist_data:
-                    playlist_name = playlist_data['name']
-                    custom_playlist_paths = playlist_data['photos']
-                else:
-                    # Fallback pour l'ancienne structure (juste une liste de chemins)
-                    custom_playlist_paths = playlist_data
-                
-                # Convertir les chemins relatifs en chemins absolus
-                custom_playlist = [str(Path(BASE_DIR) / 'static' / 'prepared' / p) for p in custom_playlist_paths]
-                
-                # Gestion de la musique
-                _current_background_music = playlist_data.get('music_file')
-                if _current_background_music:
-                    play_background_music(_current_background_music)
-
-                logger.info(f"📸 Playlist personnalisée '{playlist_name or 'Sans nom'}' chargée avec {len(custom_playlist)} photos.")
+                custom_playlist, playlist_name = start_custom_playlist(playlist_data)
                 is_custom_run = True # On active le drapeau pour le premier passage
-                update_status_file({"is_custom": True})
                 os.remove(CUSTOM_PLAYLIST_FILE) # Supprimer pour ne pas la réutiliser au prochain démarrage
             except Exception as e:
                 logger.info(f"📸 Erreur chargement playlist personnalisée: {e}. Utilisation de la playlist par défaut.")
@@ -1979,10 +2121,31 @@ def start_slideshow():
             # Utiliser une durée spécifique pour les écrans d'info, configurable
             info_duration = int(config.get("info_display_duration", 5))
             display_title_slide(screen, SCREEN_WIDTH, SCREEN_HEIGHT, playlist_name, info_duration, config, photos_for_slide=custom_playlist)
-            previous_photo_surface = screen.copy() # Capturer l'écran titre pour la première transition
+            previous_photo_surface = surface_factory.snapshot(screen, previous_photo_surface) # Capturer l'écran titre pour la première transition
 
         while True:
-            config = load_config() # Recharger la config à chaque itération
+            # --- Commandes du canal de contrôle traitées entre deux passages ---
+            if _reload_requested:
+                _reload_requested = False
+                logger.info(f"📸 Rechargement demandé : retour au diaporama standard.")
+                if is_custom_run:
+                    if pygame.mixer.get_init() and pygame.mixer.music.get_busy():
+                        pygame.mixer.music.fadeout(2000)
+                    _current_background_music = None
+                    is_custom_run = False
+                    update_status({"is_custom": False})
+                config_store.refresh()
+                last_library_state = None # Forcer la reconstruction de la playlist
+            if _pending_playlist is not None:
+                playlist_data, _pending_playlist = _pending_playlist, None
+                custom_playlist, playlist_name = start_custom_playlist(playlist_data)
+                is_custom_run = True
+                if playlist_name:
+                    config = get_live_config(config)
+                    display_title_slide(screen, SCREEN_WIDTH, SCREEN_HEIGHT, playlist_name, int(config.get("info_display_duration", 5)), config, photos_for_slide=custom_playlist)
+                    previous_photo_surface = surface_factory.snapshot(screen, previous_photo_surface)
+
+            config = get_live_config(config) # Nouveau snapshot seulement si la configuration a changé
 
             # --- CORRECTION: Charger les paramètres de transition ici pour qu'ils soient toujours définis ---
             # Auparavant, ils n'étaient définis que si aucune playlist personnalisée n'était utilisée.
@@ -1991,7 +2154,7 @@ def start_slideshow():
             transition_duration = float(config.get("transition_duration", 1.0))
 
             # --- Vérification et affichage immédiat de nouvelle carte postale ---
-            if NEW_POSTCARD_FLAG.exists():
+            if is_new_postcard_pending():
                 logger.info(f"📸 Nouvelle carte postale détectée.")
                 
                 # Déclencher le clignotement de l'icône pour 30 secondes
@@ -2042,7 +2205,7 @@ def start_slideshow():
                         display_photo_with_pan_zoom(screen, pil_image, SCREEN_WIDTH, SCREEN_HEIGHT, config, main_font_loaded, ignore_postcard_flag=True, photo_path=None)
                         
                         # Mettre à jour la surface précédente pour la transition suivante
-                        previous_photo_surface = screen.copy()
+                        previous_photo_surface = surface_factory.snapshot(screen, previous_photo_surface)
                     else:
                         logger.info(f"📸 Erreur: le chemin '{new_postcard_path_str}' dans le fichier drapeau n'existe pas.")
 
@@ -2053,11 +2216,21 @@ def start_slideshow():
                     # 4. Supprimer le drapeau pour ne pas rejouer
                     if NEW_POSTCARD_FLAG.exists():
                         NEW_POSTCARD_FLAG.unlink()
+                    if file_watcher is not None:
+                        file_watcher.acknowledge_postcard()
 
             # --- Construction de la playlist ---
+            # Sans événement de la surveillance (bibliothèque, configuration, favoris, filtres) ni changement de jour,
+            # la table de tirage existante est réutilisée telle quelle
+            library_state = None
+            if file_watcher is not None:
+                library_state = (file_watcher.version(LIBRARY_CHANGED), file_watcher.version(CONFIG_CHANGED), datetime.now().date())
             if is_custom_run:
                 playlist = custom_playlist
+            elif library_state is not None and library_state == last_library_state and len(playlist_sampler) > 0:
+                playlist = SampledPass(playlist_sampler)
             else:
+                last_library_state = library_state
                 # Construction de la playlist par défaut
                 filter_states = load_filter_states()
                 favorites = load_favorites()
@@ -2065,20 +2238,25 @@ def start_slideshow():
                 slideshow_video_enabled = config.get("slideshow_video_enabled", True)
                 
                 all_media = []
-                for source in display_sources:
-                    source_dir = PREPARED_BASE_DIR / source
-                    if source_dir.is_dir():
-                        base_photos = [f for f in source_dir.iterdir() if f.is_file() and (f.suffix.lower() in ('.jpg', '.jpeg', '.png') or f.suffix.lower() in VIDEO_EXTENSIONS) and not f.name.endswith(('_polaroid.jpg', '_thumbnail.jpg', '_postcard.jpg'))]
-                        for photo_path_obj in base_photos:
-                            # Filtrer les vidéos si l'option est désactivée
-                            if photo_path_obj.suffix.lower() in VIDEO_EXTENSIONS and not slideshow_video_enabled:
-                                continue
-                                
-                            path_to_display = get_path_to_display(photo_path_obj, source, filter_states)
-                            all_media.append(path_to_display)
+                dates_taken = {}
+                # Lecture depuis l'index des médias préparés plutôt qu'un parcours des dossiers à chaque tour
+                for source, indexed_media in get_prepared_media(display_sources).items():
+                    for entry in indexed_media:
+                        # Filtrer les vidéos si l'option est désactivée
+                        if entry["type"] == 'video' and not slideshow_video_enabled:
+                            continue
+
+                        photo_path_obj = PREPARED_BASE_DIR / source / entry["name"]
+                        path_to_display = get_path_to_display(photo_path_obj, source, filter_states, entry)
+                        all_media.append(path_to_display)
+                        dates_taken[path_to_display] = entry["date_taken"]
                 
-                playlist = build_playlist(all_media, config, favorites)
-                random.shuffle(playlist)
+                # Tirage pondéré : la table n'est reconstruite que si la bibliothèque ou les boosts ont changé
+                playlist_sampler.no_repeat_window = int(config.get("slideshow_no_repeat_window", 50))
+                if playlist_sampler.update(all_media, build_playlist_weights(all_media, config, favorites, dates_taken)):
+                    logger.info(f"📸 Table de tirage reconstruite ({len(all_media)} médias).")
+                # Un passage tire autant de médias que la bibliothèque en contient, puis la bibliothèque est relue
+                playlist = SampledPass(playlist_sampler)
             
             # --- Chargement de la police à chaque itération ---
             # C'est plus robuste, surtout après une réinitialisation de l'affichage.
@@ -2184,11 +2362,13 @@ def start_slideshow():
 
             playlist_index = 0
             while 0 <= playlist_index < len(playlist):
-                # Vérifier si une carte postale est arrivée pour sortir de la boucle et la traiter immédiatement
-                if NEW_POSTCARD_FLAG.exists():
+                # Vérifier si une carte postale est arrivée (ou une commande du canal) pour sortir de la boucle et la traiter immédiatement
+                if is_new_postcard_pending() or _pending_playlist is not None or _reload_requested:
                     break
 
-                photo_path = playlist[playlist_index]
+                # Une photo demandée par "jump" s'intercale sans consommer d'entrée de la playlist
+                jump_path, _pending_jump = _pending_jump, None
+                photo_path = jump_path or playlist[playlist_index]
                 
                 # Réinitialiser les requêtes de changement de photo
                 global next_photo_requested, previous_photo_requested
@@ -2214,21 +2394,8 @@ def start_slideshow():
                 # Vérifier si le fichier est une vidéo ou une image
                 is_video = any(photo_path.lower().endswith(ext) for ext in VIDEO_EXTENSIONS)
 
-                # Écrire le chemin de la photo actuelle dans le fichier d'état
-                try:
-                    with open(CURRENT_PHOTO_FILE, "w") as f:
-                        path_to_write = Path(photo_path)
-                        if is_video:
-                            # Pour une vidéo, on écrit le chemin de sa vignette pour l'aperçu live
-                            thumbnail_path = path_to_write.with_name(f"{path_to_write.stem}_thumbnail.jpg")
-                            if thumbnail_path.exists():
-                                path_to_write = thumbnail_path
-
-                        # Convertir le chemin absolu en chemin relatif au dossier 'static'
-                        relative_path = path_to_write.relative_to(Path(BASE_DIR) / 'static')
-                        f.write(str(relative_path))
-                except Exception as e:
-                    logger.info(f"Erreur écriture fichier photo actuelle : {e}")
+                # Annoncer la photo affichée sur le canal de contrôle (aperçu en direct de l'interface web)
+                publish_now_showing(photo_path, is_video)
 
                 if is_video:
                     display_video(screen, photo_path, SCREEN_WIDTH, SCREEN_HEIGHT, config, main_font_loaded, previous_photo_surface, pygame.time.Clock())
@@ -2241,47 +2408,64 @@ def start_slideshow():
                         draw_loading_banner(screen, "🔄 Reprise du diaporama...", SCREEN_WIDTH, SCREEN_HEIGHT, main_font_loaded)
                         time.sleep(0.5)
                 else: # C'est une image
-                    current_pil_image = None # Initialize to None to ensure it's always defined
+                    current_slide = None # Initialize to None to ensure it's always defined
+                    surface_factory.begin_slide()
+                    zoom_factor = float(config.get("pan_zoom_factor", 1.15)) if config.get("pan_zoom_enabled", False) else None
+                    # Récupérer la photo pré-chargée, puis lancer le décodage des suivantes pendant son affichage
+                    prefetched_slide = slide_prefetcher.take(photo_path, zoom_factor)
+                    slide_prefetcher.schedule(get_prefetch_paths(playlist, playlist_index, slide_prefetcher.max_items, navigating_backwards), zoom_factor)
                     try:
                         # Perform transition if it's not the first photo and transition is enabled
                         if previous_photo_surface is not None and transition_enabled and transition_duration > 0 and transition_type != "none": # Added transition_type check
-                            current_pil_image = perform_transition(screen, previous_photo_surface, photo_path, transition_duration, SCREEN_WIDTH, SCREEN_HEIGHT, main_font_loaded, config, transition_type)
+                            current_slide = perform_transition(screen, previous_photo_surface, photo_path, transition_duration, SCREEN_WIDTH, SCREEN_HEIGHT, main_font_loaded, config, transition_type, prefetched=prefetched_slide)
                             # Si la transition a échoué (ex: fichier non trouvé), on passe au suivant
-                            if current_pil_image is None:
+                            if current_slide is None:
                                 previous_photo_surface = None # Réinitialiser pour ne pas tenter de transitionner depuis une surface vide
                                 playlist_index += 1
                                 continue
                         else:
                             # For the first image or no transition, just load and blit it directly
-                            current_pil_image = Image.open(photo_path)
-                            if current_pil_image.mode != 'RGB': current_pil_image = current_pil_image.convert('RGB')
+                            current_slide = prefetched_slide or load_slide(photo_path, SCREEN_WIDTH, SCREEN_HEIGHT, zoom_factor, telemetry=render_telemetry)
                             # For the first image, we need to blit it directly before pan/zoom takes over
                             # This blit is only for the initial display, not part of pan/zoom animation
-                            screen.blit(pygame.image.fromstring(current_pil_image.tobytes(), current_pil_image.size, current_pil_image.mode), (0,0)) # type: ignore
+                            screen.blit(surface_factory.wrap(current_slide.base_bytes, current_slide.image.size), (0,0))
                             draw_overlay(screen, SCREEN_WIDTH, SCREEN_HEIGHT, config, main_font_loaded, None)
                             pygame.display.flip()
                     except Exception as e:
                         logger.info(f"🖼️ Error loading or transitioning to photo {photo_path}: {e}")
                         traceback.print_exc()
-                        current_pil_image = None # Explicitly set to None on error
+                        current_slide = None # Explicitly set to None on error
                         playlist_index += 1
                         continue
 
-                    if current_pil_image: # Only proceed if image was successfully loaded
-                        display_photo_with_pan_zoom(screen, current_pil_image, SCREEN_WIDTH, SCREEN_HEIGHT, config, main_font_loaded, photo_path)
-                        previous_photo_surface = screen.copy()
+                    if current_slide: # Only proceed if image was successfully loaded
+                        display_photo_with_pan_zoom(screen, current_slide.image, SCREEN_WIDTH, SCREEN_HEIGHT, config, main_font_loaded, photo_path, prefetched=current_slide)
+                        previous_photo_surface = surface_factory.snapshot(screen, previous_photo_surface)
                     else:
                         logger.info(f"🖼️ Skipping photo {photo_path} due to loading error.")
 
+                # Statistiques de rendu à jour pour le panneau d'informations système de l'interface web
+                if control_channel is not None:
+                    control_channel.set_state(telemetry=render_telemetry.snapshot())
+
                 # --- Logique de navigation ---
-                if next_photo_requested:
+                # Le sens de navigation oriente le pré-chargement ; schedule() abandonne les photos qui ne sont plus attendues
+                if jump_path and not (next_photo_requested or previous_photo_requested):
+                    pass # La photo demandée a été affichée : reprendre la playlist là où elle en était
+                elif next_photo_requested:
                     playlist_index += 1
+                    navigating_backwards = False
                 elif previous_photo_requested:
                     playlist_index -= 1
+                    navigating_backwards = True
                 else: # Comportement normal
                     playlist_index += 1
+                    navigating_backwards = False
 
                 # Gérer le bouclage de la playlist
+                # Fin d'un passage tiré : on repasse par la boucle principale pour prendre en compte les changements de la bibliothèque
+                if playlist_index >= len(playlist) and isinstance(playlist, SampledPass): break
+                if isinstance(playlist, SampledPass) and playlist_index < playlist.first_index: playlist_index = playlist.first_index
                 if playlist_index >= len(playlist): playlist_index = 0
                 if playlist_index < 0: playlist_index = len(playlist) - 1
 
@@ -2292,7 +2476,7 @@ def start_slideshow():
                     pygame.mixer.music.fadeout(2000)
                 _current_background_music = None
                 is_custom_run = False # Le prochain tour de boucle while True construira la playlist par défaut.
-                update_status_file({"is_custom": False})
+                update_status({"is_custom": False})
                 playlist = [] # Vider la playlist pour forcer la reconstruction.
     except KeyboardInterrupt:
         logger.info(f"Arrêt manuel du diaporama.")
@@ -2307,10 +2491,16 @@ def start_slideshow():
         # from utils.display_manager import set_display_power
         # set_display_power(False)
         # Nettoyer le fichier d'état à la sortie
-        if os.path.exists(CURRENT_PHOTO_FILE):
-            os.remove(CURRENT_PHOTO_FILE)
-        if os.path.exists(STATUS_FILE):
-            os.remove(STATUS_FILE)
+        if unsubscribe_config is not None:
+            unsubscribe_config()
+        if slide_prefetcher is not None:
+            slide_prefetcher.stop()
+        if surface_factory is not None:
+            surface_factory.log_summary()
+        if file_watcher is not None:
+            file_watcher.stop()
+        if control_channel is not None:
+            control_channel.stop()
         pygame.quit()
         if GPIO_AVAILABLE:
             GPIO.cleanup()
@@ -1,5 +1,7 @@
 import os
+import struct
 import zipfile
+import zlib
 import requests
 
 def download_album_archive(server_url, api_key, asset_ids, zip_path):
@@ -43,3 +45,225 @@ def clean_archive(zip_path):
             print("Archive supprimee apres extraction.")
     except Exception as e:
         print(f"Erreur lors de la suppression de l'archive : {e}")
+
+
+# ============================================================
+# Extraction en flux (sans fichier ZIP intermédiaire)
+# ============================================================
+
+ZIP_LOCAL_HEADER_SIG = b"PK\x03\x04"
+ZIP_DATA_DESCRIPTOR_SIG = b"PK\x07\x08"
+ZIP_FLAG_ENCRYPTED = 0x0001
+ZIP_FLAG_DATA_DESCRIPTOR = 0x0008
+ZIP_FLAG_UTF8 = 0x0800
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+EXTRACT_BUFFER_SIZE = 1024 * 1024
+
+
+class _ChunkReader:
+    """Lecteur minimal au-dessus d'un itérateur de morceaux d'octets (ex: response.iter_content)."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+
+    def _fill(self, size):
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return False
+            self._buffer += chunk
+        return True
+
+    def read_exact(self, size):
+        if not self._fill(size):
+            raise zipfile.BadZipFile("Archive tronquée.")
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def read_some(self, max_size=None):
+        """Retourne les octets disponibles (au plus max_size), ou b"" en fin de flux."""
+        if not self._buffer and not self._fill(1):
+            return b""
+        if max_size is None or max_size >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:max_size])
+            del self._buffer[:max_size]
+        return data
+
+    def peek_signature(self):
+        return bytes(self._buffer[:4]) if self._fill(4) else b""
+
+    def unread(self, data):
+        self._buffer[:0] = data
+
+
+def _parse_zip64_sizes(extra, comp_size, uncomp_size):
+    """Lit les tailles réelles dans le champ extra Zip64 (id 0x0001) s'il est présent."""
+    zip64 = False
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, size = struct.unpack("<HH", extra[pos:pos + 4])
+        data = extra[pos + 4:pos + 4 + size]
+        if header_id == 0x0001:
+            zip64 = True
+            offset = 0
+            if uncomp_size == 0xFFFFFFFF and len(data) >= offset + 8:
+                uncomp_size = struct.unpack("<Q", data[offset:offset + 8])[0]
+                offset += 8
+            if comp_size == 0xFFFFFFFF and len(data) >= offset + 8:
+                comp_size = struct.unpack("<Q", data[offset:offset + 8])[0]
+        pos += 4 + size
+    return zip64, comp_size, uncomp_size
+
+
+def _read_data_descriptor(reader, zip64):
+    """Lit le descripteur placé après les données (signature optionnelle)."""
+    size_format = "<IQQ" if zip64 else "<III"
+    size = struct.calcsize(size_format)
+    head = reader.read_exact(4)
+    if head == ZIP_DATA_DESCRIPTOR_SIG:
+        return struct.unpack(size_format, reader.read_exact(size))
+    return struct.unpack(size_format, head + reader.read_exact(size - 4))
+
+
+def _copy_stored_until_descriptor(reader, zip64, write):
+    """
+    Copie une entrée non compressée dont la taille n'est connue qu'à la fin (flux Immich).
+    On cherche la signature du descripteur et on ne l'accepte que si la taille et le CRC
+    annoncés correspondent aux octets déjà lus.
+    """
+    size_format = "<IQQ" if zip64 else "<III"
+    descriptor_len = 4 + struct.calcsize(size_format)
+    pending = bytearray()
+    running_crc = 0
+    count = 0
+
+    while True:
+        chunk = reader.read_some()
+        if not chunk:
+            raise zipfile.BadZipFile("Archive tronquée (descripteur introuvable).")
+        pending += chunk
+
+        flush_upto = max(0, len(pending) - descriptor_len + 1)
+        search_from = 0
+        while True:
+            pos = pending.find(ZIP_DATA_DESCRIPTOR_SIG, search_from)
+            if pos < 0:
+                break
+            if len(pending) - pos < descriptor_len:
+                flush_upto = min(flush_upto, pos)
+                break
+            crc, comp_size, uncomp_size = struct.unpack(size_format, pending[pos + 4:pos + descriptor_len])
+            if comp_size == uncomp_size == count + pos and zlib.crc32(pending[:pos], running_crc) == crc:
+                write(pending[:pos])
+                reader.unread(pending[pos + descriptor_len:])
+                return crc, uncomp_size
+            search_from = pos + 1
+
+        if flush_upto:
+            block = bytes(pending[:flush_upto])
+            write(block)
+            running_crc = zlib.crc32(block, running_crc)
+            count += flush_upto
+            del pending[:flush_upto]
+
+
+def _copy_entry_data(reader, method, has_descriptor, zip64, comp_size, write):
+    """Décompresse les données d'une entrée vers write() et retourne (crc attendu, taille attendue)."""
+    if method == ZIP_STORED and has_descriptor:
+        return _copy_stored_until_descriptor(reader, zip64, write)
+
+    decompressor = zlib.decompressobj(-15) if method == ZIP_DEFLATED else None
+    remaining = comp_size
+    while True:
+        if decompressor is not None and decompressor.eof:
+            reader.unread(decompressor.unused_data)
+            break
+        if not has_descriptor and remaining <= 0:
+            break
+        chunk = reader.read_some(None if has_descriptor else remaining)
+        if not chunk:
+            raise zipfile.BadZipFile("Archive tronquée.")
+        remaining -= len(chunk)
+        write(decompressor.decompress(chunk) if decompressor is not None else chunk)
+
+    if has_descriptor:
+        crc, _, uncomp_size = _read_data_descriptor(reader, zip64)
+        return crc, uncomp_size
+    return None, None
+
+
+def stream_extract_zip(chunks, resolve_dest, buffer_size=EXTRACT_BUFFER_SIZE):
+    """
+    Extrait une archive ZIP au fil de sa réception, sans l'écrire sur disque.
+
+    - chunks : itérable de morceaux d'octets (ex: response.iter_content()).
+    - resolve_dest : fonction(nom_de_fichier) -> Path de destination, ou None pour ignorer l'entrée.
+
+    Chaque fichier est écrit dans un .part (écritures bufferisées) puis renommé ;
+    le générateur produit le Path de chaque fichier dès qu'il est complet.
+    Toute archive invalide (tronquée, corrompue, non supportée) lève zipfile.BadZipFile.
+    """
+    reader = _ChunkReader(chunks)
+    while reader.peek_signature() == ZIP_LOCAL_HEADER_SIG:
+        reader.read_exact(4)
+        (_, flags, method, _, _, crc, comp_size, uncomp_size,
+         name_len, extra_len) = struct.unpack("<HHHHHIIIHH", reader.read_exact(26))
+        raw_name = reader.read_exact(name_len)
+        extra = reader.read_exact(extra_len)
+        zip64, comp_size, uncomp_size = _parse_zip64_sizes(extra, comp_size, uncomp_size)
+
+        if flags & ZIP_FLAG_ENCRYPTED:
+            raise zipfile.BadZipFile("Les archives chiffrées ne sont pas supportées.")
+        if method not in (ZIP_STORED, ZIP_DEFLATED):
+            raise zipfile.BadZipFile(f"Méthode de compression non supportée ({method}).")
+
+        name = raw_name.decode("utf-8" if flags & ZIP_FLAG_UTF8 else "cp437", errors="replace")
+        # On ne garde que le nom de fichier : pas de sous-dossiers ni de chemins remontants
+        basename = os.path.basename(name.replace("\\", "/"))
+        dest_path = resolve_dest(basename) if basename else None
+
+        tmp_path = None
+        out = None
+        if dest_path is not None:
+            tmp_path = dest_path.with_name(dest_path.name + ".part")
+            out = open(tmp_path, "wb", buffering=buffer_size)
+
+        state = {"crc": 0, "size": 0}
+
+        def write(block):
+            if block:
+                state["crc"] = zlib.crc32(block, state["crc"])
+                state["size"] += len(block)
+                if out is not None:
+                    out.write(block)
+
+        try:
+            has_descriptor = bool(flags & ZIP_FLAG_DATA_DESCRIPTOR)
+            try:
+                expected_crc, expected_size = _copy_entry_data(reader, method, has_descriptor, zip64, comp_size, write)
+            except (zlib.error, struct.error) as e:
+                # Flux deflate ou descripteur invalide : même erreur qu'une archive tronquée pour l'appelant
+                raise zipfile.BadZipFile(f"Données corrompues pour {basename} : {e}") from e
+            if expected_crc is None:
+                expected_crc, expected_size = crc, uncomp_size
+            if state["crc"] != expected_crc or state["size"] != expected_size:
+                raise zipfile.BadZipFile(f"Données corrompues pour {basename}.")
+            if out is not None:
+                out.close()
+                out = None
+                os.replace(tmp_path, dest_path)
+                tmp_path = None
+        finally:
+            if out is not None:
+                out.close()
+            if tmp_path is not None and tmp_path.exists():
+                tmp_path.unlink()
+
+        if dest_path is not None:
+            yield dest_path
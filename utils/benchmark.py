@@ -0,0 +1,391 @@
+# Banc d'essai des chemins critiques de la préparation et du rendu.
+#
+# Usage (depuis la racine du projet) :
+#   python -m utils.benchmark                       # mesure complète, affiche le résultat
+#   python -m utils.benchmark --quick               # corpus réduit (12 Mpx), moins d'itérations
+#   python -m utils.benchmark --save-baseline pi4   # enregistre le résultat comme référence "pi4"
+#   python -m utils.benchmark --compare pi4         # compare à la référence "pi4" (code retour 1 si régression)
+#
+# Le corpus synthétique (JPEG 12 à 48 Mpx, portrait et paysage, HEIC si pillow-heif est installé) est
+# généré une seule fois avec une graine fixe : deux exécutions mesurent exactement les mêmes fichiers.
+# Les étapes Pygame tournent sans écran (pilote SDL "dummy"). Pour chaque étape : durée totale,
+# durée par élément (moyenne, p95), débit et pic de mémoire résidente du processus.
+import os
+
+# Avant tout import de Pygame : rendu sans écran et sans carte son
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+import psutil
+from PIL import Image
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+BENCHMARK_DIR = BASE_DIR / "cache" / "benchmark"
+CORPUS_DIR = BENCHMARK_DIR / "corpus"
+BASELINES_DIR = BENCHMARK_DIR / "baselines"
+
+# (nom, largeur, hauteur, format) — 12, 24 et 48 Mpx en paysage et en portrait
+CORPUS_SPEC = [
+    ("landscape_12mp", 4000, 3000, "JPEG"),
+    ("portrait_12mp", 3000, 4000, "JPEG"),
+    ("landscape_24mp", 6000, 4000, "JPEG"),
+    ("portrait_24mp", 4000, 6000, "JPEG"),
+    ("landscape_48mp", 8000, 6000, "JPEG"),
+    ("portrait_48mp", 6000, 8000, "JPEG"),
+    ("landscape_12mp_heic", 4000, 3000, "HEIF"),
+    ("portrait_12mp_heic", 3000, 4000, "HEIF"),
+]
+QUICK_CORPUS = {"landscape_12mp", "portrait_12mp", "landscape_12mp_heic"}
+CORPUS_SEED = 20240501
+SCREEN_SIZE = (1920, 1080)
+FILTERS = ("grayscale", "sepia", "vignette", "vintage", "polaroid_vintage")
+# Une étape est signalée en régression au-delà de +10 % de durée par élément ou de pic mémoire
+REGRESSION_THRESHOLD = 0.10
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+class PeakRssSampler:
+    """Échantillonne la mémoire résidente du processus (et de ses enfants) pendant une étape."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _rss(self):
+        total = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+    def __enter__(self):
+        self.peak = self._rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+# --- Corpus synthétique ---
+
+def _synthetic_photo(width, height, rng):
+    """
+    Image au contenu « photographique » : dégradés et bruit basse fréquence agrandis, plus un grain fin.
+    Le résultat se compresse comme une vraie photo (ni aplat, ni bruit pur).
+    """
+    small = (max(8, width // 64), max(8, height // 64))
+    channels = []
+    for _ in range(3):
+        gradient = Image.linear_gradient("L").rotate(rng.uniform(0, 360)).resize(small)
+        noise = Image.effect_noise(small, rng.uniform(30, 70))
+        channels.append(Image.blend(gradient, noise, 0.5).resize((width, height), Image.Resampling.BICUBIC))
+    image = Image.merge("RGB", channels)
+    grain = Image.effect_noise((width, height), 12).convert("RGB")
+    return Image.blend(image, grain, 0.08)
+
+def _heif_available():
+    try:
+        import pillow_heif
+    except ImportError:
+        return False
+    pillow_heif.register_heif_opener()
+    return True
+
+def build_corpus(quick=False):
+    """Génère (une seule fois) le corpus et retourne la liste des fichiers disponibles."""
+    CORPUS_DIR.mkdir(parents=True, exist_ok=True)
+    heif = _heif_available()
+    files = []
+    for name, width, height, image_format in CORPUS_SPEC:
+        if quick and name not in QUICK_CORPUS:
+            continue
+        if image_format == "HEIF" and not heif:
+            print(f"  (pillow-heif absent : {name} ignoré)")
+            continue
+        path = CORPUS_DIR / f"{name}.{'heic' if image_format == 'HEIF' else 'jpg'}"
+        if not path.exists():
+            print(f"  Génération de {path.name} ({width}x{height})...")
+            rng = random.Random(f"{CORPUS_SEED}-{name}")
+            image = _synthetic_photo(width, height, rng)
+            tmp_path = path.with_name(path.name + ".part")
+            image.save(tmp_path, image_format, quality=90)
+            os.replace(tmp_path, path)
+        files.append(path)
+    return files
+
+# --- Étapes mesurées ---
+
+def _stage_result(durations, peak_rss, units=None, unit_name=None):
+    total = sum(durations)
+    result = {
+        "items": len(durations),
+        "total_s": round(total, 3),
+        "mean_ms": round(total / len(durations) * 1000, 2),
+        "p95_ms": round(_percentile(durations, 95) * 1000, 2),
+        "items_per_s": round(len(durations) / total, 2) if total else None,
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1),
+    }
+    if units is not None:
+        result[f"{unit_name}_per_s"] = round(units / total, 2) if total else None
+    return result
+
+def bench_prepare_photo(corpus, photo_count, work_dir):
+    from utils.prepare_all_photos import prepare_photo, DERIVATIVE_TYPES
+    out_dir = work_dir / "prepared"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    durations = []
+    megapixels = 0.0
+    with PeakRssSampler() as rss:
+        for i in range(photo_count):
+            source = corpus[i % len(corpus)]
+            with Image.open(source) as img:
+                megapixels += img.width * img.height / 1e6
+            start = time.perf_counter()
+            prepare_photo(str(source), str(out_dir / f"{i:04d}.jpg"), *SCREEN_SIZE, derivatives=set(DERIVATIVE_TYPES))
+            durations.append(time.perf_counter() - start)
+    return _stage_result(durations, rss.peak, megapixels, "megapixels")
+
+def _prepared_samples(work_dir, count):
+    """Photos préparées par l'étape prepare_photo (ou préparées ici si elle n'a pas tourné)."""
+    prepared = sorted(p for p in (work_dir / "prepared").glob("*.jpg") if "_" not in p.stem)
+    return prepared[:count]
+
+def bench_postcard_effect(work_dir, iterations):
+    from utils.image_filters import create_postcard_effect
+    samples = _prepared_samples(work_dir, 4)
+    images = []
+    for path in samples:
+        with Image.open(path) as img:
+            images.append(img.convert("RGB"))
+    durations = []
+    with PeakRssSampler() as rss:
+        for i in range(iterations):
+            start = time.perf_counter()
+            create_postcard_effect(images[i % len(images)], caption="Pimmich benchmark")
+            durations.append(time.perf_counter() - start)
+    return _stage_result(durations, rss.peak)
+
+def bench_apply_filter(work_dir, iterations):
+    from utils.image_filters import apply_filter_to_image
+    # apply_filter_to_image attend un chemin sous un dossier "prepared" (sauvegarde dans ".backups")
+    filter_root = work_dir / "filters" / "prepared" / "bench"
+    filter_root.mkdir(parents=True, exist_ok=True)
+    targets = []
+    for path in _prepared_samples(work_dir, 4):
+        target = filter_root / path.name
+        shutil.copy2(path, target)
+        targets.append(target)
+    durations = []
+    with PeakRssSampler() as rss:
+        for i in range(iterations):
+            start = time.perf_counter()
+            apply_filter_to_image(str(targets[i % len(targets)]), FILTERS[i % len(FILTERS)])
+            durations.append(time.perf_counter() - start)
+    return _stage_result(durations, rss.peak)
+
+def bench_playlist_weights(library_size, iterations):
+    import local_slideshow
+    rng = random.Random(CORPUS_SEED)
+    sources = ("immich", "samba", "usb", "telegram")
+    now = int(time.time())
+    media = []
+    for i in range(library_size):
+        source = sources[i % len(sources)]
+        name = f"telegram_{now - rng.randint(0, 30) * 86400}_{i}.jpg" if source == "telegram" else f"photo_{i:06d}.jpg"
+        media.append(str(local_slideshow.PREPARED_BASE_DIR / source / name))
+    favorites = {str(Path(m).relative_to(local_slideshow.PREPARED_BASE_DIR)) for m in rng.sample(media, library_size // 20)}
+    dates_taken = {m: f"20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" for m in media}
+    config = {"favorite_boost_factor": 2, "telegram_boost_enabled": True, "anniversary_boost_enabled": True}
+    durations = []
+    with PeakRssSampler() as rss:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            local_slideshow.build_playlist_weights(media, config, favorites, dates_taken)
+            durations.append(time.perf_counter() - start)
+    result = _stage_result(durations, rss.peak, library_size * iterations, "media")
+    result["library_size"] = library_size
+    return result
+
+def bench_draw_overlay(work_dir, frames):
+    import pygame
+    import local_slideshow
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    font = pygame.font.SysFont("Arial", 72)
+    # Overlay représentatif, sans appel réseau (météo et marées désactivées)
+    config = {
+        "show_clock": True, "show_date": True, "show_weather": False, "show_tides": False,
+        "show_photo_date": True, "show_photo_location": True, "show_country_flag": False,
+        "clock_background_enabled": True, "display_telegram_notification_overlay": False,
+    }
+    metadata = {"date_taken": datetime(2023, 7, 14, 18, 30), "city": "Lyon", "country": "France"}
+    background = None
+    samples = _prepared_samples(work_dir, 1)
+    if samples:
+        with Image.open(samples[0]) as img:
+            rgb = img.convert("RGB").resize(SCREEN_SIZE)
+        background = pygame.image.frombuffer(rgb.tobytes(), SCREEN_SIZE, "RGB").convert()
+    durations = []
+    try:
+        with PeakRssSampler() as rss:
+            for _ in range(frames):
+                if background is not None:
+                    screen.blit(background, (0, 0))
+                start = time.perf_counter()
+                local_slideshow.draw_overlay(screen, *SCREEN_SIZE, config, font, metadata)
+                durations.append(time.perf_counter() - start)
+    finally:
+        pygame.quit()
+    return _stage_result(durations, rss.peak)
+
+# --- Résultats et références ---
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _machine_info():
+    from utils.device_profile import get_profile, get_tiers
+    profile = get_profile()
+    return {
+        "model": profile["model"] or platform.machine(),
+        "cpu_count": profile["cpu_count"],
+        "memory_mb": profile["memory_mb"],
+        "tier": get_tiers(profile)["tier"],
+        "python": platform.python_version(),
+        "pillow": Image.__version__,
+    }
+
+def compare_to_baseline(results, baseline):
+    """Retourne la liste des régressions (étape, mesure, référence, actuel)."""
+    regressions = []
+    for stage, current in results["stages"].items():
+        reference = baseline.get("stages", {}).get(stage)
+        if not reference:
+            continue
+        for metric in ("mean_ms", "peak_rss_mb"):
+            if reference.get(metric) and current.get(metric) and current[metric] > reference[metric] * (1 + REGRESSION_THRESHOLD):
+                regressions.append((stage, metric, reference[metric], current[metric]))
+    return regressions
+
+def print_results(results, baseline=None):
+    print(f"\nCommit {results['commit'] or '?'} — {results['machine']['model']} ({results['machine']['cpu_count']} CPU)")
+    print(f"{'Étape':<22}{'éléments':>9}{'moy. ms':>11}{'p95 ms':>11}{'débit/s':>10}{'pic RSS Mo':>12}{'vs réf.':>10}")
+    for stage, r in results["stages"].items():
+        delta = ""
+        reference = (baseline or {}).get("stages", {}).get(stage)
+        if reference and reference.get("mean_ms"):
+            delta = f"{(r['mean_ms'] / reference['mean_ms'] - 1) * 100:+.1f}%"
+        print(f"{stage:<22}{r['items']:>9}{r['mean_ms']:>11.2f}{r['p95_ms']:>11.2f}{r['items_per_s'] or 0:>10.2f}{r['peak_rss_mb']:>12.1f}{delta:>10}")
+
+def run(args):
+    results = {"commit": _git_commit(), "date": time.strftime("%Y-%m-%d %H:%M:%S"), "machine": _machine_info(), "quick": args.quick, "stages": {}}
+    stages = set(args.stages.split(",")) if args.stages else None
+
+    def wanted(name):
+        return stages is None or name in stages
+
+    print("Préparation du corpus synthétique...")
+    corpus = build_corpus(quick=args.quick)
+    photo_count = args.photos if args.photos is not None else (10 if args.quick else 100)
+    iterations = 10 if args.quick else 50
+
+    work_dir = Path(tempfile.mkdtemp(prefix="pimmich_bench_"))
+    try:
+        # prepare_photo fournit les images préparées des étapes suivantes : au moins une passe sur le corpus
+        if wanted("prepare_photo"):
+            print(f"prepare_photo ({photo_count} photos)...")
+            results["stages"]["prepare_photo"] = bench_prepare_photo(corpus, photo_count, work_dir)
+        else:
+            bench_prepare_photo(corpus, min(len(corpus), 4), work_dir)
+        if wanted("create_postcard_effect"):
+            print("create_postcard_effect...")
+            results["stages"]["create_postcard_effect"] = bench_postcard_effect(work_dir, iterations)
+        if wanted("apply_filter_to_image"):
+            print("apply_filter_to_image...")
+            results["stages"]["apply_filter_to_image"] = bench_apply_filter(work_dir, iterations)
+        if wanted("build_playlist_weights"):
+            print("build_playlist_weights...")
+            results["stages"]["build_playlist_weights"] = bench_playlist_weights(2000 if args.quick else 20000, 5 if args.quick else 20)
+        if wanted("draw_overlay"):
+            print("draw_overlay (pilote SDL dummy)...")
+            results["stages"]["draw_overlay"] = bench_draw_overlay(work_dir, 120 if args.quick else 600)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai de la préparation des photos et du rendu du diaporama.")
+    parser.add_argument("--quick", action="store_true", help="Corpus réduit (12 Mpx) et moins d'itérations.")
+    parser.add_argument("--photos", type=int, help="Nombre de photos préparées par l'étape prepare_photo (100 par défaut).")
+    parser.add_argument("--stages", help="Étapes à mesurer, séparées par des virgules (toutes par défaut).")
+    parser.add_argument("--save-baseline", metavar="NOM", help="Enregistre le résultat comme référence NOM.")
+    parser.add_argument("--compare", metavar="NOM", help="Compare à la référence NOM ; code retour 1 en cas de régression.")
+    parser.add_argument("--output", help="Écrit aussi le résultat brut (JSON) dans ce fichier.")
+    args = parser.parse_args()
+
+    # Les modules du projet utilisent des chemins relatifs à la racine (config/, static/)
+    os.chdir(BASE_DIR)
+    sys.path.insert(0, str(BASE_DIR))
+
+    baseline = None
+    if args.compare:
+        baseline_path = BASELINES_DIR / f"{args.compare}.json"
+        if not baseline_path.exists():
+            parser.error(f"Référence introuvable : {baseline_path}")
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = run(args)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.save_baseline:
+        BASELINES_DIR.mkdir(parents=True, exist_ok=True)
+        baseline_path = BASELINES_DIR / f"{args.save_baseline}.json"
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nRéférence enregistrée : {baseline_path}")
+    if baseline is not None:
+        regressions = compare_to_baseline(results, baseline)
+        if regressions:
+            print(f"\n⚠️ Régressions par rapport à '{args.compare}' (commit {baseline.get('commit') or '?'}) :")
+            for stage, metric, reference, current in regressions:
+                print(f"  {stage} : {metric} {reference} -> {current}")
+            sys.exit(1)
+        print(f"\nAucune régression par rapport à '{args.compare}'.")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,20 @@
+# Configuration de Pimmich (config/config.json).
+#
+# Le ConfigStore garde en mémoire un snapshot immuable de la configuration fusionnée avec les valeurs
+# par défaut, numéroté par une version qui s'incrémente à chaque changement de contenu. Le fichier
+# n'est relu que si son inode, sa date de modification ou sa taille ont changé (un stat par lecture),
+# et il est écrit de façon atomique. Savoir si la configuration a changé revient à comparer deux
+# entiers ; les abonnés (diaporama, workers, contrôle vocal) sont rappelés à chaque nouvelle version.
+import copy
 import json
 import os
+import time
+import logging
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'config.json')
 
@@ -23,6 +38,11 @@ def create_default_config():
         "transition_type": "fade",
         "transition_duration": 1.0,
         "transition_fps": "auto",
+        # Statistiques de rendu (durées par phase, frames perdues) affichées à l'écran pour le débogage
+        "slideshow_debug_hud": False,
+        # Pré-chargement des prochaines photos du diaporama (0 pour désactiver)
+        "slideshow_prefetch_count": 2,
+        "slideshow_prefetch_memory_mb": 96,
         "video_audio_enabled": False,
         "video_audio_output": "auto",
         "video_audio_volume": 100,
@@ -73,6 +93,8 @@ def create_default_config():
         "info_display_duration": 5,
         "screen_height_percent": 100,
         "favorite_boost_factor": 2,
+        # Nombre de médias récents qui ne peuvent pas être tirés à nouveau (limité à la moitié de la bibliothèque)
+        "slideshow_no_repeat_window": 50,
         "video_hwdec_enabled": False,
         "telegram_bot_enabled": False,
         "telegram_bot_token": "",
@@ -112,54 +134,258 @@ def create_default_config():
         # --- Telegram notification in overlay --- 
         "display_telegram_notification_overlay": True,
         "anniversary_boost_enabled": True,
-        "anniversary_boost_factor": 2
+        "anniversary_boost_factor": 2,
+
+        # --- Préparation parallèle des médias ---
+        "prepare_workers": "auto",
+        "prepare_worker_memory_mb": 400,
+        # Vidéos préparées en même temps, dans une file séparée des photos (remux ou transcodage ffmpeg)
+        "prepare_video_workers": 1,
+        # Déclinaisons générées à la préparation, surchargeables par source (ex: "samba": {"postcard": False})
+        "prepare_derivatives": {
+            "default": {"polaroid": True, "postcard": True}
+        }
     }
 
-_config_cache = None
-_last_config_load = 0
+def _freeze(value):
+    """Copie en lecture seule d'une valeur JSON (dictionnaires figés, listes en tuples)."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
 
-def load_config():
-    """Charge la configuration depuis le fichier et la fusionne avec les valeurs par défaut."""
-    global _config_cache, _last_config_load
-    import time
-    if _config_cache is not None and (time.time() - _last_config_load < 2.0):
-        return _config_cache
-
-    default_config = create_default_config()
-    
-    if not os.path.exists(CONFIG_PATH):
-        # Si le fichier de config n'existe pas, on le crée avec les valeurs par défaut.
-        save_config(default_config)
-        _config_cache = default_config
-        _last_config_load = time.time()
-        return default_config
+def _thaw(value):
+    """Copie modifiable d'une valeur figée par _freeze."""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+class ConfigSnapshot(Mapping):
+    """
+    Configuration à un instant donné, en lecture seule : partagée sans copie entre threads.
+    `version` identifie le contenu ; to_dict() retourne une copie modifiable (pour save_config).
+    """
+    __slots__ = ("_data", "version")
+
+    def __init__(self, data, version):
+        self._data = _freeze(data)
+        self.version = version
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"ConfigSnapshot(version={self.version}, {len(self._data)} clés)"
+
+    def to_dict(self):
+        return _thaw(self._data)
+
+class ConfigStore:
+    """Source unique de la configuration d'un processus (voir l'en-tête du module)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self._raw = None      # Dernier contenu fusionné, pour ne changer de version que si le contenu change
+        self._stamp = None    # (inode, date de modification, taille) du fichier lu
+        self._subscribers = []
+        self._watch_thread = None
+
+    @property
+    def version(self):
+        return self.snapshot().version
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def snapshot(self, check=True):
+        """
+        Snapshot courant. Avec check=False, aucun appel système : l'appelant sait déjà que
+        le fichier n'a pas changé (ex: la surveillance inotify du diaporama n'a rien signalé).
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and (not check or self._file_stamp() == self._stamp):
+            return snapshot
+        return self.refresh()
+
+    def refresh(self):
+        """Relit le fichier s'il a changé depuis la dernière lecture et retourne le snapshot courant."""
+        changed = None
+        with self._lock:
+            stamp = self._file_stamp()
+            if self._snapshot is not None and stamp == self._stamp:
+                return self._snapshot
+            defaults = create_default_config()
+            if stamp is None:
+                # Si le fichier de config n'existe pas, on le crée avec les valeurs par défaut.
+                merged = defaults
+                self._write(merged)
+                stamp = self._file_stamp()
+            else:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        user_config = json.load(f)
+                    # Fusionne la configuration utilisateur avec la configuration par défaut.
+                    # Cela garantit que les nouvelles clés de configuration sont ajoutées
+                    # sans écraser les réglages existants de l'utilisateur.
+                    merged = defaults
+                    merged.update(user_config)
+                except (json.JSONDecodeError, IOError) as e:
+                    # En cas de fichier corrompu ou illisible, on garde la dernière configuration valide
+                    # (ou celle par défaut) pour éviter un crash de l'application.
+                    print(f"Avertissement: Impossible de charger {self.path} ({e}). Conservation de la dernière configuration valide.")
+                    merged = self._raw if self._raw is not None else defaults
+            self._stamp = stamp
+            changed = self._replace(merged)
+            snapshot = self._snapshot
+        if changed is not None:
+            self._notify(changed)
+        return snapshot
+
+    def save(self, config):
+        """Écrit la configuration (fichier temporaire puis renommage atomique) et publie la nouvelle version."""
+        # Copie : l'appelant peut continuer à modifier son dictionnaire sans toucher au snapshot publié
+        config = config.to_dict() if isinstance(config, ConfigSnapshot) else copy.deepcopy(config)
+        with self._lock:
+            self._write(config)
+            self._stamp = self._file_stamp()
+            merged = create_default_config()
+            merged.update(config)
+            changed = self._replace(merged)
+        if changed is not None:
+            self._notify(changed)
+
+    def invalidate(self):
+        """Force la relecture du fichier au prochain accès (le numéro de version ne change que si le contenu change)."""
+        with self._lock:
+            self._stamp = None
 
+    def _write(self, config):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(config, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _replace(self, merged):
+        """Publie `merged` sous une nouvelle version si son contenu diffère. Retourne le nouveau snapshot, sinon None."""
+        if self._snapshot is not None and merged == self._raw:
+            return None
+        version = self._snapshot.version + 1 if self._snapshot is not None else 1
+        self._raw = merged
+        self._snapshot = ConfigSnapshot(merged, version)
+        # Le premier chargement n'est pas un changement : les abonnés ne sont rappelés qu'ensuite
+        return self._snapshot if version > 1 else None
+
+    # --- Abonnements ---
+    def subscribe(self, callback):
+        """
+        Rappelle callback(snapshot) à chaque nouvelle version, dans le thread qui l'a détectée.
+        Retourne une fonction de désabonnement.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def _notify(self, snapshot):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"[Config] Erreur dans un abonné aux changements de configuration : {e}", exc_info=True)
+
+    def watch(self, interval=5.0):
+        """
+        Démarre (une seule fois) un thread qui vérifie le fichier toutes les `interval` secondes :
+        les modifications faites par un autre processus déclenchent aussi les abonnés.
+        """
+        with self._lock:
+            if self._watch_thread is not None:
+                return
+            self._watch_thread = threading.Thread(target=self._run_watch, args=(interval,), name="config-watcher", daemon=True)
+            self._watch_thread.start()
+
+    def _run_watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.snapshot()
+            except Exception as e:
+                logger.warning(f"[Config] Erreur lors de la vérification de la configuration : {e}")
+
+config_store = ConfigStore(CONFIG_PATH)
+
+def get_config():
+    """Snapshot de la configuration, en lecture seule et sans copie. Préférer à load_config() pour lire."""
+    return config_store.snapshot()
+
+def config_version():
+    """Numéro de version de la configuration : deux valeurs égales garantissent un contenu identique."""
+    return config_store.version
+
+def subscribe_config(callback):
+    """Rappelle callback(snapshot) à chaque changement de la configuration. Retourne la fonction de désabonnement."""
+    return config_store.subscribe(callback)
+
+def wait_for_config_change(keys, timeout):
+    """
+    Attend jusqu'à `timeout` secondes. Retourne le nouveau snapshot dès que l'une des clés `keys`
+    change de valeur, ou None si le délai expire sans changement.
+    """
+    current = config_store.snapshot()
+    initial = {key: current.get(key) for key in keys}
+    changed = threading.Event()
+    result = []
+
+    def on_change(snapshot):
+        if any(snapshot.get(key) != value for key, value in initial.items()):
+            result.append(snapshot)
+            changed.set()
+
+    unsubscribe = config_store.subscribe(on_change)
     try:
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            user_config = json.load(f)
-        
-        # Fusionne la configuration utilisateur avec la configuration par défaut.
-        # Cela garantit que les nouvelles clés de configuration sont ajoutées
-        # sans écraser les réglages existants de l'utilisateur.
-        merged_config = default_config.copy()
-        merged_config.update(user_config)
-        _config_cache = merged_config
-        _last_config_load = time.time()
-        return merged_config
-    except (json.JSONDecodeError, IOError) as e:
-        # En cas de fichier corrompu ou illisible, on retourne la config par défaut
-        # pour éviter un crash de l'application.
-        print(f"Avertissement: Impossible de charger {CONFIG_PATH} ({e}). Utilisation de la configuration par défaut.")
-        _config_cache = default_config
-        _last_config_load = time.time()
-        return default_config
+        changed.wait(timeout)
+    finally:
+        unsubscribe()
+    return result[-1] if result else None
+
+def load_config():
+    """Charge la configuration fusionnée avec les valeurs par défaut. Retourne une copie modifiable."""
+    return config_store.snapshot().to_dict()
+
+def invalidate_config_cache():
+    """Force la relecture du fichier au prochain accès (ex: modification signalée par la surveillance des fichiers)."""
+    config_store.invalidate()
 
 def save_config(config):
-    """Sauvegarde la configuration dans un fichier JSON."""
-    global _config_cache, _last_config_load
-    import time
-    os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
-    with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=4, ensure_ascii=False)
-    _config_cache = config
-    _last_config_load = time.time()
+    """Sauvegarde la configuration dans un fichier JSON (écriture atomique)."""
+    config_store.save(config)
@@ -0,0 +1,238 @@
+# Profil matériel de l'appareil.
+#
+# Le modèle de Raspberry Pi, le nombre de cœurs, la RAM, les encodeurs/décodeurs matériels de ffmpeg
+# et les sorties vidéo de mpv sont détectés une seule fois puis enregistrés dans cache/device_profile.json.
+# Le profil n'est recalculé que si l'empreinte de l'appareil change (autre modèle, autre RAM, ffmpeg ou
+# mpv mis à jour). Les sous-systèmes ne lisent que les niveaux dérivés (get_tiers) : filtre de
+# redimensionnement, stratégie de flou, nombre de workers, FPS et résolution des transitions, encodeur vidéo.
+#
+# Un calibrage facultatif (python -m utils.device_profile --calibrate) mesure le redimensionnement et le
+# flou sur l'appareil : s'il existe, c'est lui qui classe l'appareil plutôt que le seul modèle de Pi.
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PROFILE_PATH = BASE_DIR / 'cache' / 'device_profile.json'
+PROFILE_VERSION = 1
+
+# Codecs matériels recherchés dans les listes de ffmpeg, par ordre de préférence
+HARDWARE_ENCODERS = ("h264_v4l2m2m", "h264_omx")
+HARDWARE_DECODERS = ("h264_v4l2m2m", "hevc_v4l2m2m", "h264_mmal")
+# Sorties vidéo de mpv utilisées par le lecteur du diaporama
+MPV_VIDEO_OUTPUTS = ("dmabuf-wayland", "gpu", "x11")
+# Calibrage : au-delà de cette durée (redimensionnement LANCZOS d'une photo 12 Mpx en 1080p), l'appareil est classé "low"
+LOW_TIER_LANCZOS_MS = 900
+
+_lock = threading.Lock()
+_profile = None
+
+def _read_model():
+    try:
+        with open('/proc/device-tree/model', 'r') as f:
+            return f.read().strip('\x00\n ')
+    except FileNotFoundError:
+        # Pas un Raspberry Pi ou un système où ce fichier n'existe pas
+        return None
+    except Exception as e:
+        logger.info(f"[Device] Erreur lors de la lecture du modèle : {e}")
+        return None
+
+def _pi_model(model_str):
+    """Numéro du modèle de Raspberry Pi (1 pour Zero et modèles non reconnus), ou None."""
+    if not model_str:
+        return None
+    for number in (4, 5, 3, 2):
+        if f'Raspberry Pi {number}' in model_str:
+            return number
+    if 'Zero' in model_str or 'Raspberry Pi' in model_str:
+        return 1
+    return None
+
+def _binary_stamp(name):
+    path = shutil.which(name)
+    if path is None:
+        return None
+    try:
+        return f"{path}:{os.stat(path).st_mtime_ns}"
+    except OSError:
+        return path
+
+def _fingerprint(model_str):
+    """Empreinte peu coûteuse de l'appareil : un changement impose une nouvelle détection."""
+    return {
+        "model": model_str,
+        "cpu_count": os.cpu_count() or 1,
+        "memory_mb": psutil.virtual_memory().total // (1024 * 1024),
+        "ffmpeg": _binary_stamp('ffmpeg'),
+        "mpv": _binary_stamp('mpv'),
+    }
+
+def _ffmpeg_codecs(kind):
+    """Noms des codecs listés par `ffmpeg -encoders` ou `ffmpeg -decoders`."""
+    if shutil.which('ffmpeg') is None:
+        return set()
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', f'-{kind}'], capture_output=True, text=True, check=True, timeout=20)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"[Device] Impossible de lister les {kind} de ffmpeg : {e}")
+        return set()
+    # Lignes de la forme " V....D h264_v4l2m2m   V4L2 mem2mem H.264 encoder wrapper"
+    return {parts[1] for parts in (line.split() for line in result.stdout.splitlines()) if len(parts) >= 2}
+
+def _mpv_video_outputs():
+    if shutil.which('mpv') is None:
+        return []
+    try:
+        result = subprocess.run(['mpv', '--no-config', '--vo=help'], capture_output=True, text=True, timeout=20)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"[Device] Impossible de lister les sorties vidéo de mpv : {e}")
+        return []
+    available = {line.split()[0] for line in result.stdout.splitlines() if line.startswith('  ') and line.strip()}
+    return [vo for vo in MPV_VIDEO_OUTPUTS if vo in available]
+
+def detect_profile():
+    """Sonde l'appareil (lent : lance ffmpeg et mpv). Préférer get_profile(), qui met le résultat en cache."""
+    model_str = _read_model()
+    fingerprint = _fingerprint(model_str)
+    encoders = _ffmpeg_codecs('encoders')
+    decoders = _ffmpeg_codecs('decoders')
+    return {
+        "version": PROFILE_VERSION,
+        "fingerprint": fingerprint,
+        "detected_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "model": model_str,
+        "pi_model": _pi_model(model_str),
+        "cpu_count": fingerprint["cpu_count"],
+        "memory_mb": fingerprint["memory_mb"],
+        "hw_encoders": [name for name in HARDWARE_ENCODERS if name in encoders],
+        "hw_decoders": [name for name in HARDWARE_DECODERS if name in decoders],
+        "mpv_video_outputs": _mpv_video_outputs(),
+        "calibration": None,
+    }
+
+def _load_saved():
+    try:
+        with open(PROFILE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save(profile):
+    try:
+        PROFILE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = PROFILE_PATH.with_name(f"{PROFILE_PATH.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, PROFILE_PATH)
+    except OSError as e:
+        logger.warning(f"[Device] Impossible d'enregistrer le profil matériel : {e}")
+
+def get_profile(refresh=False):
+    """Profil matériel, détecté au premier appel de l'appareil puis relu depuis le cache (une fois par processus)."""
+    global _profile
+    with _lock:
+        if _profile is not None and not refresh:
+            return _profile
+        saved = _load_saved()
+        model_str = _read_model()
+        if (not refresh and saved and saved.get("version") == PROFILE_VERSION
+                and saved.get("fingerprint") == _fingerprint(model_str)):
+            _profile = saved
+            return _profile
+
+        profile = detect_profile()
+        # Le calibrage reste valable tant que le matériel est le même (mise à jour de ffmpeg, par exemple)
+        if saved and saved.get("calibration") and saved.get("model") == profile["model"] and saved.get("cpu_count") == profile["cpu_count"]:
+            profile["calibration"] = saved["calibration"]
+        _save(profile)
+        logger.info(
+            f"[Device] Profil détecté : {profile['model'] or 'appareil inconnu'}, {profile['cpu_count']} cœur(s), "
+            f"{profile['memory_mb']} Mo, encodeurs {profile['hw_encoders'] or 'logiciels'}, sorties mpv {profile['mpv_video_outputs']}."
+        )
+        _profile = profile
+        return _profile
+
+def get_tiers(profile=None):
+    """
+    Réglages dérivés du profil, consommés par la préparation et le diaporama.
+    Sans calibrage, les Pi 1 à 3 sont classés "low" ; avec, c'est la vitesse mesurée qui décide.
+    """
+    profile = profile or get_profile()
+    calibration = profile.get("calibration")
+    if calibration:
+        low_end = calibration["lanczos_ms"] > LOW_TIER_LANCZOS_MS
+    else:
+        low_end = profile["pi_model"] in (1, 2, 3)
+    # Encodeur matériel uniquement sur Raspberry Pi (les encodeurs génériques d'un PC sont moins fiables)
+    video_encoder = "libx264"
+    if profile["pi_model"] and profile["hw_encoders"]:
+        video_encoder = profile["hw_encoders"][0]
+    return {
+        "tier": "low" if low_end else "standard",
+        "resample_filter": "bilinear" if low_end else "lanczos",
+        "blur_strategy": "downscaled" if low_end else "full",
+        "transition_fps": 30 if low_end else 60,
+        "transition_scale": 0.5 if low_end else 1.0,
+        "prepare_workers": profile["cpu_count"],  # Plafonné ensuite par la RAM disponible
+        "video_encoder": video_encoder,
+    }
+
+def _best_time_ms(action, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 1)
+
+def calibrate():
+    """
+    Mesure une seule fois les opérations coûteuses de la préparation sur cet appareil
+    et enregistre le résultat dans le profil. Retourne le profil mis à jour.
+    """
+    from PIL import Image, ImageFilter
+    photo = Image.effect_noise((4000, 3000), 40).convert('RGB')
+    background = Image.effect_noise((1920, 1080), 40).convert('RGB')
+    calibration = {
+        "lanczos_ms": _best_time_ms(lambda: photo.resize((1440, 1080), Image.Resampling.LANCZOS)),
+        "bilinear_ms": _best_time_ms(lambda: photo.resize((1440, 1080), Image.Resampling.BILINEAR)),
+        "blur_ms": _best_time_ms(lambda: background.filter(ImageFilter.GaussianBlur(radius=50))),
+        "calibrated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    del photo, background
+
+    global _profile
+    profile = dict(get_profile(), calibration=calibration)
+    with _lock:
+        _save(profile)
+        _profile = profile
+    logger.info(f"[Device] Calibrage : LANCZOS {calibration['lanczos_ms']} ms, bilinéaire {calibration['bilinear_ms']} ms, flou {calibration['blur_ms']} ms.")
+    return profile
+
+def main():
+    parser = argparse.ArgumentParser(description="Affiche le profil matériel et les réglages qui en découlent.")
+    parser.add_argument("--refresh", action="store_true", help="Force une nouvelle détection du matériel.")
+    parser.add_argument("--calibrate", action="store_true", help="Mesure les performances de l'appareil (une dizaine de secondes).")
+    args = parser.parse_args()
+
+    profile = get_profile(refresh=args.refresh)
+    if args.calibrate:
+        profile = calibrate()
+    json.dump({"profile": profile, "tiers": get_tiers(profile)}, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+if __name__ == "__main__":
+    main()
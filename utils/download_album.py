@@ -1,20 +1,41 @@
 import os
 import random
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import shutil
 import time
 import json
 import logging
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from logging.handlers import RotatingFileHandler
 
-from utils.archive_manager import unzip_archive, clean_archive
+from utils.archive_manager import stream_extract_zip
+from utils.prepare_all_photos import invalidate_prepared_files
 from .config_manager import load_config
 
 # Définir le chemin du cache pour le mappage des descriptions
 CACHE_DIR = Path("cache")
 CACHE_DIR.mkdir(exist_ok=True)
 DESCRIPTION_MAP_CACHE_FILE = CACHE_DIR / "immich_description_map.json"
+# Manifeste de synchronisation incrémentale (asset id -> fichier local, checksum, updatedAt)
+SYNC_MANIFEST_FILE = CACHE_DIR / "immich_sync_manifest.json"
+MANIFEST_SAVE_INTERVAL = 25
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# Au-delà de ce nombre de fichiers à récupérer, on passe par une archive extraite en flux
+ARCHIVE_MIN_ASSETS = 20
+
+# Client HTTP Immich : connexions simultanées, nouvelles tentatives et backoff (en secondes)
+IMMICH_MAX_CONNECTIONS = 8
+IMMICH_RETRIES = 3
+IMMICH_RETRY_BACKOFF = 0.5
+DETAIL_PROGRESS_STEP = 25
+
+CANCEL_FLAG = Path('/tmp/pimmich_cancel_import.flag')
+MEDIA_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.heic', '.heif', '.mp4', '.mov', '.avi', '.mkv')
 
 # ============================================================
 # Configuration du logging avec émojis
@@ -113,47 +134,155 @@ def yield_and_log(
     return data
 
 
-def download_album_archive_local(server_url, api_key, asset_ids, zip_path):
+def load_sync_manifest():
     """
-    Télécharge l'archive ZIP contenant les assets demandés.
-    Remplace la fonction de utils.archive_manager pour plus de contrôle et de logs.
+    Charge le manifeste de synchronisation Immich (asset id -> fichier local, checksum, updatedAt).
+    Retourne un manifeste vide si le fichier est absent ou illisible.
     """
-    # Endpoint standard pour les versions récentes d'Immich
-    url = f"{server_url}/api/download/archive"
-    
-    headers = {
-        'Accept': 'application/octet-stream',
-        'Content-Type': 'application/json',
-        'x-api-key': api_key
-    }
-    
-    payload = {
-        "assetIds": asset_ids
-    }
-    
     try:
-        # On augmente le timeout à 60s pour la connexion et 300s (5min) pour la lecture
-        # car la génération du zip côté serveur peut être longue pour beaucoup de photos
-        with requests.post(url, json=payload, headers=headers, stream=True, timeout=(60, 300)) as response:
+        with open(SYNC_MANIFEST_FILE, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict) and isinstance(manifest.get("assets"), dict):
+            return manifest
+        logger.warning("[Sync] Manifeste de synchronisation invalide, il sera reconstruit.")
+    except FileNotFoundError:
+        pass
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"[Sync] Impossible de lire le manifeste de synchronisation : {e}")
+    return {"version": 1, "assets": {}}
+
+
+def save_sync_manifest(manifest):
+    """Écrit le manifeste de manière atomique (fichier temporaire puis renommage)."""
+    tmp_path = SYNC_MANIFEST_FILE.with_suffix(".json.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, SYNC_MANIFEST_FILE)
+    except OSError as e:
+        logger.error(f"[Sync] Impossible d'enregistrer le manifeste de synchronisation : {e}")
+
+
+def asset_is_unchanged(previous, asset):
+    """
+    Compare un asset Immich avec son entrée dans le manifeste.
+    Le checksum (SHA-1 du fichier original) fait foi ; updatedAt ne sert que s'il est absent.
+    """
+    checksum = asset.get("checksum")
+    if checksum:
+        return previous.get("checksum") == checksum
+    return previous.get("updatedAt") == asset.get("updatedAt")
+
+
+def download_asset_original(session, server_url, asset_id, dest_path):
+    """
+    Télécharge le fichier original d'un asset via /api/assets/{id}/original.
+    Le fichier est écrit dans un .part puis renommé : une interruption ne laisse
+    jamais de fichier tronqué à la place de la photo.
+    """
+    url = f"{server_url}/api/assets/{asset_id}/original"
+    tmp_path = dest_path.with_name(dest_path.name + ".part")
+    try:
+        with session.get(url, stream=True, timeout=(10, 120)) as response:
             if response.status_code != 200:
-                logger.error(f"Erreur API Immich ({response.status_code}): {response.text}")
                 return False, f"Erreur API: {response.status_code}"
-            
-            with open(zip_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192): 
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                     f.write(chunk)
-        
+        os.replace(tmp_path, dest_path)
         return True, "OK"
-        
     except requests.exceptions.Timeout:
-        logger.error("Timeout lors du téléchargement de l'archive Immich.")
-        return False, "Timeout serveur (trop long)"
+        return False, "Timeout serveur"
     except Exception as e:
-        logger.error(f"Exception lors du téléchargement: {e}")
         return False, str(e)
+    finally:
+        if tmp_path.exists():
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+
+
+def download_album_archive_local(session, server_url, asset_ids, resolve_dest):
+    """
+    Télécharge l'archive ZIP contenant les assets demandés et l'extrait au fil de sa réception.
+    Remplace la fonction de utils.archive_manager pour plus de contrôle et de logs :
+    aucun fichier ZIP n'est écrit sur la carte SD.
+
+    resolve_dest(nom) retourne le chemin de destination d'une entrée (ou None pour l'ignorer).
+    Produit le Path de chaque fichier extrait ; lève une exception en cas d'échec.
+    """
+    # Endpoint standard pour les versions récentes d'Immich
+    url = f"{server_url}/api/download/archive"
+
+    # On augmente le timeout à 60s pour la connexion et 300s (5min) pour la lecture
+    # car la génération du zip côté serveur peut être longue pour beaucoup de photos
+    with session.post(
+        url,
+        json={"assetIds": asset_ids},
+        headers={"Accept": "application/octet-stream"},
+        stream=True,
+        timeout=(60, 300),
+    ) as response:
+        if response.status_code != 200:
+            logger.error(f"Erreur API Immich ({response.status_code}): {response.text}")
+            raise requests.exceptions.HTTPError(f"Erreur API: {response.status_code}", response=response)
+
+        yield from stream_extract_zip(
+            response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE), resolve_dest
+        )
+
+
+def create_immich_session(api_key, pool_size=IMMICH_MAX_CONNECTIONS):
+    """
+    Crée une session HTTP partagée pour tous les appels Immich d'une synchronisation :
+    connexions keep-alive réutilisées et nouvelles tentatives avec backoff exponentiel
+    sur les erreurs réseau et les réponses 429/5xx.
+    """
+    session = requests.Session()
+    if api_key:
+        session.headers.update({"x-api-key": api_key})
+    retry = Retry(
+        total=IMMICH_RETRIES,
+        backoff_factor=IMMICH_RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        # /api/search/* est en POST mais ne modifie rien côté serveur
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_asset_detail(session, server_url, asset_light):
+    """Récupère les détails complets (exifInfo...) d'un asset, ou l'asset partiel en cas d'échec."""
+    asset_id = asset_light.get("id")
+    try:
+        response = session.get(f"{server_url}/api/assets/{asset_id}", timeout=10)
+        if response.status_code == 200:
+            return response.json()
+        logger.warning(f"[Sync] Détails indisponibles pour l'asset {asset_id} ({response.status_code}).")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.warning(f"[Sync] Détails indisponibles pour l'asset {asset_id} : {e}")
+    return asset_light  # Fallback si l'API échoue
+
+
+def download_and_extract_album(config, on_file_ready=None):
+    """
+    Synchronise static/photos/immich avec l'album (ou la sélection aléatoire) Immich.
+    on_file_ready(chemin), si fourni, est appelé pour chaque fichier dès sa réception
+    afin que la préparation démarre pendant le téléchargement.
+    """
+    session = create_immich_session(config.get("immich_token"))
+    try:
+        yield from _sync_immich_assets(config, session, on_file_ready)
+    finally:
+        session.close()
 
 
-def download_and_extract_album(config):
+def _sync_immich_assets(config, session, on_file_ready):
     server_url = config.get("immich_url")
     api_key = config.get("immich_token")
     album_name = config.get("album_name")
@@ -194,8 +323,6 @@ def download_and_extract_album(config):
     )
     time.sleep(0.5)
 
-    headers = {"x-api-key": api_key}
-
     # Modification Sigalou 25/01/2026 - Gestion mode album OU mode aléatoire
     if album_name and album_name.strip():
         # MODE ALBUM : Récupérer les photos d'un album spécifique
@@ -209,7 +336,7 @@ def download_and_extract_album(config):
         album_list_url = f"{server_url}/api/albums"
 
         try:
-            response = requests.get(album_list_url, headers=headers, timeout=10)
+            response = session.get(album_list_url, timeout=10)
             response.raise_for_status()
         except requests.exceptions.RequestException as e:
             yield yield_and_log(
@@ -260,7 +387,7 @@ def download_and_extract_album(config):
             }
             
             try:
-                response = requests.post(assets_url, headers=headers, json=payload, timeout=30)
+                response = session.post(assets_url, json=payload, timeout=30)
                 response.raise_for_status()
                 data = response.json()
                 # Les assets retournés par POST /api/search/metadata sont imbriqués sous la clé "assets"
@@ -309,9 +436,7 @@ def download_and_extract_album(config):
         payload = {"size": size}
 
         try:
-            response = requests.post(
-                random_url, headers=headers, json=payload, timeout=30
-            )
+            response = session.post(random_url, json=payload, timeout=30)
             response.raise_for_status()
             assets_light = response.json()
 
@@ -319,21 +444,24 @@ def download_and_extract_album(config):
 
             # Modification Sigalou 25/01/2026 - Enrichir avec les détails complets via API asset
             # L'API /search/random ne renvoie pas les exifInfo, donc on appelle /assets/{id} pour chaque photo
-            assets = []
-            for i, asset_light in enumerate(assets_light):
-                asset_id = asset_light.get("id")
-                if asset_id:
-                    try:
-                        asset_detail_url = f"{server_url}/api/assets/{asset_id}"
-                        detail_response = requests.get(
-                            asset_detail_url, headers=headers, timeout=10
+            # (en parallèle, sur les connexions partagées de la session)
+            assets_light = [asset for asset in assets_light if asset.get("id")]
+            nb_light = len(assets_light)
+            assets = [None] * nb_light
+            with ThreadPoolExecutor(max_workers=IMMICH_MAX_CONNECTIONS) as executor:
+                futures = {
+                    executor.submit(fetch_asset_detail, session, server_url, asset_light): index
+                    for index, asset_light in enumerate(assets_light)
+                }
+                for done_count, future in enumerate(as_completed(futures), start=1):
+                    assets[futures[future]] = future.result()
+                    if done_count % DETAIL_PROGRESS_STEP == 0 or done_count == nb_light:
+                        yield yield_and_log(
+                            msg_type="progress",
+                            stage="FETCHING_ASSETS",
+                            percent=4 + int(done_count / nb_light * 7),
+                            message=f"Détails des photos : {done_count}/{nb_light}",
                         )
-                        if detail_response.status_code == 200:
-                            assets.append(detail_response.json())
-                        else:
-                            assets.append(asset_light)  # Fallback si l'API échoue
-                    except Exception:
-                        assets.append(asset_light)  # Fallback en cas d'erreur
             # Fin Modification Sigalou 25/01/2026
 
         except requests.exceptions.RequestException as e:
@@ -345,16 +473,68 @@ def download_and_extract_album(config):
 
     # Fin Modification Sigalou 25/01/2026
 
+    if not assets:
+        yield yield_and_log(
+            msg_type="error",
+            message="Aucune photo accessible.",
+        )
+        return
+
+    photos_folder = Path("static") / "photos" / "immich"
+    prepared_folder = Path("static") / "prepared" / "immich"
+
+    # Créer les dossiers de destination s'ils n'existent pas (on ne les supprime plus pour préserver le cache)
+    photos_folder.mkdir(parents=True, exist_ok=True)
+    prepared_folder.mkdir(parents=True, exist_ok=True)
+
+    # Comparer la liste des assets avec le manifeste local pour ne télécharger
+    # que les nouveautés et les fichiers modifiés côté Immich
+    manifest = load_sync_manifest()
+    known_assets = manifest["assets"]
+    # nom de fichier local -> asset qui l'occupait à la synchronisation précédente
+    previous_owners = {entry["filename"]: asset_id for asset_id, entry in known_assets.items()}
+    local_names = {}  # asset_id -> nom de fichier local
+    # Les assets déjà connus et toujours présents gardent leur nom, quel que soit l'ordre de l'album :
+    # un nouvel asset au même nom d'origine ne doit pas le leur prendre (renommage et re-téléchargement)
+    album_ids = {asset.get("id") for asset in assets}
+    used_names = {entry["filename"] for asset_id, entry in known_assets.items() if asset_id in album_ids}
+    to_download = []
+
+    for asset in assets:
+        asset_id = asset.get("id")
+        original_filename = asset.get("originalFileName")
+        if not asset_id or not original_filename or asset_id in local_names:
+            continue
+
+        previous = known_assets.get(asset_id)
+        if previous is not None:
+            local_name = previous["filename"]
+        else:
+            local_name = os.path.basename(original_filename)
+            if local_name in used_names:
+                # Deux assets différents peuvent porter le même nom d'origine
+                stem, ext = os.path.splitext(local_name)
+                local_name = f"{stem}_{asset_id[:8]}{ext}"
+            used_names.add(local_name)
+        local_names[asset_id] = local_name
+
+        if (
+            previous is None
+            or not asset_is_unchanged(previous, asset)
+            or not (photos_folder / local_name).is_file()
+        ):
+            to_download.append(asset)
+
     # Modification Sigalou 26/01/2026 - Cache COMPLET exifInfo (RAW)
     filename_to_metadata_map = {}
     total_assets = 0
     photos_with_metadata = 0
 
     for asset in assets:
-        total_assets += 1
-        original_filename = asset.get("originalFileName")
-        if not original_filename:
+        local_name = local_names.get(asset.get("id"))
+        if not local_name:
             continue
+        total_assets += 1
 
         # ⚡ STOCKE TOUT exifInfo brut (sans filtrage)
         exif_info = asset.get("exifInfo", {})
@@ -363,7 +543,7 @@ def download_and_extract_album(config):
         if exif_info:
             photos_with_metadata += 1
 
-        filename_to_metadata_map[original_filename] = exif_info  # ← SIMPLE !
+        filename_to_metadata_map[local_name] = exif_info  # ← SIMPLE !
 
     # Sauvegarde
     try:
@@ -387,91 +567,164 @@ def download_and_extract_album(config):
         )
     # Fin Modification Sigalou 26/01/2026
 
-    asset_ids = [asset["id"] for asset in assets]
-    if not asset_ids:
-        yield yield_and_log(
-            msg_type="error",
-            message="Aucune photo accessible.",
-        )
-        return
-
-    nb_photos = len(asset_ids)
+    nb_photos = len(local_names)
+    nb_to_download = len(to_download)
     yield yield_and_log(
         msg_type="progress",
         stage="DOWNLOADING",
         percent=16,
-        message=f"Téléchargement de l'archive ({nb_photos} photos)...",
+        message=(
+            f"{nb_to_download} nouvelle(s) photo(s) à télécharger "
+            f"({nb_photos - nb_to_download} déjà à jour)."
+        ),
     )
 
-    zip_path = "temp_album.zip"
+    downloaded_count = 0
+    failed_count = 0
+    processed_count = 0
 
-    try:
-        success, error_msg = download_album_archive_local(server_url, api_key, asset_ids, zip_path)
-        if not success:
-            yield yield_and_log(
-                msg_type="error",
-                message=f"Échec du téléchargement de l'archive : {error_msg}",
-            )
-            return
+    def register_download(asset):
+        """Enregistre un fichier reçu dans le manifeste et le transmet à la préparation."""
+        nonlocal downloaded_count
+        asset_id = asset["id"]
+        local_name = local_names[asset_id]
 
-    except Exception as e:
-        yield yield_and_log(
-            msg_type="error",
-            message=f"Erreur critique lors du téléchargement : {str(e)}",
-        )
-        return
+        # Un fichier remplacé doit être préparé à nouveau : asset modifié, ou nom repris par un autre asset
+        if asset_id in known_assets or previous_owners.get(local_name, asset_id) != asset_id:
+            invalidate_prepared_files(prepared_folder, local_name)
 
-    # yield {"type": "progress", "stage": "EXTRACTING", "percent": 20, "message": "Extraction des photos..."}
+        known_assets[asset_id] = {
+            "filename": local_name,
+            "checksum": asset.get("checksum"),
+            "updatedAt": asset.get("updatedAt"),
+        }
+        downloaded_count += 1
 
-    photos_folder = os.path.join("static", "photos", "immich")
-    prepared_folder = os.path.join("static", "prepared", "immich")
+        # Sauvegarde régulière pour reprendre proprement après une interruption
+        if downloaded_count % MANIFEST_SAVE_INTERVAL == 0:
+            save_sync_manifest(manifest)
 
-    # Créer les dossiers de destination s'ils n'existent pas (on ne les supprime plus pour préserver le cache)
-    os.makedirs(photos_folder, exist_ok=True)
-    os.makedirs(prepared_folder, exist_ok=True)
+        if on_file_ready is not None:
+            try:
+                on_file_ready(photos_folder / local_name)
+            except Exception as e:
+                logger.warning(f"[Sync] Préparation immédiate impossible pour {local_name} : {e}")
 
-    # Lire la liste des fichiers contenus dans l'archive zip avant l'extraction
-    import zipfile
-    zip_files_set = set()
-    try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            for name in zip_ref.namelist():
-                zip_files_set.add(os.path.basename(name))
-    except Exception as e:
-        logger.error(f"[Sync] Erreur lors de la lecture de l'archive ZIP : {e}")
+    def download_progress(local_name):
+        return yield_and_log(
+            msg_type="progress",
+            stage="DOWNLOADING",
+            percent=16 + int(processed_count / nb_to_download * 8),
+            message=f"Téléchargement {processed_count}/{nb_to_download} : {local_name}",
+        )
+
+    def cancelled():
+        return yield_and_log(
+            msg_type="warning",
+            message="Téléchargement annulé par l'utilisateur.",
+        )
 
     try:
-        unzip_archive(zip_path, photos_folder)
-        clean_archive(zip_path)
-
-        # Nettoyage intelligent : supprimer les fichiers locaux du dossier source
-        # qui ne sont plus présents dans l'album Immich (le fichier zip)
-        if zip_files_set:
-            local_files = os.listdir(photos_folder)
-            deleted_count = 0
-            for local_file in local_files:
-                if os.path.isfile(os.path.join(photos_folder, local_file)):
-                    # Ne vérifier que les fichiers médias correspondants
-                    if local_file.lower().endswith(('.jpg', '.jpeg', '.png', '.heic', '.heif', '.mp4', '.mov', '.avi', '.mkv')):
-                        if local_file not in zip_files_set:
-                            try:
-                                os.remove(os.path.join(photos_folder, local_file))
-                                deleted_count += 1
-                            except OSError as e:
-                                logger.error(f"[Sync] Impossible de supprimer le fichier obsolète {local_file} : {e}")
-            if deleted_count > 0:
-                logger.info(f"[Sync] {deleted_count} photo(s) obsolète(s) supprimée(s) du dossier source.")
-    except Exception as e:
+        received_ids = set()
+
+        # Beaucoup de fichiers à récupérer (première synchro) : une seule archive,
+        # extraite au fil de sa réception sans passer par un fichier ZIP temporaire
+        if nb_to_download >= ARCHIVE_MIN_ASSETS:
+            pending_by_name = {}
+            for asset in to_download:
+                original_name = os.path.basename(asset["originalFileName"])
+                pending_by_name.setdefault(original_name, deque()).append(asset)
+            assets_by_dest = {}
+
+            def resolve_dest(entry_name):
+                # Immich suffixe les homonymes dans l'archive : ceux-là seront récupérés un par un
+                candidates = pending_by_name.get(entry_name)
+                if not candidates:
+                    return None
+                asset = candidates.popleft()
+                dest_path = photos_folder / local_names[asset["id"]]
+                assets_by_dest[dest_path] = asset
+                return dest_path
+
+            try:
+                archive_ids = [asset["id"] for asset in to_download]
+                for dest_path in download_album_archive_local(session, server_url, archive_ids, resolve_dest):
+                    asset = assets_by_dest.pop(dest_path)
+                    received_ids.add(asset["id"])
+                    processed_count += 1
+                    register_download(asset)
+                    yield download_progress(dest_path.name)
+                    if os.path.exists(CANCEL_FLAG):
+                        yield cancelled()
+                        return
+            except (requests.exceptions.RequestException, zipfile.BadZipFile, OSError) as e:
+                yield yield_and_log(
+                    msg_type="warning",
+                    message=f"Archive interrompue ({e}), téléchargement individuel des photos restantes.",
+                )
+
+        for asset in to_download:
+            if asset["id"] in received_ids:
+                continue
+            if os.path.exists(CANCEL_FLAG):
+                yield cancelled()
+                return
+
+            local_name = local_names[asset["id"]]
+            processed_count += 1
+            success, error_msg = download_asset_original(
+                session, server_url, asset["id"], photos_folder / local_name
+            )
+            if not success:
+                failed_count += 1
+                logger.error(f"[Sync] Échec du téléchargement de {local_name} : {error_msg}")
+                continue
+
+            register_download(asset)
+            yield download_progress(local_name)
+    finally:
+        save_sync_manifest(manifest)
+
+    if to_download and downloaded_count == 0:
         yield yield_and_log(
             msg_type="error",
-            message=f"Erreur lors de l'extraction : {str(e)}",
+            message=f"Échec du téléchargement des {nb_to_download} photo(s) depuis Immich.",
         )
         return
 
+    if failed_count:
+        yield yield_and_log(
+            msg_type="warning",
+            message=f"{failed_count} photo(s) n'ont pas pu être téléchargées, nouvel essai à la prochaine synchronisation.",
+        )
+
+    # Nettoyage intelligent : supprimer les fichiers locaux du dossier source
+    # qui ne sont plus présents dans l'album Immich
+    current_names = set(local_names.values())
+    deleted_count = 0
+    for local_path in photos_folder.iterdir():
+        if not local_path.is_file():
+            continue
+        # Ne vérifier que les fichiers médias correspondants
+        if local_path.suffix.lower() in MEDIA_EXTENSIONS and local_path.name not in current_names:
+            try:
+                local_path.unlink()
+                deleted_count += 1
+            except OSError as e:
+                logger.error(f"[Sync] Impossible de supprimer le fichier obsolète {local_path.name} : {e}")
+    if deleted_count > 0:
+        logger.info(f"[Sync] {deleted_count} photo(s) obsolète(s) supprimée(s) du dossier source.")
+
+    # Oublier les assets qui ne font plus partie de la sélection
+    for asset_id in list(known_assets):
+        if asset_id not in local_names:
+            del known_assets[asset_id]
+    save_sync_manifest(manifest)
+
     yield yield_and_log(
         msg_type="done",
         stage="DOWNLOAD_COMPLETE",
         percent=24,
-        message=f"{nb_photos} photos prêtes pour préparation.",
-        extra={"total_downloaded": nb_photos},
+        message=f"{nb_photos} photos prêtes pour préparation ({downloaded_count} téléchargée(s)).",
+        extra={"total_downloaded": downloaded_count},
     )
@@ -0,0 +1,222 @@
+# Surveillance des fichiers utilisés par le diaporama.
+#
+# Un thread reçoit les notifications inotify (ou, à défaut, compare périodiquement les dates de
+# modification) et incrémente un compteur par type d'événement : configuration modifiée, nouvelle
+# carte postale, bibliothèque modifiée. La boucle d'affichage compare simplement ces compteurs :
+# tant que rien ne change, elle ne fait aucun appel au système de fichiers.
+import os
+import ctypes
+import ctypes.util
+import errno
+import select
+import struct
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CONFIG_CHANGED = "config_changed"
+NEW_POSTCARD = "new_postcard"
+LIBRARY_CHANGED = "library_changed"
+
+# Constantes inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+def _load_inotify():
+    """Retourne la libc si elle expose inotify (Linux), sinon None."""
+    libc_name = ctypes.util.find_library("c")
+    if not libc_name:
+        return None
+    try:
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+class FileWatcher:
+    """
+    Surveille le dossier de configuration, le drapeau de nouvelle carte postale et les dossiers préparés.
+    version(type) retourne un compteur incrémenté à chaque changement : chaque consommateur
+    mémorise la dernière version vue, plusieurs boucles peuvent donc suivre le même événement.
+    """
+
+    def __init__(self, config_dir, config_files, postcard_flag, prepared_dir, poll_interval=2.0):
+        self.config_dir = Path(config_dir)
+        self.config_files = set(config_files)
+        self.postcard_flag = Path(postcard_flag)
+        self.prepared_dir = Path(prepared_dir)
+        self.poll_interval = poll_interval
+        self._versions = {CONFIG_CHANGED: 0, NEW_POSTCARD: 0, LIBRARY_CHANGED: 0}
+        self._postcard_present = self.postcard_flag.exists()
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+        self._libc = None
+        self._watches = {}  # descripteur de surveillance -> dossier
+        self.mode = None
+
+    # --- Lecture depuis la boucle d'affichage (aucun appel système) ---
+    def version(self, kind):
+        return self._versions[kind]
+
+    @property
+    def postcard_pending(self):
+        return self._postcard_present
+
+    def acknowledge_postcard(self):
+        """À appeler après la suppression du drapeau : évite de rejouer la carte avant l'arrivée de l'événement."""
+        self._postcard_present = False
+
+    # --- Cycle de vie ---
+    def start(self):
+        if self._thread is not None:
+            return
+        if self._start_inotify():
+            self.mode = "inotify"
+            target = self._run_inotify
+        else:
+            self.mode = "polling"
+            target = self._run_polling
+        logger.info(f"[FileWatcher] Surveillance des fichiers en mode {self.mode}.")
+        self._thread = threading.Thread(target=target, name="file-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=3)
+            self._thread = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _notify(self, kind):
+        self._versions[kind] += 1
+
+    # --- inotify ---
+    def _start_inotify(self):
+        self._libc = _load_inotify()
+        if self._libc is None:
+            return False
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.warning(f"[FileWatcher] inotify indisponible ({os.strerror(ctypes.get_errno())}), passage en mode scrutation.")
+            return False
+        self._fd = fd
+        watched = [self.config_dir, self.postcard_flag.parent, self.prepared_dir]
+        if self.prepared_dir.is_dir():
+            watched += [d for d in self.prepared_dir.iterdir() if d.is_dir()]
+        for directory in watched:
+            directory.mkdir(parents=True, exist_ok=True)
+            if not self._add_watch(directory):
+                os.close(fd)
+                self._fd = None
+                return False
+        return True
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            logger.warning(f"[FileWatcher] Impossible de surveiller {directory} ({os.strerror(err)}).")
+            return err == errno.ENOENT  # Dossier disparu entre-temps : sans gravité
+        self._watches[wd] = Path(directory)
+        return True
+
+    def _run_inotify(self):
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select([self._fd], [], [], 1.0)
+                if not ready:
+                    continue
+                data = os.read(self._fd, 64 * 1024)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    continue
+                logger.error(f"[FileWatcher] Erreur de lecture inotify : {e}")
+                return
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                offset += EVENT_HEADER.size + length
+                self._handle_event(wd, mask, os.fsdecode(name))
+
+    def _handle_event(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            # Événements perdus : on considère que tout a pu changer
+            self._postcard_present = self.postcard_flag.exists()
+            for kind in self._versions:
+                self._notify(kind)
+            return
+        directory = self._watches.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            del self._watches[wd]
+            return
+
+        if directory == self.config_dir and name in self.config_files:
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE):
+                self._notify(CONFIG_CHANGED)
+        if directory == self.postcard_flag.parent and name == self.postcard_flag.name:
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self._postcard_present = True
+                self._notify(NEW_POSTCARD)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._postcard_present = False
+        if directory == self.prepared_dir:
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_watch(directory / name)
+            if mask & IN_ISDIR:
+                self._notify(LIBRARY_CHANGED)
+        elif directory.parent == self.prepared_dir and not name.endswith((".part", ".tmp")):
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE | IN_DELETE_SELF):
+                self._notify(LIBRARY_CHANGED)
+
+    # --- Scrutation (repli) ---
+    def _snapshot(self):
+        def mtime(path):
+            try:
+                return path.stat().st_mtime_ns
+            except OSError:
+                return None
+        config_state = tuple(mtime(self.config_dir / name) for name in sorted(self.config_files))
+        library_state = [mtime(self.prepared_dir)]
+        if self.prepared_dir.is_dir():
+            library_state += [(d.name, mtime(d)) for d in sorted(self.prepared_dir.iterdir()) if d.is_dir()]
+        return config_state, self.postcard_flag.exists(), tuple(library_state)
+
+    def _run_polling(self):
+        config_state, postcard_present, library_state = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            try:
+                new_config, new_postcard, new_library = self._snapshot()
+            except OSError as e:
+                logger.warning(f"[FileWatcher] Erreur de scrutation : {e}")
+                continue
+            if new_config != config_state:
+                self._notify(CONFIG_CHANGED)
+            if new_postcard and not postcard_present:
+                self._notify(NEW_POSTCARD)
+            self._postcard_present = new_postcard
+            if new_library != library_state:
+                self._notify(LIBRARY_CHANGED)
+            config_state, postcard_present, library_state = new_config, new_postcard, new_library
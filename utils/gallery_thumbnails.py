@@ -0,0 +1,120 @@
+# Vignettes de la galerie web et de l'éditeur de playlists.
+#
+# La préparation enregistre, pour chaque image préparée (base, polaroid, carte postale, vignette vidéo),
+# une petite version de THUMBNAIL_SIZE px sur son côté le plus court, en WebP (JPEG si Pillow est compilé
+# sans WebP). Les vignettes vont dans static/.thumbnails/<source>/ et non à côté des images préparées :
+# les dossiers préparés sont surveillés par le diaporama, une vignette écrite à la demande y déclencherait
+# une reconstruction de la playlist. Les bibliothèques préparées avant les vignettes sont complétées à la
+# demande (ensure_thumbnail), de même qu'une vignette plus ancienne que son image (filtre, texte ajouté).
+# Une image préparée hors de static/prepared (banc d'essai, dossier temporaire) n'a pas de vignette.
+import os
+import logging
+import threading
+from pathlib import Path
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / 'static'
+PREPARED_DIR = STATIC_DIR / 'prepared'
+THUMBNAILS_DIR = STATIC_DIR / '.thumbnails'
+
+THUMBNAIL_SIZE = 320
+# Images préparées qui peuvent avoir une vignette dans la galerie
+VARIANT_SUFFIXES = ("", "_polaroid", "_postcard", "_thumbnail")
+
+_format = None
+
+def thumbnail_format():
+    """(format Pillow, extension, type MIME) des vignettes : WebP si disponible, sinon JPEG."""
+    global _format
+    if _format is None:
+        if features.check('webp'):
+            _format = ('WEBP', '.webp', 'image/webp')
+        else:
+            _format = ('JPEG', '.jpg', 'image/jpeg')
+    return _format
+
+def thumbnail_path(prepared_path):
+    """static/prepared/<source>/<nom>.jpg -> static/.thumbnails/<source>/<nom>.webp, ou None hors de static/prepared."""
+    prepared_path = Path(prepared_path).resolve()
+    try:
+        relative = prepared_path.relative_to(PREPARED_DIR)
+    except ValueError:
+        return None
+    return THUMBNAILS_DIR / relative.parent / f"{prepared_path.stem}{thumbnail_format()[1]}"
+
+def thumbnail_version(prepared_path):
+    """Version à mettre dans l'URL de la vignette : change dès que l'image préparée est réécrite. None si elle n'existe pas."""
+    try:
+        return f"{os.stat(prepared_path).st_mtime_ns:x}"
+    except OSError:
+        return None
+
+def _thumbnail_size(width, height):
+    scale = THUMBNAIL_SIZE / min(width, height)
+    if scale >= 1.0:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def save_thumbnail(image, prepared_path):
+    """
+    Enregistre la vignette d'une image déjà en mémoire (la préparation l'appelle juste après l'image préparée).
+    Retourne None, sans rien écrire, pour une image hors de static/prepared.
+    """
+    dest = thumbnail_path(prepared_path)
+    if dest is None:
+        return None
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    small = image.resize(_thumbnail_size(*image.size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    if small.mode != 'RGB':
+        small = small.convert('RGB')
+    pil_format = thumbnail_format()[0]
+    # Fichier temporaire propre au thread : plusieurs requêtes peuvent générer la même vignette
+    tmp_path = dest.with_name(f"{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        if pil_format == 'WEBP':
+            small.save(tmp_path, 'WEBP', quality=75, method=4)
+        else:
+            small.save(tmp_path, 'JPEG', quality=80, optimize=True)
+        os.replace(tmp_path, dest)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return dest
+
+def ensure_thumbnail(prepared_path):
+    """
+    Retourne le chemin d'une vignette à jour, générée depuis l'image préparée si elle est absente ou plus ancienne.
+    Retourne None si l'image préparée n'existe pas ou est hors de static/prepared.
+    """
+    prepared_path = Path(prepared_path)
+    dest = thumbnail_path(prepared_path)
+    if dest is None:
+        return None
+    try:
+        prepared_mtime = os.stat(prepared_path).st_mtime_ns
+    except OSError:
+        return None
+    try:
+        if os.stat(dest).st_mtime_ns >= prepared_mtime:
+            return dest
+    except OSError:
+        pass
+    with Image.open(prepared_path) as img:
+        # JPEG : décodage directement réduit (1/2, 1/4...) à une taille qui couvre encore la vignette
+        img.draft('RGB', _thumbnail_size(*img.size))
+        return save_thumbnail(img, prepared_path)
+
+def remove_thumbnails(prepared_folder, stem):
+    """Supprime les vignettes d'un média préparé et de ses déclinaisons."""
+    for suffix in VARIANT_SUFFIXES:
+        path = thumbnail_path(Path(prepared_folder) / f"{stem}{suffix}.jpg")
+        if path is None:
+            return
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"[Thumbnails] Impossible de supprimer {path} : {e}")
@@ -216,6 +216,12 @@ def create_polaroid_effect(image_content):
     
     return content_with_frame
 
+def _discard_pan_zoom_master(image_path):
+    """La version pan/zoom, calculée depuis l'original, ne reflète pas la retouche : le diaporama agrandira l'image de base."""
+    pan_zoom_path = image_path.with_name(f"{image_path.stem}_panzoom.jpg")
+    if pan_zoom_path.is_file():
+        pan_zoom_path.unlink()
+
 def apply_filter_to_image(image_path_str, filter_name):
     """
     Applique un filtre à une image et la sauvegarde.
@@ -332,6 +338,7 @@ def apply_filter_to_image(image_path_str, filter_name):
         img_to_save.save(image_path, 'JPEG', quality=90, optimize=True, exif=exif_bytes)
     else:
         img_to_save.save(image_path, 'JPEG', quality=90, optimize=True)
+    _discard_pan_zoom_master(image_path)
 
 def add_text_to_image(image_path_str, text):
     """
@@ -452,6 +459,7 @@ def add_text_to_image(image_path_str, text):
         img_to_save.save(image_path, 'JPEG', quality=90, optimize=True, exif=exif_bytes)
     else:
         img_to_save.save(image_path, 'JPEG', quality=90, optimize=True)
+    _discard_pan_zoom_master(image_path)
 
 def add_text_to_polaroid(polaroid_path_str, text):
     """
@@ -1,15 +1,106 @@
 import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import smbclient
 from smbprotocol.exceptions import SMBException
 
+from utils.prepare_all_photos import invalidate_prepared_files
+
 TARGET_DIR = Path("static/photos/samba")
 ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.heic', '.heif'}
+CANCEL_FLAG = Path('/tmp/pimmich_cancel_import.flag')
+
+# Moteur de transfert : copies simultanées et taille des lectures (une lecture SMB = un aller-retour réseau)
+SMB_COPY_WORKERS = 4
+SMB_READ_BUFFER = 1024 * 1024
+# Dossiers techniques des NAS (vignettes Synology, corbeilles) à ne jamais parcourir
+IGNORED_DIRECTORIES = {'@eaDir', '#recycle', '#snapshot', '$RECYCLE.BIN', 'System Volume Information'}
+# Séparateur utilisé pour aplatir les sous-dossiers dans le nom local (le dossier local reste à plat)
+SUBFOLDER_SEPARATOR = "__"
 
 def is_image_file(filename):
     return Path(filename).suffix.lower() in ALLOWED_EXTENSIONS
 
+def is_same_file(remote, local):
+    """Compare (mtime, taille) distants et locaux, à la seconde près (précision variable selon le système de fichiers)."""
+    if local is None:
+        return False
+    return int(remote[0]) == int(local[0]) and remote[1] == local[1]
+
+def open_samba_session(server, user, password):
+    """
+    Ouvre une session authentifiée unique pour toute la synchronisation.
+    Retourne les arguments à passer aux appels smbclient : vides si la session est enregistrée,
+    les identifiants sinon (anciennes versions de smbclient sans register_session).
+    """
+    register_session = getattr(smbclient, "register_session", None)
+    if register_session is None:
+        return {"username": user, "password": password}
+    register_session(server, username=user, password=password, connection_timeout=15)
+    return {}
+
+def close_samba_session(server):
+    delete_session = getattr(smbclient, "delete_session", None)
+    if delete_session is None:
+        return
+    try:
+        delete_session(server)
+    except Exception:
+        pass
+
+def list_remote_images(root_path, auth):
+    """
+    Parcourt le partage (sous-dossiers compris) avec un seul scandir par dossier :
+    la date et la taille arrivent avec le listing, sans stat supplémentaire par fichier.
+    Retourne ({nom_local: (chemin_distant, mtime, taille)}, nombre d'entrées lues, avertissements).
+    """
+    remote_files = {}
+    warnings = []
+    entry_count = 0
+    pending = [(root_path, ())]
+    while pending:
+        folder, parts = pending.pop()
+        try:
+            entries = list(smbclient.scandir(folder, **auth))
+        except SMBException as e:
+            if not parts:
+                raise
+            warnings.append(f"Impossible de lire le dossier {'/'.join(parts)}: {e}")
+            continue
+        for entry in entries:
+            entry_count += 1
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir():
+                if entry.name not in IGNORED_DIRECTORIES:
+                    pending.append((entry.path, parts + (entry.name,)))
+                continue
+            if not is_image_file(entry.name):
+                continue
+            stat_info = entry.stat()
+            local_name = SUBFOLDER_SEPARATOR.join(parts + (entry.name,))
+            remote_files[local_name] = (entry.path, stat_info.st_mtime, stat_info.st_size)
+    return remote_files, entry_count, warnings
+
+def copy_remote_file(remote_path, dest_file, remote_mtime, auth):
+    """Copie un fichier distant via un .part (une copie interrompue ne passe jamais pour un fichier à jour)."""
+    tmp_file = dest_file.with_name(dest_file.name + ".part")
+    try:
+        with smbclient.open_file(remote_path, mode='rb', buffering=SMB_READ_BUFFER, **auth) as remote_f:
+            with open(tmp_file, 'wb') as local_f:
+                shutil.copyfileobj(remote_f, local_f, SMB_READ_BUFFER)
+        # Mettre à jour la date de modification du fichier local pour correspondre au distant
+        os.utime(tmp_file, (remote_mtime, remote_mtime))
+        os.replace(tmp_file, dest_file)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+
+def format_throughput(num_bytes, elapsed):
+    return f"{num_bytes / (1024 * 1024) / max(elapsed, 0.001):.1f} Mo/s"
+
 def import_samba_photos(config):
     """
     Synchronise les photos depuis un partage Samba et retourne des objets structurés pour le suivi.
@@ -34,45 +125,46 @@ def import_samba_photos(config):
     yield {"type": "progress", "stage": "CONNECTING", "percent": 5, "message": f"Connexion à {full_samba_path}..."}
 
     try:
-        # On ne gère plus les sessions manuellement pour être compatible avec d'anciennes versions de smbclient.
-        # Les identifiants sont passés directement aux fonctions.
-        if not smbclient.path.exists(full_samba_path, username=user, password=password, connection_timeout=15):
+        # Une seule session authentifiée, réutilisée par le listing et par toutes les copies
+        auth = open_samba_session(server, user, password)
+        if not smbclient.path.exists(full_samba_path, connection_timeout=15, **auth):
             yield {"type": "error", "message": f"Le chemin Samba est introuvable : {full_samba_path}"}
             return
 
         # --- Phase 1: Lister les fichiers distants et locaux ---
         yield {"type": "progress", "stage": "SCANNING", "percent": 10, "message": "Analyse des fichiers distants et locaux..."}
-        
-        # Vider les dossiers de destination (source et préparé) avant l'import pour éviter les mélanges.
+
+        # Les copies locales et les versions préparées sont conservées : seul le différentiel est traité.
         prepared_samba_dir = Path("static/prepared/samba")
-        if TARGET_DIR.exists():
-            shutil.rmtree(TARGET_DIR)
         TARGET_DIR.mkdir(parents=True, exist_ok=True)
-        if prepared_samba_dir.exists():
-            shutil.rmtree(prepared_samba_dir)
         prepared_samba_dir.mkdir(parents=True, exist_ok=True)
 
-        # Récupérer les fichiers distants avec leur date de modification
-        remote_files = {}
-        for filename in smbclient.listdir(full_samba_path, username=user, password=password):
-            if is_image_file(filename):
-                try:
-                    remote_file_path = os.path.join(full_samba_path, filename)
-                    if smbclient.path.isfile(remote_file_path, username=user, password=password):
-                        stat_info = smbclient.stat(remote_file_path, username=user, password=password)
-                        remote_files[filename] = stat_info.st_mtime
-                except Exception as e:
-                    yield {"type": "warning", "message": f"Impossible d'accéder aux informations de {filename}: {e}"}
-
-        # Récupérer les fichiers locaux avec leur date de modification
-        TARGET_DIR.mkdir(parents=True, exist_ok=True)
-        local_files = {f.name: f.stat().st_mtime for f in TARGET_DIR.iterdir() if f.is_file()}
+        # Récupérer les fichiers distants avec leur date de modification et leur taille
+        scan_start = time.monotonic()
+        remote_files, entry_count, scan_warnings = list_remote_images(full_samba_path, auth)
+        scan_elapsed = time.monotonic() - scan_start
+        for warning in scan_warnings:
+            yield {"type": "warning", "message": warning}
+        yield {
+            "type": "info",
+            "message": f"{len(remote_files)} photos trouvées ({entry_count} entrées lues en {scan_elapsed:.1f} s, {entry_count / max(scan_elapsed, 0.001):.0f} entrées/s).",
+            "entries_per_second": round(entry_count / max(scan_elapsed, 0.001)),
+        }
+
+        # Récupérer les fichiers locaux avec leur date de modification et leur taille
+        local_files = {}
+        with os.scandir(TARGET_DIR) as entries:
+            for entry in entries:
+                if entry.is_file() and is_image_file(entry.name):
+                    stat_info = entry.stat()
+                    local_files[entry.name] = (stat_info.st_mtime, stat_info.st_size)
 
         # --- Phase 2: Déterminer les actions à effectuer ---
-        files_to_copy = {f for f, mtime in remote_files.items() if f not in local_files or mtime > local_files.get(f, 0)}
+        # La date locale est recopiée depuis le serveur après chaque copie : une date ou une taille différente signale une modification.
+        files_to_copy = {f for f, (_, mtime, size) in remote_files.items() if not is_same_file((mtime, size), local_files.get(f))}
         files_to_delete = {f for f in local_files if f not in remote_files}
 
-        # --- Phase 3: Supprimer les fichiers locaux obsolètes ---
+        # --- Phase 3: Supprimer les fichiers locaux obsolètes et leurs versions préparées ---
         if files_to_delete:
             yield {"type": "progress", "stage": "CLEANING", "percent": 15, "message": f"Suppression de {len(files_to_delete)} photos obsolètes..."}
             for filename in files_to_delete:
@@ -80,40 +172,63 @@ def import_samba_photos(config):
                     (TARGET_DIR / filename).unlink()
                 except OSError as e:
                     yield {"type": "warning", "message": f"Impossible de supprimer {filename}: {e}"}
+                invalidate_prepared_files(prepared_samba_dir, filename)
 
         # --- Phase 4: Copier les fichiers nouveaux ou modifiés ---
         total_to_copy = len(files_to_copy)
         if total_to_copy == 0:
             yield {"type": "info", "message": "Aucune nouvelle photo à importer. Le dossier est à jour."}
-            yield {"type": "done", "stage": "IMPORT_COMPLETE", "percent": 100, "message": "Synchronisation terminée. Aucune nouvelle photo."}
+            yield {"type": "done", "stage": "IMPORT_COMPLETE", "percent": 100, "message": "Synchronisation terminée. Aucune nouvelle photo.",
+                   "total_imported": 0, "total_deleted": len(files_to_delete)}
             return
 
-        yield {"type": "stats", "stage": "COPYING", "percent": 20, "message": f"Début de la copie de {total_to_copy} photos...", "total": total_to_copy}
+        total_bytes = sum(remote_files[f][2] for f in files_to_copy)
+        yield {"type": "stats", "stage": "COPYING", "percent": 20, "message": f"Début de la copie de {total_to_copy} photos...",
+               "total": total_to_copy, "total_bytes": total_bytes}
+
+        copied = 0
+        copied_bytes = 0
+        copy_start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=SMB_COPY_WORKERS) as executor:
+            futures = {}
+            for filename in sorted(files_to_copy):
+                remote_path, remote_mtime, _ = remote_files[filename]
+                futures[executor.submit(copy_remote_file, remote_path, TARGET_DIR / filename, remote_mtime, auth)] = filename
+
+            for i, future in enumerate(as_completed(futures), 1):
+                filename = futures[future]
+                if CANCEL_FLAG.exists():
+                    for pending in futures:
+                        pending.cancel()
+                    yield {"type": "warning", "message": "Import annulé par l'utilisateur."}
+                    return
+                try:
+                    future.result()
+                except Exception as e:
+                    yield {"type": "warning", "message": f"Impossible de copier {filename}: {str(e)}"}
+                    continue
 
-        for i, filename in enumerate(sorted(list(files_to_copy)), 1):
-            source_file = os.path.join(full_samba_path, filename)
-            dest_file = TARGET_DIR / filename
-            
-            try:
-                with smbclient.open_file(source_file, mode='rb', username=user, password=password) as remote_f:
-                    with open(dest_file, 'wb') as local_f:
-                        shutil.copyfileobj(remote_f, local_f)
-                
-                # Mettre à jour la date de modification du fichier local pour correspondre au distant
-                os.utime(dest_file, (remote_files[filename], remote_files[filename]))
+                # Une photo modifiée sur le partage doit être préparée à nouveau
+                if filename in local_files:
+                    invalidate_prepared_files(prepared_samba_dir, filename)
+                copied += 1
+                copied_bytes += remote_files[filename][2]
 
+                throughput = format_throughput(copied_bytes, time.monotonic() - copy_start)
                 percent = 20 + int((i / total_to_copy) * 60) # La copie représente 60% de la barre (de 20% à 80%)
                 yield {
                     "type": "progress", "stage": "COPYING", "percent": percent,
-                    "message": f"Copie en cours... ({i}/{total_to_copy})",
-                    "current": i, "total": total_to_copy
+                    "message": f"Copie en cours... ({i}/{total_to_copy}, {throughput})",
+                    "current": i, "total": total_to_copy, "throughput": throughput
                 }
-            except Exception as e:
-                yield {"type": "warning", "message": f"Impossible de copier {filename}: {str(e)}"}
 
-        yield {"type": "done", "stage": "IMPORT_COMPLETE", "percent": 80, "message": f"{total_to_copy} photos synchronisées.", "total_imported": total_to_copy}
+        throughput = format_throughput(copied_bytes, time.monotonic() - copy_start)
+        yield {"type": "done", "stage": "IMPORT_COMPLETE", "percent": 80, "message": f"{copied} photos synchronisées ({throughput}).",
+               "total_imported": copied, "total_deleted": len(files_to_delete), "throughput": throughput}
 
     except SMBException as e:
         yield {"type": "error", "message": f"Erreur Samba : {str(e)}"}
     except Exception as e:
-        yield {"type": "error", "message": f"Erreur inattendue : {str(e)}"}
\ No newline at end of file
+        yield {"type": "error", "message": f"Erreur inattendue : {str(e)}"}
+    finally:
+        close_samba_session(server)
@@ -5,14 +5,109 @@ import subprocess
 from pathlib import Path
 import tempfile
 import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.prepare_all_photos import invalidate_prepared_files
 
 CANCEL_FLAG = Path('/tmp/pimmich_cancel_import.flag')
 TARGET_DIR = Path("static/photos/usb")
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif"}
+# Manifeste des imports précédents (chemin sur la clé, taille, date, empreinte du contenu)
+USB_MANIFEST_FILE = Path("cache") / "usb_import_manifest.json"
+USB_COPY_WORKERS = 3
+COPY_BUFFER_SIZE = 1024 * 1024
+IGNORED_DIRECTORIES = {'System Volume Information', '$RECYCLE.BIN', 'LOST.DIR'}
 
 def is_image_file(filename):
     return Path(filename).suffix.lower() in ALLOWED_EXTENSIONS
 
+def load_usb_manifest():
+    """
+    Charge le manifeste d'import USB :
+    - entries : chemin sur la clé -> taille, date et empreinte du contenu
+    - files : empreinte -> fichier local (une seule copie par contenu)
+    Les fichiers locaux disparus sont oubliés pour être copiés à nouveau.
+    """
+    manifest = {"version": 1, "entries": {}, "files": {}}
+    try:
+        with open(USB_MANIFEST_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get("version") == 1:
+            manifest["entries"] = data.get("entries", {})
+            manifest["files"] = {
+                content_hash: info for content_hash, info in data.get("files", {}).items()
+                if (TARGET_DIR / info["filename"]).is_file()
+            }
+    except FileNotFoundError:
+        pass
+    except (json.JSONDecodeError, OSError, KeyError, TypeError) as e:
+        print(f"Manifeste USB illisible, import complet : {e}")
+    return manifest
+
+def save_usb_manifest(manifest):
+    """Écrit le manifeste de façon atomique (fichier temporaire puis renommage)."""
+    USB_MANIFEST_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = USB_MANIFEST_FILE.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, USB_MANIFEST_FILE)
+
+def copy_with_hash(file_path, size, known_sizes, known_hashes):
+    """
+    Copie un fichier de la clé dans un .part en calculant son empreinte au passage (une seule lecture).
+    Si sa taille correspond à une photo déjà importée, l'empreinte est calculée d'abord :
+    un doublon n'est alors jamais écrit. Retourne (empreinte, fichier temporaire ou None).
+    """
+    if size in known_sizes:
+        content_hash = hash_file(file_path)
+        if content_hash in known_hashes:
+            return content_hash, None
+
+    digest = hashlib.sha1()
+    tmp_file = Path(tempfile.mkstemp(dir=TARGET_DIR, prefix=".import_", suffix=".part")[1])
+    try:
+        with open(file_path, "rb") as src, open(tmp_file, "wb") as dst:
+            while True:
+                chunk = src.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                dst.write(chunk)
+        shutil.copystat(file_path, tmp_file)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+    return digest.hexdigest(), tmp_file
+
+def hash_file(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def choose_local_name(filename, content_hash, owner_by_name, confirmed):
+    """Garde le nom d'origine, sauf s'il est déjà pris par un autre contenu de la clé (suffixe d'empreinte)."""
+    if owner_by_name.get(filename) in confirmed:
+        stem, suffix = os.path.splitext(filename)
+        return f"{stem}_{content_hash[:8]}{suffix}"
+    return filename
+
+def discard_pending_copies(futures):
+    """Supprime les fichiers temporaires des copies terminées mais non retenues (annulation)."""
+    for future in futures:
+        if future.done() and not future.cancelled() and future.exception() is None:
+            tmp_file = future.result()[1]
+            if tmp_file is not None:
+                tmp_file.unlink(missing_ok=True)
+
+def format_throughput(num_bytes, elapsed):
+    return f"{num_bytes / (1024 * 1024) / max(elapsed, 0.001):.1f} Mo/s"
+
 def find_and_mount_usb():
     """
     Recherche un périphérique USB. S'il est déjà monté, retourne le point de montage.
@@ -78,58 +173,145 @@ def import_usb_photos():
 
         yield {"type": "progress", "stage": "DETECTED", "percent": 10, "message": f"Clé USB détectée : {mount_path}"}
 
-        # Vider les dossiers de destination (source et préparé) avant l'import pour éviter les mélanges.
+        # Les photos déjà importées sont conservées : seul le différentiel avec la clé est copié.
         prepared_usb_dir = Path("static/prepared/usb")
-        if TARGET_DIR.exists():
-            shutil.rmtree(TARGET_DIR)
         TARGET_DIR.mkdir(parents=True, exist_ok=True)
-        if prepared_usb_dir.exists():
-            shutil.rmtree(prepared_usb_dir)
         prepared_usb_dir.mkdir(parents=True, exist_ok=True)
 
         yield {"type": "progress", "stage": "SCANNING", "percent": 15, "message": "Analyse des images sur la clé USB..."}
         
-        image_files = []
+        image_files = {}
         for root, dirs, files in os.walk(mount_path):
+            # Ignorer les dossiers système et cachés (corbeilles, index macOS...)
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in IGNORED_DIRECTORIES]
             for filename in files:
-                if is_image_file(filename):
-                    image_files.append(Path(root) / filename)
+                if is_image_file(filename) and not filename.startswith('._'):
+                    file_path = Path(root) / filename
+                    try:
+                        stat_info = file_path.stat()
+                    except OSError as e:
+                        yield {"type": "warning", "message": f"Impossible de lire {filename} : {e}"}
+                        continue
+                    image_files[file_path.relative_to(mount_path).as_posix()] = (file_path, stat_info.st_size, int(stat_info.st_mtime))
 
         total = len(image_files)
         if total == 0:
             yield {"type": "error", "message": "Aucune image compatible trouvée sur la clé USB (formats supportés : JPG, JPEG, PNG, GIF)."}
             return
 
-        yield {"type": "stats", "stage": "STATS", "percent": 20, "message": f"{total} images trouvées, début de l'import...", "total": total}
+        manifest = load_usb_manifest()
+        known_files = manifest["files"]
+        entries = manifest["entries"]
+        owner_by_name = {info["filename"]: content_hash for content_hash, info in known_files.items()}
+        confirmed = set()
 
-        for i, file_path in enumerate(image_files):
-            # Vérifier si l'annulation a été demandée
-            if CANCEL_FLAG.exists():
-                yield {"type": "warning", "message": "Importation annulée par l'utilisateur."}
-                return
+        # Fichiers déjà importés (même chemin, même taille, même date) : aucune lecture nécessaire
+        to_copy = []
+        for rel_path, (file_path, size, mtime) in image_files.items():
+            entry = entries.get(rel_path)
+            if entry and entry["size"] == size and entry["mtime"] == mtime and entry["hash"] in known_files:
+                confirmed.add(entry["hash"])
+            else:
+                to_copy.append(rel_path)
 
-            try:
-                dest_file = TARGET_DIR / file_path.name
-                counter = 1
-                original_dest = dest_file
-                while dest_file.exists():
-                    stem = original_dest.stem
-                    suffix = original_dest.suffix
-                    dest_file = TARGET_DIR / f"{stem}_{counter}{suffix}"
-                    counter += 1
-                
-                shutil.copy2(file_path, dest_file)
-                
-                percent = 20 + int(((i + 1) / total) * 60)
+        yield {"type": "stats", "stage": "STATS", "percent": 20,
+               "message": f"{total} images trouvées, {len(to_copy)} à importer ({total - len(to_copy)} déjà présentes)...",
+               "total": len(to_copy), "total_found": total}
+
+        imported = 0
+        duplicates = 0
+        processed_bytes = 0
+        copy_start = time.monotonic()
+        # Instantané en lecture seule pour les threads : une taille connue justifie de hacher avant de copier
+        known_sizes = {info["size"] for info in known_files.values()}
+        known_hashes = set(known_files)
+        with ThreadPoolExecutor(max_workers=USB_COPY_WORKERS) as executor:
+            futures = {
+                executor.submit(copy_with_hash, image_files[rel_path][0], image_files[rel_path][1], known_sizes, known_hashes): rel_path
+                for rel_path in to_copy
+            }
+            for i, future in enumerate(as_completed(futures), 1):
+                rel_path = futures[future]
+                # Vérifier si l'annulation a été demandée
+                if CANCEL_FLAG.exists():
+                    for pending in futures:
+                        pending.cancel()
+                    discard_pending_copies(futures)
+                    save_usb_manifest(manifest)
+                    yield {"type": "warning", "message": "Importation annulée par l'utilisateur."}
+                    return
+
+                file_path, size, mtime = image_files[rel_path]
+                try:
+                    content_hash, tmp_file = future.result()
+                except Exception as e:
+                    yield {"type": "warning", "message": f"Impossible de copier {file_path.name} : {str(e)}"}
+                    continue
+
+                processed_bytes += size
+                entries[rel_path] = {"size": size, "mtime": mtime, "hash": content_hash}
+                if content_hash in known_files:
+                    # Même contenu déjà présent (autre dossier, fichier déplacé ou renommé) : une seule copie
+                    if tmp_file is not None:
+                        tmp_file.unlink(missing_ok=True)
+                    confirmed.add(content_hash)
+                    duplicates += 1
+                else:
+                    if tmp_file is None:
+                        # Contenu connu quand le thread l'a vérifié, mais remplacé depuis (fichier modifié sur place
+                        # dont une copie intacte est dans un autre dossier) : il faut finalement le copier
+                        try:
+                            content_hash, tmp_file = copy_with_hash(file_path, size, set(), set())
+                        except OSError as e:
+                            yield {"type": "warning", "message": f"Impossible de copier {file_path.name} : {str(e)}"}
+                            continue
+                    dest_name = choose_local_name(file_path.name, content_hash, owner_by_name, confirmed)
+                    previous_owner = owner_by_name.get(dest_name)
+                    if previous_owner is not None:
+                        # Ancienne version du fichier, absente de la clé jusqu'ici : remplacée
+                        known_files.pop(previous_owner, None)
+                    dest_file = TARGET_DIR / dest_name
+                    if dest_file.exists():
+                        invalidate_prepared_files(prepared_usb_dir, dest_name)
+                    os.replace(tmp_file, dest_file)
+                    known_files[content_hash] = {"filename": dest_name, "size": size}
+                    owner_by_name[dest_name] = content_hash
+                    confirmed.add(content_hash)
+                    imported += 1
+
+                throughput = format_throughput(processed_bytes, time.monotonic() - copy_start)
+                percent = 20 + int((i / len(to_copy)) * 60)
                 yield {
                     "type": "progress", "stage": "COPYING", "percent": percent,
-                    "message": f"Copie en cours... ({i + 1}/{total})",
-                    "current": i + 1, "total": total
+                    "message": f"Copie en cours... ({i}/{len(to_copy)}, {throughput})",
+                    "current": i, "total": len(to_copy), "throughput": throughput
                 }
-            except Exception as e:
-                yield {"type": "warning", "message": f"Impossible de copier {file_path.name} : {str(e)}"}
 
-        yield {"type": "done", "stage": "IMPORT_COMPLETE", "percent": 80, "message": f"{total} photos importées.", "total_imported": total}
+        # La source USB reflète la clé : les photos absentes de la clé sont retirées avec leurs versions préparées
+        for content_hash in set(known_files) - confirmed:
+            del known_files[content_hash]
+        kept_names = {info["filename"] for info in known_files.values()}
+        removed = 0
+        for local_file in TARGET_DIR.iterdir():
+            if local_file.is_file() and local_file.name not in kept_names:
+                try:
+                    local_file.unlink()
+                except OSError as e:
+                    yield {"type": "warning", "message": f"Impossible de supprimer {local_file.name} : {e}"}
+                    continue
+                invalidate_prepared_files(prepared_usb_dir, local_file.name)
+                removed += 1
+        manifest["entries"] = {rel_path: entry for rel_path, entry in entries.items() if rel_path in image_files}
+        save_usb_manifest(manifest)
+
+        throughput = format_throughput(processed_bytes, time.monotonic() - copy_start)
+        message = f"{imported} photos importées, {total - len(to_copy)} déjà présentes"
+        if duplicates:
+            message += f", {duplicates} doublons ignorés"
+        if removed:
+            message += f", {removed} retirées"
+        yield {"type": "done", "stage": "IMPORT_COMPLETE", "percent": 80, "message": f"{message} ({throughput}).",
+               "total_imported": imported, "total_duplicates": duplicates, "total_deleted": removed, "throughput": throughput}
 
     finally:
         # Cette section s'exécute toujours, même en cas d'erreur, pour nettoyer.
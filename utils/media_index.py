@@ -0,0 +1,243 @@
+# Index persistant des médias préparés (static/prepared/<source>).
+#
+# Les chemins de préparation, de suppression et de filtre mettent l'index à jour au fil de l'eau
+# (index_media / remove_media / remove_source). En complément, chaque lecture compare la date de
+# modification du dossier de la source avec celle enregistrée : si elle a changé (fichier ajouté
+# ou supprimé hors de ces chemins), la source est réconciliée à partir d'un simple listing,
+# sans relire les fichiers déjà connus. Les dates de prise de vue viennent du cache de métadonnées Immich :
+# quand ce fichier change, les dates de la source sont recalculées (simple recherche par nom).
+import os
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+from utils.metadata_utils import get_photo_date_taken, DESCRIPTION_MAP_CACHE_FILE
+
+# Définition des chemins
+BASE_DIR = Path(__file__).resolve().parent.parent
+PREPARED_DIR = BASE_DIR / 'static' / 'prepared'
+INDEX_DB_PATH = BASE_DIR / 'cache' / 'media_index.db'
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+DERIVATIVE_SUFFIXES = ('_polaroid.jpg', '_thumbnail.jpg', '_postcard.jpg', '_panzoom.jpg')
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    source TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    has_polaroid INTEGER NOT NULL DEFAULT 0,
+    has_postcard INTEGER NOT NULL DEFAULT 0,
+    has_thumbnail INTEGER NOT NULL DEFAULT 0,
+    date_taken TEXT,
+    PRIMARY KEY (source, name)
+);
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    dir_mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS source_dates (
+    source TEXT PRIMARY KEY,
+    metadata_mtime_ns INTEGER NOT NULL
+);
+"""
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def _connect():
+    global _schema_ready
+    INDEX_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(INDEX_DB_PATH, timeout=10)
+    conn.row_factory = sqlite3.Row
+    if not _schema_ready:
+        with _schema_lock:
+            # WAL : le serveur web et le diaporama lisent pendant qu'un import écrit
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _schema_ready = True
+    return conn
+
+def _open_index():
+    """Ouvre l'index ; un fichier corrompu est supprimé puis reconstruit."""
+    global _schema_ready
+    try:
+        return _connect()
+    except sqlite3.DatabaseError as e:
+        logger.error(f"[MediaIndex] Index illisible ({e}), reconstruction.")
+        _schema_ready = False
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(f"{INDEX_DB_PATH}{suffix}")
+            except FileNotFoundError:
+                pass
+        return _connect()
+
+def is_base_media(filename):
+    """Vrai pour un média de base (ni polaroid, ni carte postale, ni vignette, ni version pan/zoom, ni fichier temporaire)."""
+    lower = filename.lower()
+    return lower.endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS) and not filename.endswith(DERIVATIVE_SUFFIXES)
+
+def _media_type(filename):
+    return 'video' if filename.lower().endswith(VIDEO_EXTENSIONS) else 'image'
+
+def _derivative_flags(filename, exists):
+    stem = os.path.splitext(filename)[0]
+    return (
+        int(exists(f"{stem}_polaroid.jpg")),
+        int(exists(f"{stem}_postcard.jpg")),
+        int(exists(f"{stem}_thumbnail.jpg")),
+    )
+
+def _date_taken(source_dir, filename):
+    if _media_type(filename) != 'image':
+        return None
+    date_taken = get_photo_date_taken(source_dir / filename)
+    return date_taken.isoformat() if date_taken else None
+
+def _upsert(conn, source, filename, flags, date_taken):
+    conn.execute(
+        "INSERT OR REPLACE INTO media (source, name, type, has_polaroid, has_postcard, has_thumbnail, date_taken) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (source, filename, _media_type(filename), *flags, date_taken),
+    )
+
+def _sync_source(conn, source):
+    """Réconcilie une source avec le disque si son dossier a changé depuis la dernière lecture."""
+    source_dir = PREPARED_DIR / source
+    try:
+        # Mesuré avant le listing : un fichier ajouté pendant le parcours déclenchera une nouvelle réconciliation
+        dir_mtime_ns = source_dir.stat().st_mtime_ns
+    except FileNotFoundError:
+        with conn:
+            conn.execute("DELETE FROM media WHERE source = ?", (source,))
+            conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+            conn.execute("DELETE FROM source_dates WHERE source = ?", (source,))
+        return
+
+    row = conn.execute("SELECT dir_mtime_ns FROM sources WHERE source = ?", (source,)).fetchone()
+    if row is not None and row["dir_mtime_ns"] == dir_mtime_ns:
+        return
+
+    with os.scandir(source_dir) as entries:
+        filenames = {entry.name for entry in entries if entry.is_file()}
+    base_names = {name for name in filenames if is_base_media(name)}
+    known = {
+        r["name"]: (r["has_polaroid"], r["has_postcard"], r["has_thumbnail"])
+        for r in conn.execute("SELECT name, has_polaroid, has_postcard, has_thumbnail FROM media WHERE source = ?", (source,))
+    }
+
+    with conn:
+        removed = [(source, name) for name in known.keys() - base_names]
+        conn.executemany("DELETE FROM media WHERE source = ? AND name = ?", removed)
+        added = 0
+        for name in base_names:
+            flags = _derivative_flags(name, filenames.__contains__)
+            if name not in known:
+                _upsert(conn, source, name, flags, _date_taken(source_dir, name))
+                added += 1
+            elif known[name] != flags:
+                conn.execute(
+                    "UPDATE media SET has_polaroid = ?, has_postcard = ?, has_thumbnail = ? WHERE source = ? AND name = ?",
+                    (*flags, source, name),
+                )
+        conn.execute("INSERT OR REPLACE INTO sources (source, dir_mtime_ns) VALUES (?, ?)", (source, dir_mtime_ns))
+
+    if added or removed:
+        logger.info(f"[MediaIndex] Source '{source}' réconciliée : {added} ajout(s), {len(removed)} suppression(s).")
+
+def _metadata_mtime_ns():
+    try:
+        return DESCRIPTION_MAP_CACHE_FILE.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+def _refresh_dates(conn, source, metadata_mtime_ns):
+    """Recalcule les dates de prise de vue d'une source si le fichier de métadonnées a changé depuis le dernier calcul."""
+    row = conn.execute("SELECT metadata_mtime_ns FROM source_dates WHERE source = ?", (source,)).fetchone()
+    if row is not None and row["metadata_mtime_ns"] == metadata_mtime_ns:
+        return
+    source_dir = PREPARED_DIR / source
+    rows = conn.execute("SELECT name, date_taken FROM media WHERE source = ? AND type = 'image'", (source,)).fetchall()
+    updates = []
+    for r in rows:
+        date_taken = _date_taken(source_dir, r["name"])
+        if date_taken != r["date_taken"]:
+            updates.append((date_taken, source, r["name"]))
+    with conn:
+        conn.executemany("UPDATE media SET date_taken = ? WHERE source = ? AND name = ?", updates)
+        conn.execute("INSERT OR REPLACE INTO source_dates (source, metadata_mtime_ns) VALUES (?, ?)", (source, metadata_mtime_ns))
+    if updates:
+        logger.info(f"[MediaIndex] Source '{source}' : {len(updates)} date(s) de prise de vue mise(s) à jour.")
+
+def get_prepared_media(sources=None):
+    """
+    Retourne les médias préparés par source : {source: [ligne, ...]} triés par nom.
+    Chaque ligne contient name, type, has_polaroid, has_postcard, has_thumbnail et date_taken (ISO ou None).
+    Sans argument, toutes les sources présentes dans static/prepared sont retournées.
+    """
+    if sources is None:
+        sources = sorted(d.name for d in PREPARED_DIR.iterdir() if d.is_dir()) if PREPARED_DIR.is_dir() else []
+
+    media_by_source = {}
+    metadata_mtime_ns = _metadata_mtime_ns()
+    conn = _open_index()
+    try:
+        for source in sources:
+            _sync_source(conn, source)
+            _refresh_dates(conn, source, metadata_mtime_ns)
+            rows = conn.execute(
+                "SELECT name, type, has_polaroid, has_postcard, has_thumbnail, date_taken "
+                "FROM media WHERE source = ? ORDER BY name",
+                (source,),
+            ).fetchall()
+            media_by_source[source] = [dict(row) for row in rows]
+    finally:
+        conn.close()
+    return media_by_source
+
+def index_media(source, filename):
+    """Ajoute ou met à jour un média de base après sa préparation (ou l'application d'un filtre)."""
+    if not is_base_media(filename):
+        return
+    source_dir = PREPARED_DIR / source
+    if not (source_dir / filename).is_file():
+        remove_media(source, filename)
+        return
+    flags = _derivative_flags(filename, lambda name: (source_dir / name).is_file())
+    conn = _open_index()
+    try:
+        with conn:
+            _upsert(conn, source, filename, flags, _date_taken(source_dir, filename))
+    except sqlite3.Error as e:
+        logger.error(f"[MediaIndex] Impossible d'indexer {source}/{filename} : {e}")
+    finally:
+        conn.close()
+
+def remove_media(source, filename):
+    """Retire un média de l'index après sa suppression."""
+    conn = _open_index()
+    try:
+        with conn:
+            conn.execute("DELETE FROM media WHERE source = ? AND name = ?", (source, filename))
+    except sqlite3.Error as e:
+        logger.error(f"[MediaIndex] Impossible de retirer {source}/{filename} : {e}")
+    finally:
+        conn.close()
+
+def remove_source(source):
+    """Retire toute une source de l'index (dossier préparé supprimé)."""
+    conn = _open_index()
+    try:
+        with conn:
+            conn.execute("DELETE FROM media WHERE source = ?", (source,))
+            conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+            conn.execute("DELETE FROM source_dates WHERE source = ?", (source,))
+    except sqlite3.Error as e:
+        logger.error(f"[MediaIndex] Impossible de retirer la source {source} : {e}")
+    finally:
+        conn.close()
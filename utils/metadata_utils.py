@@ -3,31 +3,88 @@ from pathlib import Path
 import re
 import logging
 import os
+from datetime import datetime
 
 # Définition des chemins
 BASE_DIR = Path(__file__).resolve().parent.parent
 _photo_metadata_cache = None
 _photo_metadata_last_load = None
+# Index de recherche : (par nom de fichier, par nom sans extension ni variante), clés en casefold
+_photo_metadata_index = ({}, {})
 DESCRIPTION_MAP_CACHE_FILE = BASE_DIR / 'cache' / 'immich_description_map.json'
 
+VARIANT_SUFFIX_RE = re.compile(r'_(polaroid|postcard|thumbnail)$', re.IGNORECASE)
+
 logger = logging.getLogger(__name__)
 
+# Champs de date EXIF/Immich, par ordre de priorité, pour déterminer la date de prise de vue
+DATE_TAKEN_FIELDS = (
+    "subSecDateTimeOriginal", "dateTimeOriginal", "SubSecDateTimeOriginal", "DateTimeOriginal",
+    "subSecCreateDate", "createDate", "SubSecCreateDate", "CreateDate",
+    "subSecModifyDate", "modifyDate", "SubSecModifyDate",
+    "mediaCreateDate", "dateTimeCreated", "MediaCreateDate", "DateTimeCreated",
+    "fileModifiedAt", "fileCreatedAt",
+)
+
+def parse_date_taken(metadata):
+    """Retourne la date de prise de vue (datetime) d'un dictionnaire de métadonnées, ou None."""
+    if not metadata:
+        return None
+    date_taken_str = next((metadata.get(field) for field in DATE_TAKEN_FIELDS if metadata.get(field)), None)
+    if not date_taken_str:
+        return None
+    try:
+        return datetime.fromisoformat(str(date_taken_str).replace('Z', '+00:00'))
+    except ValueError:
+        logger.debug(f"[Metadata] Date illisible : {date_taken_str}")
+        return None
+
+def get_date_taken(metadata):
+    """Date de prise de vue d'un dictionnaire de métadonnées : pré-calculée si elle vient du cache."""
+    if not metadata:
+        return None
+    if "date_taken" in metadata:
+        return metadata["date_taken"]
+    return parse_date_taken(metadata)
+
+def _normalized_stem(filename):
+    """Nom sans extension ni suffixe de variante (_polaroid, _postcard, _thumbnail), en casefold."""
+    return VARIANT_SUFFIX_RE.sub('', os.path.splitext(filename)[0]).casefold()
+
+def _build_metadata_index(metadata_map):
+    """
+    Construit l'index de recherche des métadonnées et pré-calcule la date de prise de vue
+    (clé "date_taken") de chaque entrée. En cas de doublon, la première entrée l'emporte.
+    """
+    by_name = {}
+    by_stem = {}
+    for cached_filename, metadata in metadata_map.items():
+        if not isinstance(metadata, dict):
+            continue
+        metadata["date_taken"] = parse_date_taken(metadata)
+        by_name.setdefault(cached_filename.casefold(), metadata)
+        by_stem.setdefault(_normalized_stem(cached_filename), metadata)
+    return by_name, by_stem
+
 def load_photo_metadata_cache():
     """
     Charge le cache des métadonnées photos depuis le fichier JSON créé lors du téléchargement.
     Ce fichier contient les informations EXIF de chaque photo (date, ville, pays, coordonnées GPS).
+    Le fichier n'est relu (et l'index reconstruit) que si sa date de modification a changé.
     """
-    global _photo_metadata_cache, _photo_metadata_last_load
+    global _photo_metadata_cache, _photo_metadata_last_load, _photo_metadata_index
 
     if not DESCRIPTION_MAP_CACHE_FILE.exists():
         return {}
 
     try:
-        file_mtime = DESCRIPTION_MAP_CACHE_FILE.stat().st_mtime
+        file_mtime = DESCRIPTION_MAP_CACHE_FILE.stat().st_mtime_ns
 
-        if _photo_metadata_last_load is None or file_mtime > _photo_metadata_last_load:
+        if _photo_metadata_last_load is None or file_mtime != _photo_metadata_last_load:
             with open(DESCRIPTION_MAP_CACHE_FILE, 'r', encoding='utf-8') as f:
-                _photo_metadata_cache = json.load(f)
+                metadata_map = json.load(f)
+            _photo_metadata_index = _build_metadata_index(metadata_map)
+            _photo_metadata_cache = metadata_map
             _photo_metadata_last_load = file_mtime
 
         return _photo_metadata_cache
@@ -40,22 +97,25 @@ def get_photo_metadata(photo_path):
     """
     Récupère les métadonnées d'une photo depuis le cache.
     Retourne un dictionnaire avec : date_taken, city, country, location, latitude, longitude
+    La recherche ignore la casse, l'extension et les variantes (_polaroid, _postcard) : accès O(1).
     """
     try:
-        metadata_map = load_photo_metadata_cache()
-        if not metadata_map:
+        if not load_photo_metadata_cache():
             return {}
+        by_name, by_stem = _photo_metadata_index
         filename = Path(photo_path).name
-        filename_lower = filename.lower()
-        for cached_filename, metadata in metadata_map.items():
-            if cached_filename.lower() == filename_lower:
-                return metadata
-        base_filename = re.sub(r'(_polaroid|_postcard)\.(jpg|jpeg|png|JPG|JPEG|PNG)$', r'.\2', filename, flags=re.IGNORECASE)
-        base_filename_lower = base_filename.lower()
-        for cached_filename, metadata in metadata_map.items():
-            if cached_filename.lower() == base_filename_lower:
-                return metadata
-        return {}
+        metadata = by_name.get(filename.casefold())
+        if metadata is None:
+            base_filename = re.sub(r'(_polaroid|_postcard)\.(jpg|jpeg|png)$', r'.\2', filename, flags=re.IGNORECASE)
+            metadata = by_name.get(base_filename.casefold())
+        if metadata is None:
+            # Ex: photo préparée "IMG_0001.jpg" à partir de "IMG_0001.HEIC"
+            metadata = by_stem.get(_normalized_stem(filename))
+        return metadata or {}
     except Exception as e:
         logger.error(f"[Metadata] Erreur extraction métadonnées pour {photo_path}: {e}")
-        return {}
\ No newline at end of file
+        return {}
+
+def get_photo_date_taken(photo_path):
+    """Retourne la date de prise de vue d'une photo d'après le cache des métadonnées, ou None."""
+    return get_photo_metadata(photo_path).get("date_taken")
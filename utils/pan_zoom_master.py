@@ -0,0 +1,55 @@
+# Versions pan/zoom des photos préparées.
+#
+# Quand le pan/zoom est activé, la préparation enregistre à côté de l'image de base une version
+# agrandie (<nom>_panzoom.jpg) à pan_zoom_factor x la taille de l'écran, calculée depuis la photo
+# d'origine : le diaporama y recadre directement au lieu d'agrandir l'image préparée à chaque
+# diapositive (calcul coûteux, et détails perdus lors de la réduction à la taille de l'écran).
+# La taille de la version encode le facteur de zoom : une version à une autre taille est ignorée
+# par le diaporama et régénérée à la préparation suivante.
+import os
+from pathlib import Path
+from PIL import Image
+
+PAN_ZOOM_SUFFIX = "_panzoom"
+
+def get_pan_zoom_factor(config):
+    """Facteur de zoom configuré, ou None si le pan/zoom est désactivé (aucune version à générer)."""
+    if not config.get("pan_zoom_enabled", False):
+        return None
+    try:
+        zoom_factor = float(config.get("pan_zoom_factor", 1.15))
+    except (ValueError, TypeError):
+        return None
+    return zoom_factor if zoom_factor > 1.0 else None
+
+def pan_zoom_size(screen_width, screen_height, zoom_factor):
+    """Taille de l'image agrandie parcourue par le pan/zoom (mêmes arrondis que le diaporama)."""
+    return int(screen_width * zoom_factor), int(screen_height * zoom_factor)
+
+def pan_zoom_master_path(prepared_path):
+    prepared_path = Path(prepared_path)
+    return prepared_path.with_name(f"{prepared_path.stem}{PAN_ZOOM_SUFFIX}.jpg")
+
+def has_current_master(prepared_path, size):
+    """Vrai si la version pan/zoom existe à la taille demandée (lecture de l'en-tête seulement)."""
+    try:
+        with Image.open(pan_zoom_master_path(prepared_path)) as master:
+            return master.size == size
+    except (OSError, ValueError):
+        return False
+
+def open_pan_zoom_master(prepared_path, size):
+    """
+    Décode la version pan/zoom d'une image préparée si elle correspond à la taille demandée
+    et n'est pas plus ancienne que l'image de base (photo retouchée depuis). Sinon retourne None.
+    """
+    master_path = pan_zoom_master_path(prepared_path)
+    try:
+        if os.stat(master_path).st_mtime_ns < os.stat(prepared_path).st_mtime_ns:
+            return None
+        with Image.open(master_path) as master:
+            if master.size != size:
+                return None
+            return master.convert('RGB') if master.mode != 'RGB' else master.copy()
+    except (OSError, ValueError):
+        return None
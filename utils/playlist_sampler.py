@@ -0,0 +1,192 @@
+# Tirage pondéré de la playlist du diaporama.
+#
+# Les boosts (favoris, photos Telegram récentes, anniversaires) deviennent des poids au lieu
+# d'entrées dupliquées : une table d'alias (méthode de Vose) donne un tirage en O(1) avec deux
+# tableaux compacts par photo. La table n'est reconstruite que si la bibliothèque ou les poids
+# changent, et une fenêtre anti-répétition évite de revoir une photo qui vient de passer.
+#
+# La fenêtre est propre à chaque photo et inversement proportionnelle à son poids : une photo boostée
+# ×4 revient naturellement quatre fois plus souvent, elle n'est donc exclue que quatre fois moins
+# longtemps. Chaque photo passe ainsi la même part des tirages exclue, et les rejets ne changent
+# pas les proportions voulues par les boosts.
+#
+# Vérification (python -m utils.playlist_sampler) : part des photos boostées sur de petites
+# bibliothèques comparée à la part attendue ; code retour 1 si l'écart dépasse la tolérance.
+import sys
+import heapq
+import random
+from array import array
+from collections import deque
+
+# Nombre maximal de tirages rejetés par la fenêtre anti-répétition avant d'accepter une répétition
+MAX_REJECTIONS = 32
+# Éléments tirés conservés par un passage pour revenir en arrière
+HISTORY_SIZE = 200
+# (photos, photos boostées, boost) vérifiées par check_distribution
+DISTRIBUTION_CASES = ((10, 1, 5), (20, 2, 3), (60, 5, 4), (100, 10, 2), (1000, 50, 2))
+
+class WeightedSampler:
+    """Tirage pondéré en O(1) parmi une liste de médias, sans répétition dans une fenêtre glissante."""
+
+    def __init__(self, no_repeat_window=50, rng=None):
+        self.no_repeat_window = max(0, int(no_repeat_window))
+        self._rng = rng or random.Random()
+        self._items = []
+        self._weights = []
+        self._prob = array('d')
+        self._alias = array('l')
+        self._total_weight = 0.0
+        self._min_weight = 0.0
+        self._draws = 0
+        self._exclusion_base = 0.0
+        self._excluded = {}  # média -> numéro du premier tirage où il redevient possible
+        self._expiries = []  # tas de (numéro de tirage, média) pour lever les exclusions
+
+    def __len__(self):
+        return len(self._items)
+
+    def update(self, items, weights):
+        """Met à jour la bibliothèque ; la table n'est reconstruite que si elle a changé. Retourne True si reconstruite."""
+        if items == self._items and weights == self._weights:
+            return False
+        self._items = list(items)
+        self._weights = list(weights)
+        self._build_alias_table()
+        # Oublier les médias disparus de la fenêtre anti-répétition
+        present = set(self._items)
+        self._excluded = {item: expiry for item, expiry in self._excluded.items() if item in present}
+        self._expiries = [(expiry, item) for item, expiry in self._excluded.items()]
+        heapq.heapify(self._expiries)
+        return True
+
+    def _build_alias_table(self):
+        n = len(self._items)
+        self._prob = array('d', [0.0]) * n
+        self._alias = array('l', [0]) * n
+        total = float(sum(self._weights))
+        self._total_weight = total
+        self._min_weight = min((w for w in self._weights if w > 0), default=0.0)
+        if n == 0 or total <= 0:
+            return
+        scaled = [w * n / total for w in self._weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Les restes valent 1 aux erreurs d'arrondi près
+        for i in large + small:
+            self._prob[i] = 1.0
+            self._alias[i] = i
+
+    def _draw_index(self):
+        i = int(self._rng.random() * len(self._items))
+        return i if self._rng.random() < self._prob[i] else self._alias[i]
+
+    def _clear_exclusions(self):
+        self._excluded.clear()
+        self._expiries.clear()
+
+    def _exclusion_span(self, index):
+        """Nombre de tirages pendant lesquels le média tiré est exclu : `no_repeat_window` pour le plus léger."""
+        weight = self._weights[index]
+        return int(self._exclusion_base / weight) if weight > 0 else 0
+
+    def draw(self):
+        """Tire un média. Retourne None si la bibliothèque est vide."""
+        if not self._items:
+            return None
+        # Au plus la moitié des tirages exclus pour chaque média, pour que le rejet reste rare
+        base = min(self.no_repeat_window * self._min_weight, self._total_weight / 2)
+        if base != self._exclusion_base:
+            # Fenêtre modifiée (réglage, poids) : les anciennes exclusions ne sont plus à la bonne longueur
+            self._exclusion_base = base
+            self._clear_exclusions()
+        self._draws += 1
+        while self._expiries and self._expiries[0][0] <= self._draws:
+            expiry, item = heapq.heappop(self._expiries)
+            if self._excluded.get(item) == expiry:
+                del self._excluded[item]
+
+        index = self._draw_index()
+        for _ in range(MAX_REJECTIONS):
+            if self._items[index] not in self._excluded:
+                break
+            index = self._draw_index()
+        item = self._items[index]
+        span = self._exclusion_span(index)
+        if span:
+            expiry = self._draws + span + 1
+            self._excluded[item] = expiry
+            heapq.heappush(self._expiries, (expiry, item))
+        return item
+
+class SampledPass:
+    """
+    Un passage de playlist tiré à la demande : se comporte comme une liste de `length` éléments
+    (indexation, longueur) pour la boucle d'affichage, mais chaque élément n'est tiré qu'au moment
+    où il est lu. Seuls les HISTORY_SIZE derniers éléments tirés sont mémorisés (retour en arrière,
+    lecture anticipée par le pré-chargement) : la mémoire reste constante quelle que soit la bibliothèque.
+    Il n'y a ni indexation depuis la fin ni bouclage, qui obligeraient à tirer tout le passage.
+    """
+
+    def __init__(self, sampler, length=None):
+        self._sampler = sampler
+        self._length = len(sampler) if length is None else length
+        self._drawn = deque(maxlen=HISTORY_SIZE)
+        self._first = 0  # Index du plus ancien élément encore mémorisé
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def first_index(self):
+        """Plus petit index encore lisible (limite du retour en arrière)."""
+        return self._first
+
+    @property
+    def frontier(self):
+        """Premier index pas encore tiré."""
+        return self._first + len(self._drawn)
+
+    def __getitem__(self, index):
+        if not self._first <= index < self._length:
+            raise IndexError("SampledPass index out of range")
+        while self.frontier <= index:
+            if len(self._drawn) == HISTORY_SIZE:
+                self._first += 1
+            self._drawn.append(self._sampler.draw())
+        return self._drawn[index - self._first]
+
+def check_distribution(draws=200000, tolerance=0.05, no_repeat_window=50, seed=1):
+    """
+    Tire `draws` médias pour chaque cas de DISTRIBUTION_CASES et compare la part des photos boostées
+    à celle donnée par les poids. Retourne [(photos, boostées, boost, part attendue, part obtenue, ok), ...].
+    """
+    results = []
+    for count, boosted_count, boost in DISTRIBUTION_CASES:
+        items = [f"photo_{i:04d}.jpg" for i in range(count)]
+        weights = [boost] * boosted_count + [1] * (count - boosted_count)
+        sampler = WeightedSampler(no_repeat_window, rng=random.Random(seed))
+        sampler.update(items, weights)
+        boosted = set(items[:boosted_count])
+        hits = sum(1 for _ in range(draws) if sampler.draw() in boosted)
+        expected = boosted_count * boost / sum(weights)
+        share = hits / draws
+        results.append((count, boosted_count, boost, expected, share, abs(share - expected) <= tolerance * expected))
+    return results
+
+def main():
+    failed = False
+    print("photos  boostées  boost   attendu   obtenu")
+    for count, boosted_count, boost, expected, share, ok in check_distribution():
+        failed |= not ok
+        print(f"{count:>6}  {boosted_count:>8}  ×{boost:<4}  {expected:>7.1%}  {share:>7.1%}{'' if ok else '  ÉCART'}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
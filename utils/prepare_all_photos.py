@@ -7,16 +7,30 @@ try:
 except ImportError:
     HEIF_SUPPORT = False
 import subprocess, sys
+import multiprocessing
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+try:
+    import resource
+except ImportError:
+    resource = None
+import psutil
 from utils.config import load_config
 import piexif
 from utils.image_filters import create_polaroid_effect, create_postcard_effect
 from utils.exif import get_rotation_angle
+from utils.media_index import index_media, remove_media
+from utils.pan_zoom_master import get_pan_zoom_factor, pan_zoom_size, pan_zoom_master_path, has_current_master
+from utils.gallery_thumbnails import save_thumbnail, ensure_thumbnail, remove_thumbnails
+from utils.device_profile import get_profile, get_tiers
 import logging
 import re
 from pathlib import Path
 from logging.handlers import RotatingFileHandler
 
-from .config_manager import load_config
+from .config_manager import load_config, get_config
 
 # Configuration
 SOURCE_DIR = "static/photos"
@@ -131,121 +145,265 @@ def yield_and_log(msg_type: str, message: str, stage=None, percent=None, extra=N
 
 
 
-def get_pi_model():
-    """Détecte le modèle du Raspberry Pi."""
+DERIVATIVE_TYPES = ("polaroid", "postcard")
+
+def get_enabled_derivatives(config, source_type=None):
+    """
+    Retourne l'ensemble des déclinaisons (polaroid, postcard) à générer pour une source.
+    La clé "default" de "prepare_derivatives" s'applique à toutes les sources,
+    et peut être surchargée source par source (ex: {"samba": {"postcard": False}}).
+    """
+    settings = config.get("prepare_derivatives", {})
+    if not isinstance(settings, Mapping):
+        settings = {}
+    enabled = {name: True for name in DERIVATIVE_TYPES}
+    for scope in ("default", source_type):
+        overrides = settings.get(scope) if scope else None
+        if isinstance(overrides, Mapping):
+            for name in DERIVATIVE_TYPES:
+                if name in overrides:
+                    enabled[name] = bool(overrides[name])
+    return {name for name, is_enabled in enabled.items() if is_enabled}
+
+def _save_jpeg(image, path, quality, exif_bytes):
+    """Encode une image en JPEG, avec les métadonnées EXIF si elles existent."""
+    if exif_bytes:
+        image.save(path, 'JPEG', quality=quality, optimize=True, exif=exif_bytes)
+    else:
+        image.save(path, 'JPEG', quality=quality, optimize=True)
+
+def _save_gallery_thumbnail(image, prepared_path):
+    """Vignette de la galerie : en cas d'échec, elle sera générée à la demande par l'interface web."""
     try:
-        with open('/proc/device-tree/model', 'r') as f:
-            model_str = f.read()
-            if 'Raspberry Pi 4' in model_str:
-                return 4
-            if 'Raspberry Pi 5' in model_str:
-                return 5
-            if 'Raspberry Pi 3' in model_str:
-                return 3
-            if 'Raspberry Pi 2' in model_str:
-                return 2
-            if 'Zero' in model_str:
-                return 1
-            if 'Raspberry Pi' in model_str:
-                return 1
-    except (FileNotFoundError, Exception):
-        return None
-    return None
+        save_thumbnail(image, prepared_path)
+    except Exception as e:
+        logger.warning(f"[Vignette] Impossible de créer la vignette de galerie de {os.path.basename(prepared_path)} : {e}")
 
-def prepare_photo(source_path, dest_path, output_width, output_height, source_type=None, caption=None):
-    """Prépare une photo pour l'affichage avec redimensionnement, rotation EXIF et fond flou."""
-    config = load_config()
+def _render_derivatives(canvas, img_content, content_offset, dest_path, derivatives, caption, exif_bytes, resample_filter, source_name):
+    """
+    Enregistre l'image de base puis ses déclinaisons à partir d'un seul canevas.
+    Au lieu de copier le canevas plein écran pour chaque déclinaison, on colle l'effet
+    directement dessus après l'encodage de la base, puis on restaure la seule zone modifiée.
+    """
+    output_width, output_height = canvas.size
+    x_offset, y_offset = content_offset
+    dest_path_obj = Path(dest_path)
+
+    # 1. Image de base (le canevas n'est pas encore modifié)
+    _save_jpeg(canvas, dest_path, 85, exif_bytes)
+    _save_gallery_thumbnail(canvas, dest_path)
+
+    # Les déclinaisons désactivées pour cette source ne doivent pas rester sur le disque
+    for name in DERIVATIVE_TYPES:
+        if name not in derivatives:
+            stale_path = dest_path_obj.with_name(f"{dest_path_obj.stem}_{name}.jpg")
+            if stale_path.is_file():
+                stale_path.unlink()
+
+    # 2. Polaroid : l'effet a la même taille que le contenu, on le colle par-dessus
+    if "polaroid" in derivatives:
+        content_box = (x_offset, y_offset, x_offset + img_content.width, y_offset + img_content.height)
+        content_patch = canvas.crop(content_box)
+        try:
+            polaroid_content = create_polaroid_effect(img_content)
+            canvas.paste(polaroid_content, (x_offset, y_offset))
+            polaroid_dest_path = dest_path_obj.with_name(f"{dest_path_obj.stem}_polaroid.jpg")
+            _save_jpeg(canvas, polaroid_dest_path, 90, exif_bytes)
+            _save_gallery_thumbnail(canvas, polaroid_dest_path)
+        except Exception as polaroid_e:
+            print(f"[Polaroid] Avertissement: Impossible de créer la version Polaroid pour {source_name}: {polaroid_e}")
+        finally:
+            canvas.paste(content_patch, (x_offset, y_offset))
+
+    # 3. Carte postale : dernière déclinaison, le canevas peut être modifié sans restauration
+    if "postcard" in derivatives:
+        try:
+            scale_factor = 0.85
+            max_width, max_height = int(output_width * scale_factor), int(output_height * scale_factor)
+            ratio = min(max_width / img_content.width, max_height / img_content.height, 1.0)
+            postcard_size = (max(1, int(img_content.width * ratio)), max(1, int(img_content.height * ratio)))
+            if postcard_size == img_content.size:
+                postcard_img_content = img_content.copy()  # create_postcard_effect dessine sur son entrée
+            else:
+                postcard_img_content = img_content.resize(postcard_size, resample_filter)
+
+            postcard_content = create_postcard_effect(postcard_img_content, caption=caption)
+            postcard_x_offset = (output_width - postcard_content.width) // 2
+            postcard_y_offset = (output_height - postcard_content.height) // 2
+            canvas.paste(postcard_content, (postcard_x_offset, postcard_y_offset), postcard_content)
+
+            postcard_dest_path = dest_path_obj.with_name(f"{dest_path_obj.stem}_postcard.jpg")
+            _save_jpeg(canvas, postcard_dest_path, 90, exif_bytes)
+            _save_gallery_thumbnail(canvas, postcard_dest_path)
+        except Exception as postcard_e:
+            print(f"--- ERREUR CRÉATION CARTE POSTALE pour {source_name} ---")
+            print(f"Détails de l'erreur : {postcard_e}")
+            print("Vérifiez que les polices (static/fonts) et les timbres (static/stamps) sont présents et accessibles.")
+            print("--------------------------------------------------------------------")
+
+def open_image_for_display(source_path, target_size):
+    """
+    Ouvre une image en demandant un décodage réduit, adapté à la taille cible.
+    - JPEG : mise à l'échelle DCT (draft) en 1/2, 1/4 ou 1/8 pendant le décodage.
+    - HEIF et autres formats : draft si le plugin le gère, puis réduction entière (reduce)
+      juste après le décodage, avant toute rotation ou conversion.
+    L'image obtenue couvre toujours la taille cible (largeur et hauteur >= cible).
+    Retourne (image, angle de rotation EXIF).
+    """
+    img = Image.open(source_path)
+    rotation_angle = get_rotation_angle(img)
+
+    # La taille cible est exprimée après rotation : on l'inverse pour les photos tournées d'un quart de tour
+    request_width, request_height = target_size
+    if rotation_angle in (90, 270):
+        request_width, request_height = request_height, request_width
+
+    try:
+        img.draft(img.mode, (request_width, request_height))
+    except Exception as e:
+        logger.debug(f"Décodage réduit indisponible pour {os.path.basename(source_path)} : {e}")
+
+    if img.format != 'JPEG':
+        factor = min(img.width // request_width, img.height // request_height)
+        if factor >= 2:
+            # reduce() ne gère pas les images à palette ni en noir et blanc 1 bit (PNG, GIF)
+            if img.mode == 'P':
+                img = img.convert('RGB')
+            elif img.mode == '1':
+                img = img.convert('L')
+            img = img.reduce(factor)
+
+    return img, rotation_angle
+
+def _display_resampling():
+    """Filtre de redimensionnement et stratégie de flou du niveau de l'appareil (profil matériel)."""
+    tiers = get_tiers()
+    resample_filter = Image.Resampling.BILINEAR if tiers["resample_filter"] == "bilinear" else Image.Resampling.LANCZOS
+    return resample_filter, tiers["blur_strategy"] == "downscaled"
+
+def _compose_display_canvas(img, output_width, output_height, photo_height, resample_filter, downscaled_blur, blur_radius=50):
+    """
+    Compose l'image affichée : la photo à la hauteur photo_height, centrée, sur un fond flou
+    si elle est plus étroite que l'écran. Retourne (canevas, contenu redimensionné, position du contenu).
+    """
+    img_aspect_ratio = img.width / img.height
+    display_area_aspect_ratio = output_width / photo_height
+
+    # Contenu redimensionné, partagé par la base et toutes les déclinaisons
+    # (resize() renvoie déjà une nouvelle image, inutile de copier la source avant)
+    scale = photo_height / img.height
+    new_width = int(img.width * scale)
+    img_content = img.resize((new_width, photo_height), resample_filter)
+
+    final_img = Image.new('RGB', (output_width, output_height), (0, 0, 0))
+
+    if img_aspect_ratio < display_area_aspect_ratio:
+        # Portrait photo - add blurred background
+        if downscaled_blur:
+            # Optimized, low-memory background blur for Raspberry Pi 1, 2, 3
+            bg_scale = max(160 / img.width, 90 / img.height)
+            bg_new_width = int(img.width * bg_scale)
+            bg_new_height = int(img.height * bg_scale)
+            bg_img = img.resize((bg_new_width, bg_new_height), Image.Resampling.NEAREST)
+            if bg_img.width > 160 or bg_img.height > 90:
+                left = (bg_img.width - 160) // 2
+                top = (bg_img.height - 90) // 2
+                bg_img = bg_img.crop((left, top, left + 160, top + 90))
+            bg_img = bg_img.filter(ImageFilter.GaussianBlur(radius=3))
+            bg_img = bg_img.resize((output_width, output_height), Image.Resampling.BILINEAR)
+        else:
+            bg_scale = max(output_width / img.width, output_height / img.height)
+            bg_new_width = int(img.width * bg_scale)
+            bg_new_height = int(img.height * bg_scale)
+            bg_img = img.resize((bg_new_width, bg_new_height), Image.Resampling.LANCZOS)
+            if bg_img.width > output_width or bg_img.height > output_height:
+                left = (bg_img.width - output_width) // 2
+                top = (bg_img.height - output_height) // 2
+                bg_img = bg_img.crop((left, top, left + output_width, top + output_height))
+            bg_img = bg_img.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+
+        final_img.paste(bg_img, (0, 0))
+        del bg_img
+
+    x_offset = (output_width - img_content.width) // 2
+    y_offset = (output_height - img_content.height) // 2
+    final_img.paste(img_content, (x_offset, y_offset))
+    return final_img, img_content, (x_offset, y_offset)
+
+def _open_source_for_display(source_path, target_size):
+    """Ouvre la photo d'origine (décodage réduit à target_size), applique la rotation EXIF et la convertit en RGB."""
+    # Gestion des fichiers HEIF/HEIC
+    if source_path.lower().endswith(('.heic', '.heif')):
+        if HEIF_SUPPORT:
+            pillow_heif.register_heif_opener()
+        else:
+            logger.warning(f"Support HEIF désactivé (pillow-heif non installé). Impossible de traiter {source_path}")
+            return None
+
+    # Décodage réduit à la taille demandée (les pixels ne sont pas encore chargés)
+    img, rotation_angle = open_image_for_display(source_path, target_size)
+
+    # Modification Sigalou 25/01/2026 - Suppression de la lecture EXIF redondante
+    # Les métadonnées sont déjà dans le JSON créé par download_album.py
+    # On ne lit plus les EXIF ici pour éviter la duplication
+    # Fin Modification Sigalou 25/01/2026
+
+    # 1. Handle EXIF Orientation
+    if rotation_angle != 0:
+        img = img.rotate(rotation_angle, expand=True)
+
+    # Remove EXIF data after rotation
+    if "exif" in img.info:
+        img.info.pop("exif")
+    if "icc_profile" in img.info:
+        img.info.pop("icc_profile")
+
+    # Convert to RGB if necessary
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGB')
+    return img
+
+def _compose_pan_zoom_master(img, output_width, output_height, screen_height_percent, zoom_factor, resample_filter, downscaled_blur):
+    """Image préparée recomposée à zoom_factor x la taille de l'écran, depuis la photo d'origine."""
+    master_width, master_height = pan_zoom_size(output_width, output_height, zoom_factor)
+    master_photo_height = int(master_height * (screen_height_percent / 100))
+    master, _, _ = _compose_display_canvas(
+        img, master_width, master_height, master_photo_height, resample_filter, downscaled_blur,
+        blur_radius=int(50 * zoom_factor)
+    )
+    return master
+
+def prepare_photo(source_path, dest_path, output_width, output_height, source_type=None, caption=None, derivatives=None, pan_zoom_factor=None):
+    """
+    Prépare une photo pour l'affichage avec redimensionnement, rotation EXIF et fond flou.
+    pan_zoom_factor : facteur de la version pan/zoom à générer (par défaut, celui de la configuration si le pan/zoom est activé).
+    """
+    config = get_config()
     screen_height_percent = int(config.get("screen_height_percent", "100"))
     effective_photo_height = int(output_height * (screen_height_percent / 100))
+    if derivatives is None:
+        derivatives = get_enabled_derivatives(config, source_type)
+    if pan_zoom_factor is None:
+        pan_zoom_factor = get_pan_zoom_factor(config)
     
     try:
-        # Gestion des fichiers HEIF/HEIC
-        if source_path.lower().endswith(('.heic', '.heif')):
-            if HEIF_SUPPORT:
-                pillow_heif.register_heif_opener()
-            else:
-                logger.warning(f"Support HEIF désactivé (pillow-heif non installé). Impossible de traiter {source_path}")
-                return None
-        
-        img = Image.open(source_path)
-        
-        # Modification Sigalou 25/01/2026 - Suppression de la lecture EXIF redondante
-        # Les métadonnées sont déjà dans le JSON créé par download_album.py
-        # On ne lit plus les EXIF ici pour éviter la duplication
-        # Fin Modification Sigalou 25/01/2026
-        
-        # 1. Handle EXIF Orientation
-        rotation_angle = get_rotation_angle(img)
-        if rotation_angle != 0:
-            img = img.rotate(rotation_angle, expand=True)
-        
-        # Remove EXIF data after rotation
-        if "exif" in img.info:
-            img.info.pop("exif")
-        if "icc_profile" in img.info:
-            img.info.pop("icc_profile")
+        # La version pan/zoom est la plus grande image produite : le décodage réduit doit la couvrir
+        decode_size = pan_zoom_size(output_width, output_height, pan_zoom_factor) if pan_zoom_factor else (output_width, output_height)
+        img = _open_source_for_display(source_path, decode_size)
+        if img is None:
+            return None
         
-        # Convert to RGB if necessary
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
+        resample_filter, downscaled_blur = _display_resampling()
         
-        # Determine if the image is portrait-like
-        img_aspect_ratio = img.width / img.height
-        display_area_aspect_ratio = output_width / effective_photo_height
+        final_img, img_content, (x_offset, y_offset) = _compose_display_canvas(
+            img, output_width, output_height, effective_photo_height, resample_filter, downscaled_blur
+        )
+        pan_zoom_master = None
+        if pan_zoom_factor:
+            pan_zoom_master = _compose_pan_zoom_master(img, output_width, output_height, screen_height_percent, pan_zoom_factor, resample_filter, downscaled_blur)
         
-        pi_model = get_pi_model()
-        is_low_end = (pi_model in [1, 2, 3])
-        resample_filter = Image.Resampling.BILINEAR if is_low_end else Image.Resampling.LANCZOS
-        
-        if img_aspect_ratio < display_area_aspect_ratio:
-            # Portrait photo - add blurred background
-            img_content = img.copy()
-            scale = effective_photo_height / img.height
-            new_width = int(img.width * scale)
-            img_content = img_content.resize((new_width, effective_photo_height), resample_filter)
-            
-            # Create blurred background
-            if is_low_end:
-                # Optimized, low-memory background blur for Raspberry Pi 1, 2, 3
-                bg_scale = max(160 / img.width, 90 / img.height)
-                bg_new_width = int(img.width * bg_scale)
-                bg_new_height = int(img.height * bg_scale)
-                bg_img = img.resize((bg_new_width, bg_new_height), Image.Resampling.NEAREST)
-                if bg_img.width > 160 or bg_img.height > 90:
-                    left = (bg_img.width - 160) // 2
-                    top = (bg_img.height - 90) // 2
-                    bg_img = bg_img.crop((left, top, left + 160, top + 90))
-                bg_img = bg_img.filter(ImageFilter.GaussianBlur(radius=3))
-                bg_img = bg_img.resize((output_width, output_height), Image.Resampling.BILINEAR)
-            else:
-                bg_img = img.copy()
-                bg_scale = max(output_width / img.width, output_height / img.height)
-                bg_new_width = int(img.width * bg_scale)
-                bg_new_height = int(img.height * bg_scale)
-                bg_img = bg_img.resize((bg_new_width, bg_new_height), Image.Resampling.LANCZOS)
-                if bg_img.width > output_width or bg_img.height > output_height:
-                    left = (bg_img.width - output_width) // 2
-                    top = (bg_img.height - output_height) // 2
-                    bg_img = bg_img.crop((left, top, left + output_width, top + output_height))
-                bg_img = bg_img.filter(ImageFilter.GaussianBlur(radius=50))
-            
-            final_img = Image.new('RGB', (output_width, output_height), (0, 0, 0))
-            final_img.paste(bg_img, (0, 0))
-            
-            x_offset = (output_width - img_content.width) // 2
-            y_offset = (output_height - img_content.height) // 2
-            final_img.paste(img_content, (x_offset, y_offset))
-        else:
-            # Landscape or square photo
-            img_content = img.copy()
-            scale = effective_photo_height / img.height
-            new_width = int(img.width * scale)
-            img_content = img_content.resize((new_width, effective_photo_height), resample_filter)
-            
-            final_img = Image.new('RGB', (output_width, output_height), (0, 0, 0))
-            x_offset = (output_width - img_content.width) // 2
-            y_offset = (output_height - img_content.height) // 2
-            final_img.paste(img_content, (x_offset, y_offset))
+        # La source pleine résolution n'est plus nécessaire
+        del img
         
         # Prepare EXIF metadata with content coordinates
         exif_bytes_to_add = None
@@ -257,105 +415,585 @@ def prepare_photo(source_path, dest_path, output_width, output_height, source_ty
         except Exception as exif_e:
             print(f"[EXIF] Avertissement: Impossible de créer les métadonnées pour {os.path.basename(source_path)}: {exif_e}")
         
-        # Generate Polaroid version
-        try:
-            polaroid_content = create_polaroid_effect(img_content.copy())
-            polaroid_final_img = final_img.copy()
-            polaroid_final_img.paste(polaroid_content, (x_offset, y_offset))
-            
-            dest_path_obj = Path(dest_path)
-            polaroid_dest_path = dest_path_obj.with_name(f"{dest_path_obj.stem}_polaroid.jpg")
-            polaroid_final_img.save(polaroid_dest_path, 'JPEG', quality=90, optimize=True, exif=exif_bytes_to_add)
-        except Exception as polaroid_e:
-            print(f"[Polaroid] Avertissement: Impossible de créer la version Polaroid pour {os.path.basename(source_path)}: {polaroid_e}")
-        
-        # Generate Postcard version
-        try:
-            postcard_img_content = img_content.copy()
-            scale_factor = 0.85
-            postcard_img_content.thumbnail(
-                (int(output_width * scale_factor), int(output_height * scale_factor)),
-                resample_filter
-            )
-            
-            postcard_content = create_postcard_effect(postcard_img_content, caption=caption)
-            postcard_final_img = final_img.copy()
-            postcard_x_offset = (output_width - postcard_content.width) // 2
-            postcard_y_offset = (output_height - postcard_content.height) // 2
-            postcard_final_img.paste(postcard_content, (postcard_x_offset, postcard_y_offset), postcard_content)
-            
-            dest_path_obj = Path(dest_path)
-            postcard_dest_path = dest_path_obj.with_name(f"{dest_path_obj.stem}_postcard.jpg")
-            postcard_final_img.save(postcard_dest_path, 'JPEG', quality=90, optimize=True, exif=exif_bytes_to_add)
-        except Exception as postcard_e:
-            print(f"--- ERREUR CRÉATION CARTE POSTALE pour {os.path.basename(source_path)} ---")
-            print(f"Détails de l'erreur : {postcard_e}")
-            print("Vérifiez que les polices (static/fonts) et les timbres (static/stamps) sont présents et accessibles.")
-            print("--------------------------------------------------------------------")
-        
-        # Save main prepared image
-        img_to_save = final_img
-        if exif_bytes_to_add:
-            img_to_save.save(dest_path, 'JPEG', quality=85, optimize=True, exif=exif_bytes_to_add)
-        else:
-            img_to_save.save(dest_path, 'JPEG', quality=85, optimize=True)
+        # Base, Polaroid et carte postale à partir du même canevas
+        _render_derivatives(
+            final_img, img_content, (x_offset, y_offset), dest_path, derivatives,
+            caption, exif_bytes_to_add, resample_filter, os.path.basename(source_path)
+        )
+        # Version pan/zoom enregistrée après la base : le diaporama ignore une version plus ancienne que la base
+        if pan_zoom_master is not None:
+            _save_jpeg(pan_zoom_master, pan_zoom_master_path(dest_path), 85, None)
     
     except Exception as e:
         raise Exception(f"Erreur lors du traitement de l'image '{os.path.basename(source_path)}': {e}")
 
-def prepare_video(source_path, dest_path, output_width, output_height):
-    """Prépare une vidéo pour l'affichage et génère sa vignette."""
+def prepare_pan_zoom_master(source_path, dest_path, output_width, output_height, pan_zoom_factor):
+    """(Re)génère uniquement la version pan/zoom d'une photo déjà préparée (facteur de zoom modifié)."""
+    config = get_config()
+    screen_height_percent = int(config.get("screen_height_percent", "100"))
     try:
-        # --- MODIFICATION SIGALOU 29/01/2026 (2) ---
-        # Logique d'encodage améliorée pour Pi 4/5 et meilleure gestion des erreurs.
-        encoder = 'libx264'
+        img = _open_source_for_display(source_path, pan_zoom_size(output_width, output_height, pan_zoom_factor))
+        if img is None:
+            return None
+        resample_filter, downscaled_blur = _display_resampling()
+        master = _compose_pan_zoom_master(img, output_width, output_height, screen_height_percent, pan_zoom_factor, resample_filter, downscaled_blur)
+        del img
+        _save_jpeg(master, pan_zoom_master_path(dest_path), 85, None)
+    except Exception as e:
+        raise Exception(f"Erreur lors de la génération de la version pan/zoom de '{os.path.basename(source_path)}': {e}")
+
+# Clips lisibles tels quels par le diaporama : remuxés en MP4 (-c copy) au lieu d'être transcodés
+PASSTHROUGH_VIDEO_CODECS = ("h264",)
+PASSTHROUGH_PIX_FMTS = ("yuv420p", "yuvj420p")
+PASSTHROUGH_AUDIO_CODECS = ("aac",)
+
+def _probe_video(source_path):
+    """
+    Décrit le premier flux vidéo et le premier flux audio d'un fichier (ffprobe).
+    Les dimensions sont celles de l'affichage (rotation du téléphone appliquée). Retourne None si la sonde échoue.
+    """
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_streams', '-show_format', '-of', 'json', source_path],
+            capture_output=True, text=True, check=True, timeout=30, preexec_fn=_subprocess_preexec()
+        )
+        data = json.loads(result.stdout)
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        logger.warning(f"[Video Prep] Sonde ffprobe impossible pour {os.path.basename(source_path)} : {e}")
+        return None
+
+    streams = data.get("streams", [])
+    video = next((st for st in streams if st.get("codec_type") == "video" and not st.get("disposition", {}).get("attached_pic")), None)
+    audio = next((st for st in streams if st.get("codec_type") == "audio"), None)
+    if video is None:
+        return None
+
+    rotation = 0
+    try:
+        for side_data in video.get("side_data_list", []):
+            if "rotation" in side_data:
+                rotation = int(side_data["rotation"])
+        rotation = rotation or int(video.get("tags", {}).get("rotate", 0))
+    except (TypeError, ValueError):
+        rotation = 0
+    width, height = int(video.get("width") or 0), int(video.get("height") or 0)
+    if abs(rotation) % 180 == 90:
+        width, height = height, width
+
+    try:
+        duration = float(data.get("format", {}).get("duration") or video.get("duration") or 0)
+    except (TypeError, ValueError):
+        duration = 0.0
+    return {
+        "video_codec": video.get("codec_name"),
+        "pix_fmt": video.get("pix_fmt"),
+        "width": width,
+        "height": height,
+        "audio_codec": audio.get("codec_name") if audio else None,
+        "duration": duration,
+    }
+
+def _is_passthrough_compatible(probe, output_width, output_height):
+    """Vrai si le clip est déjà en H.264 8 bits 4:2:0 et ne dépasse pas l'écran."""
+    return (
+        probe is not None
+        and probe["video_codec"] in PASSTHROUGH_VIDEO_CODECS
+        and probe["pix_fmt"] in PASSTHROUGH_PIX_FMTS
+        and 0 < probe["width"] <= output_width
+        and 0 < probe["height"] <= output_height
+    )
+
+def _transcode_args(output_width, output_height):
+    """Arguments de réencodage vidéo (mise à l'échelle et bandes noires à la taille de l'écran)."""
+    # --- MODIFICATION SIGALOU 29/01/2026 (2) ---
+    # Logique d'encodage améliorée pour Pi 4/5 et meilleure gestion des erreurs.
+    # L'encodeur est choisi par le profil matériel (encodeurs de ffmpeg détectés une seule fois) :
+    # v4l2m2m en priorité sur tous les Raspberry Pi (3, 4, 5), puis omx (legacy), sinon libx264.
+    encoder = get_tiers()["video_encoder"]
+    if encoder == 'libx264':
         encoder_params = ['-preset', 'veryfast', '-crf', '23', '-profile:v', 'high', '-level', '4.0']
-        pi_model = get_pi_model()
-        
-        try:
-            result = subprocess.run(['ffmpeg', '-encoders'], capture_output=True, text=True, check=True, timeout=20)
-            available_encoders = result.stdout
-            
-            # Priorité à l'encodeur matériel moderne v4l2m2m pour tous les modèles de Raspberry Pi (3, 4, 5)
-            if pi_model and 'h264_v4l2m2m' in available_encoders:
-                encoder = 'h264_v4l2m2m'
-                encoder_params = ['-b:v', '8M']
-                print(f"[Video Prep] Raspberry Pi {pi_model} détecté. Utilisation de l'encodeur matériel : h264_v4l2m2m")
-            elif pi_model and 'h264_omx' in available_encoders:
-                encoder = 'h264_omx'
-                encoder_params = ['-b:v', '8M']
-                print(f"[Video Prep] Raspberry Pi {pi_model} détecté. Utilisation de l'encodeur matériel legacy : h264_omx")
-            else:
-                print("[Video Prep] Aucun encodeur matériel trouvé, utilisation de l'encodeur logiciel : libx264")
-        except Exception as e:
-            print(f"[Video Prep] Avertissement : Impossible de détecter les encodeurs ({e}). Utilisation de l'encodeur logiciel par défaut.")
-        
+        logger.info("[Video Prep] Aucun encodeur matériel disponible, utilisation de l'encodeur logiciel : libx264")
+    else:
+        encoder_params = ['-b:v', '8M']
+        logger.info(f"[Video Prep] Raspberry Pi {get_profile()['pi_model']} : utilisation de l'encodeur matériel {encoder}")
+    return [
+        '-vf', f"scale='min({output_width},iw)':'min({output_height},ih)':force_original_aspect_ratio=decrease,pad={output_width}:{output_height}:(ow-iw)/2:(oh-ih)/2",
+        '-c:v', encoder, *encoder_params,
+        '-pix_fmt', 'yuv420p',  # Ajout pour une meilleure compatibilité
+        '-c:a', 'aac', '-b:a', '128k',
+    ]
+
+def prepare_video(source_path, dest_path, output_width, output_height):
+    """
+    Prépare une vidéo pour l'affichage et génère sa vignette dans la même passe ffmpeg.
+    Les flux sont sondés d'abord : un clip déjà compatible (H.264 4:2:0, pas plus grand que l'écran) est
+    remuxé sans réencodage (seul un son dans un autre format que l'AAC est converti), les autres sont transcodés.
+    """
+    dest_path_obj = Path(dest_path)
+    thumbnail_path = dest_path_obj.with_name(f"{dest_path_obj.stem}_thumbnail.jpg")
+    source_name = os.path.basename(source_path)
+    probe = _probe_video(source_path)
+
+    attempts = []
+    if _is_passthrough_compatible(probe, output_width, output_height):
+        audio_args = ['-c:a', 'copy'] if probe["audio_codec"] in PASSTHROUGH_AUDIO_CODECS else ['-c:a', 'aac', '-b:a', '128k']
+        attempts.append(("remux", ['-c:v', 'copy', *audio_args]))
+    attempts.append(("transcodage", None))  # Arguments calculés seulement si nécessaire (journalise l'encodeur)
+
+    # Vignette à 1 s, ou au milieu d'un clip plus court
+    thumbnail_at = 1.0
+    if probe is not None and 0 < probe["duration"] < 2:
+        thumbnail_at = probe["duration"] / 2
+
+    last_error = None
+    for mode, stream_args in attempts:
+        if stream_args is None:
+            stream_args = _transcode_args(output_width, output_height)
         command = [
-            'ffmpeg', '-i', source_path, '-vf', f"scale='min({output_width},iw)':'min({output_height},ih)':force_original_aspect_ratio=decrease,pad={output_width}:{output_height}:(ow-iw)/2:(oh-ih)/2",
-            '-c:v', encoder, *encoder_params,
-            '-pix_fmt', 'yuv420p',  # Ajout pour une meilleure compatibilité
-            '-c:a', 'aac', '-b:a', '128k',
-            '-y', dest_path
+            'ffmpeg', '-y', '-i', source_path,
+            # Sortie 1 : la vidéo préparée
+            '-map', '0:v:0', '-map', '0:a:0?', *stream_args, '-movflags', '+faststart', dest_path,
+            # Sortie 2 : la vignette, prise dans la même lecture du fichier
+            '-map', '0:v:0', '-ss', f"{thumbnail_at:.3f}", '-frames:v', '1', '-q:v', '2', str(thumbnail_path),
         ]
-        
-        result = subprocess.run(command, check=False, capture_output=True, text=True, encoding='utf-8')
-        
-        if result.returncode != 0:
-            raise Exception(f"ffmpeg a échoué avec le code {result.returncode}. Erreur: {result.stderr.strip()}")
-    
-    except Exception as video_e:
-        raise Exception(f"Erreur lors du traitement de la vidéo '{os.path.basename(source_path)}': {video_e}")
-    
-    # Generate thumbnail
+        try:
+            result = subprocess.run(command, check=False, capture_output=True, text=True, encoding='utf-8', preexec_fn=_subprocess_preexec())
+        except OSError as e:
+            raise Exception(f"Erreur lors du traitement de la vidéo '{source_name}': {e}")
+        if result.returncode == 0:
+            logger.info(f"[Video Prep] {source_name} préparée ({mode}).")
+            break
+        last_error = f"ffmpeg a échoué avec le code {result.returncode}. Erreur: {result.stderr.strip()}"
+        if mode == "remux":
+            logger.warning(f"[Video Prep] Remux impossible pour {source_name}, transcodage. ({last_error})")
+    else:
+        raise Exception(f"Erreur lors du traitement de la vidéo '{source_name}': {last_error}")
+
+    if not thumbnail_path.is_file():
+        print(f"[Vignette] Avertissement: Impossible de créer la vignette pour {source_name}")
+        return
     try:
-        dest_path_obj = Path(dest_path)
-        thumbnail_path = dest_path_obj.with_name(f"{dest_path_obj.stem}_thumbnail.jpg")
-        thumb_command = [
-            'ffmpeg', '-i', source_path, '-ss', '00:00:01.000', '-vframes', '1', '-q:v', '2', str(thumbnail_path), '-y'
-        ]
-        subprocess.run(thumb_command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except Exception as thumb_e:
-        print(f"[Vignette] Avertissement: Impossible de créer la vignette pour {os.path.basename(source_path)}: {thumb_e}")
+        ensure_thumbnail(thumbnail_path)
+    except Exception as e:
+        logger.warning(f"[Vignette] Impossible de créer la vignette de galerie de {source_name} : {e}")
+
+# ============================================================
+# Préparation parallèle (pool de processus)
+# ============================================================
+
+# Vrai uniquement dans un worker dont la mémoire a été plafonnée
+_worker_memory_limited = False
+
+def get_prepare_worker_count(config):
+    """
+    Détermine le nombre de processus de préparation à lancer.
+    En mode "auto", on prend un processus par cœur, dans la limite de la RAM disponible
+    divisée par le budget mémoire d'un worker.
+    """
+    raw_workers = config.get("prepare_workers", "auto")
+    if str(raw_workers).lower() != "auto":
+        try:
+            return max(1, int(raw_workers))
+        except (ValueError, TypeError):
+            return 1
+
+    cores = get_tiers()["prepare_workers"]
+    try:
+        memory_limit_mb = int(config.get("prepare_worker_memory_mb", 400))
+    except (ValueError, TypeError):
+        memory_limit_mb = 0
+    if memory_limit_mb <= 0:
+        return cores
+
+    available_mb = psutil.virtual_memory().available // (1024 * 1024)
+    return max(1, min(cores, available_mb // memory_limit_mb))
+
+def _prepare_pool_context():
+    """
+    Contexte multiprocessing des pools de préparation. Les pools sont démarrés depuis les threads de
+    l'application web (import, mises à jour automatiques) : un fork à ce moment copierait des verrous
+    tenus par d'autres threads (journalisation, SQLite...) et pourrait bloquer le worker. Le serveur
+    "forkserver", mono-thread, crée les workers à partir de ce module préchargé une seule fois ;
+    "spawn" sert de repli sur les systèmes qui n'ont pas de forkserver.
+    """
+    try:
+        context = multiprocessing.get_context("forkserver")
+    except ValueError:
+        return multiprocessing.get_context("spawn")
+    context.set_forkserver_preload(["utils.prepare_all_photos"])
+    return context
+
+def _init_prepare_worker(memory_limit_mb):
+    """
+    Initialise un processus de préparation : budget mémoire et priorité basse.
+    Le budget s'ajoute à l'empreinte de départ du worker (module et PIL déjà chargés),
+    pour que seule la mémoire allouée par la préparation soit plafonnée.
+    """
+    try:
+        os.nice(10)  # Laisser la priorité au diaporama et au serveur web
+    except OSError:
+        pass
+
+    if resource is None or not memory_limit_mb or memory_limit_mb <= 0:
+        return
+    try:
+        inherited_bytes = psutil.Process().memory_info().vms
+        soft_limit = inherited_bytes + int(memory_limit_mb) * 1024 * 1024
+        _, hard_limit = resource.getrlimit(resource.RLIMIT_AS)
+        if hard_limit != resource.RLIM_INFINITY:
+            soft_limit = min(soft_limit, hard_limit)
+        resource.setrlimit(resource.RLIMIT_AS, (soft_limit, hard_limit))
+        global _worker_memory_limited
+        _worker_memory_limited = True
+    except (ValueError, OSError) as e:
+        logger.warning(f"Impossible d'appliquer la limite mémoire du worker de préparation : {e}")
+
+def _subprocess_preexec():
+    """Retourne le preexec_fn à passer aux sous-processus (uniquement dans un worker plafonné)."""
+    return _release_memory_limit if _worker_memory_limited else None
+
+def _release_memory_limit():
+    """Rétablit la limite mémoire d'origine pour les sous-processus (ffmpeg) lancés depuis un worker."""
+    if resource is None:
+        return
+    try:
+        _, hard_limit = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (hard_limit, hard_limit))
+    except (ValueError, OSError):
+        pass
+
+def _prepare_media_task(task):
+    """Prépare un média décrit par une tâche. Exécuté dans un worker ou dans le processus courant."""
+    if task["kind"] == "video":
+        prepare_video(task["src_path"], task["dest_path"], task["width"], task["height"])
+    elif task["kind"] == "pan_zoom":
+        prepare_pan_zoom_master(task["src_path"], task["dest_path"], task["width"], task["height"], task["zoom_factor"])
+    else:
+        prepare_photo(task["src_path"], task["dest_path"], task["width"], task["height"], source_type=task["source_type"], caption=task["caption"])
+
+def _load_user_text_map():
+    """Charge les textes saisis par l'utilisateur (clés "source/fichier.jpg")."""
+    if USER_TEXT_MAP_CACHE_FILE.exists():
+        try:
+            with open(USER_TEXT_MAP_CACHE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            print(f"Avertissement: Impossible de charger le fichier de textes utilisateur {USER_TEXT_MAP_CACHE_FILE}")
+    return {}
+
+def _build_prepare_task(filename, source_dir, prepared_dir, width, height, source_type, description_map, user_text_map):
+    """Construit la tâche de préparation d'un fichier source, légende comprise."""
+    src_path = os.path.join(source_dir, filename)
+    base_name, extension = os.path.splitext(filename)
+    task = {
+        "filename": filename,
+        "src_path": src_path,
+        "width": width,
+        "height": height,
+        "source_type": source_type,
+        "caption": None,
+    }
+
+    if extension.lower() in VIDEO_EXTENSIONS:
+        task["kind"] = "video"
+        task["dest_path"] = str(Path(prepared_dir) / f"{base_name}.mp4")
+        task["preview"] = f"{base_name}_thumbnail.jpg"
+        return task
+
+    dest_filename = f"{base_name}.jpg"
+    relative_path_key = f"{source_type}/{dest_filename}"
+
+    # Modification Sigalou 25/01/2026 - Utilisation des métadonnées du JSON uniquement
+    # Priority 1: User text
+    caption = user_text_map.get(relative_path_key)
+
+    # Priority 2: Immich description (if no user text)
+    if caption is None:
+        immich_data = description_map.get(filename)
+        if immich_data and isinstance(immich_data, dict):
+            caption = immich_data.get("description")
+        elif isinstance(immich_data, str):
+            caption = immich_data  # Backward compatibility
+    # Fin Modification Sigalou 25/01/2026
+
+    task["kind"] = "photo"
+    task["dest_path"] = str(Path(prepared_dir) / dest_filename)
+    task["preview"] = dest_filename
+    task["caption"] = caption
+    return task
+
+def _build_pan_zoom_tasks(source_files, prepared_basenames, source_dir, prepared_dir, width, height, zoom_factor):
+    """
+    Tâches de (re)génération des versions pan/zoom des photos déjà préparées : version absente
+    ou générée pour un autre facteur de zoom. Les photos retouchées (filtre, texte) sont ignorées,
+    leur version pan/zoom recalculée depuis l'original perdrait la retouche.
+    """
+    size = pan_zoom_size(width, height, zoom_factor)
+    backup_dir = Path(prepared_dir).parent.parent / '.backups' / Path(prepared_dir).name
+    tasks = []
+    for filename, basename in source_files.items():
+        if basename not in prepared_basenames or filename.lower().endswith(VIDEO_EXTENSIONS):
+            continue
+        dest_path = Path(prepared_dir) / f"{basename}.jpg"
+        if (backup_dir / dest_path.name).exists() or has_current_master(dest_path, size):
+            continue
+        tasks.append({
+            "kind": "pan_zoom",
+            "filename": filename,
+            "src_path": os.path.join(source_dir, filename),
+            "dest_path": str(dest_path),
+            "width": width,
+            "height": height,
+            "zoom_factor": zoom_factor,
+            "preview": dest_path.name,
+        })
+    return tasks
+
+def _get_prepare_memory_limit(config):
+    try:
+        return int(config.get("prepare_worker_memory_mb", 400) or 0)
+    except (ValueError, TypeError):
+        return 0
+
+def _run_tasks_sequentially(tasks):
+    """Exécute les tâches une par une et produit (tâche, erreur) dans l'ordre."""
+    for task in tasks:
+        if CANCEL_FLAG.exists():
+            return
+        try:
+            _prepare_media_task(task)
+            yield task, None
+        except Exception as e:
+            yield task, e
+
+def get_prepare_video_worker_count(config):
+    """Nombre de vidéos préparées en même temps (chaque préparation est un processus ffmpeg)."""
+    try:
+        return max(1, int(config.get("prepare_video_workers", 1)))
+    except (ValueError, TypeError):
+        return 1
+
+def _prepare_video_task(task):
+    """Prépare une vidéo depuis la file des vidéos (l'annulation est vérifiée au démarrage de chaque vidéo)."""
+    if CANCEL_FLAG.exists():
+        raise Exception("Préparation annulée.")
+    _prepare_media_task(task)
+
+def _run_prepare_tasks(tasks, worker_count, memory_limit_mb, video_worker_count=1):
+    """
+    Exécute les tâches de préparation et produit (tâche, erreur) au fil des fins de tâches.
+    Les vidéos passent par leur propre file bornée (threads pilotant ffmpeg, au plus video_worker_count
+    à la fois) : une longue vidéo ne retient plus les photos, qui avancent en parallèle dans le pool.
+    """
+    photo_tasks = [task for task in tasks if task["kind"] != "video"]
+    video_tasks = deque(task for task in tasks if task["kind"] == "video")
+    if not video_tasks:
+        yield from _run_photo_tasks(photo_tasks, worker_count, memory_limit_mb)
+        return
+
+    video_executor = ThreadPoolExecutor(max_workers=video_worker_count, thread_name_prefix="video-prep")
+    running = []
+
+    def refill():
+        # File bornée : au plus une vidéo en attente par vidéo en cours
+        while video_tasks and len(running) < video_worker_count * 2 and not CANCEL_FLAG.exists():
+            task = video_tasks.popleft()
+            running.append((task, video_executor.submit(_prepare_video_task, task)))
+
+    def finished_videos(wait_all):
+        while True:
+            refill()
+            done = [entry for entry in running if entry[1].done()]
+            if not done:
+                if not wait_all or not running:
+                    return
+                wait([future for _, future in running], return_when=FIRST_COMPLETED)
+                continue
+            for entry in done:
+                running.remove(entry)
+                yield entry[0], entry[1].exception()
+
+    try:
+        # Pool des photos créé (et première fenêtre soumise) avant le premier thread vidéo
+        photo_results = _run_photo_tasks(photo_tasks, worker_count, memory_limit_mb)
+        refill()
+        try:
+            for result in photo_results:
+                yield result
+                yield from finished_videos(wait_all=False)
+        finally:
+            photo_results.close()
+        yield from finished_videos(wait_all=True)
+    finally:
+        # Annulation : les vidéos pas encore démarrées sont abandonnées, celles en cours se terminent
+        video_executor.shutdown(wait=False, cancel_futures=True)
+
+def _run_photo_tasks(tasks, worker_count, memory_limit_mb):
+    """
+    Exécute les tâches de préparation des photos et retourne un générateur de (tâche, erreur) dans l'ordre de soumission.
+    Avec plusieurs workers, seule une fenêtre de 2 tâches par worker est soumise à l'avance :
+    si le consommateur arrête d'itérer (annulation), les tâches non démarrées sont abandonnées.
+    Le pool est créé et la première fenêtre soumise dès l'appel, pas au premier next().
+    """
+    if worker_count <= 1 or len(tasks) <= 1:
+        return _run_tasks_sequentially(tasks)
+
+    executor = ProcessPoolExecutor(
+        max_workers=worker_count,
+        mp_context=_prepare_pool_context(),
+        initializer=_init_prepare_worker,
+        initargs=(memory_limit_mb,)
+    )
+    pending = deque()
+    task_iter = iter(tasks)
+
+    def submit_next():
+        task = next(task_iter, None)
+        if task is None:
+            return False
+        pending.append((task, executor.submit(_prepare_media_task, task)))
+        return True
+
+    try:
+        for _ in range(worker_count * 2):
+            if not submit_next():
+                break
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    return _collect_photo_results(executor, pending, task_iter, submit_next)
+
+def _collect_photo_results(executor, pending, task_iter, submit_next):
+    """Produit les résultats du pool des photos en gardant la fenêtre de soumission pleine."""
+    remaining_tasks = []
+    try:
+        while pending:
+            task, future = pending.popleft()
+            try:
+                future.result()
+                error = None
+            except BrokenProcessPool as e:
+                # Un worker a été tué (OOM killer...) : on abandonne le pool et on termine en séquentiel
+                logger.error(f"Pool de préparation interrompu ({e}). Poursuite en mode séquentiel.")
+                remaining_tasks = [t for t, _ in pending] + list(task_iter)
+                pending.clear()
+                yield task, e
+                break
+            except Exception as e:
+                error = e
+            submit_next()
+            yield task, error
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if remaining_tasks:
+        yield from _run_tasks_sequentially(remaining_tasks)
+
+class BackgroundPreparer:
+    """
+    Prépare les médias au fil de leur arrivée (téléchargement, extraction) au lieu
+    d'attendre la fin de l'import. Les fichiers préparés ici sont ensuite ignorés par
+    prepare_all_photos_with_progress, qui ne traite plus que les éventuels échecs.
+    """
+
+    def __init__(self, source_type, screen_width=None, screen_height=None, description_map=None):
+        self.source_type = source_type
+        self.width = screen_width if screen_width is not None else DEFAULT_OUTPUT_WIDTH
+        self.height = screen_height if screen_height is not None else DEFAULT_OUTPUT_HEIGHT
+        self.source_dir = Path("static") / "photos" / source_type
+        self.prepared_dir = Path("static") / "prepared" / source_type
+        self._description_map = description_map
+        self._user_text_map = None
+        self._executor = None
+        self._video_executor = None
+        self._futures = []
+
+    def _start(self):
+        """Démarre le pool à la première soumission (les légendes Immich sont alors déjà en cache)."""
+        if self._description_map is None:
+            self._description_map = {}
+            if self.source_type == "immich" and DESCRIPTION_MAP_CACHE_FILE.exists():
+                try:
+                    with open(DESCRIPTION_MAP_CACHE_FILE, 'r', encoding='utf-8') as f:
+                        self._description_map = json.load(f)
+                except (json.JSONDecodeError, IOError) as e:
+                    logger.warning(f"Impossible de charger le cache des descriptions Immich : {e}")
+        self._user_text_map = _load_user_text_map()
+        self.prepared_dir.mkdir(parents=True, exist_ok=True)
+
+        prep_config = load_config()
+        worker_count = get_prepare_worker_count(prep_config)
+        self._executor = ProcessPoolExecutor(
+            max_workers=worker_count,
+            mp_context=_prepare_pool_context(),
+            initializer=_init_prepare_worker,
+            initargs=(_get_prepare_memory_limit(prep_config),)
+        )
+        # Les vidéos ont leur propre file : un long transcodage n'occupe pas un processus du pool des photos
+        self._video_executor = ThreadPoolExecutor(max_workers=get_prepare_video_worker_count(prep_config), thread_name_prefix="video-prep")
+        logger.info(f"Préparation au fil de l'import sur {worker_count} processus.")
+
+    def submit(self, src_path):
+        """Soumet un fichier source qui vient d'être écrit dans static/photos/<source>."""
+        filename = Path(src_path).name
+        if not filename.lower().endswith(('.jpg', '.jpeg', '.png', '.heic', '.heif') + VIDEO_EXTENSIONS):
+            return
+        if CANCEL_FLAG.exists():
+            return
+        if self._executor is None:
+            self._start()
+        task = _build_prepare_task(filename, self.source_dir, self.prepared_dir, self.width, self.height, self.source_type, self._description_map, self._user_text_map)
+        try:
+            if task["kind"] == "video":
+                future = self._video_executor.submit(_prepare_video_task, task)
+            else:
+                future = self._executor.submit(_prepare_media_task, task)
+            self._futures.append((task, future))
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.warning(f"Préparation au fil de l'import indisponible ({e}), {filename} sera préparé ensuite.")
+
+    def close(self):
+        """Attend la fin des préparations en cours et retourne le nombre de médias préparés."""
+        if self._executor is None:
+            return 0
+        self._executor.shutdown(wait=True, cancel_futures=CANCEL_FLAG.exists())
+        self._video_executor.shutdown(wait=True, cancel_futures=CANCEL_FLAG.exists())
+        prepared_count = 0
+        for task, future in self._futures:
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is None:
+                prepared_count += 1
+                index_media(self.source_type, os.path.basename(task["dest_path"]))
+            else:
+                logger.warning(f"Erreur lors de la préparation de {task['filename']}: {error}")
+        self._executor = None
+        self._video_executor = None
+        self._futures = []
+        return prepared_count
+
+def invalidate_prepared_files(prepared_folder, filename):
+    """
+    Supprime les versions préparées d'un fichier source (et la sauvegarde d'avant filtre)
+    pour forcer leur régénération, ou pour nettoyer après la suppression de la source.
+    """
+    prepared_folder = Path(prepared_folder)
+    stem = os.path.splitext(filename)[0]
+    backup_folder = prepared_folder.parent.parent / '.backups' / prepared_folder.name
+    for suffix in ("", "_polaroid", "_postcard", "_thumbnail", "_panzoom"):
+        for ext in (".jpg", ".mp4"):
+            name = f"{stem}{suffix}{ext}"
+            for prepared_path in (prepared_folder / name, backup_folder / name):
+                try:
+                    prepared_path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Impossible de supprimer {prepared_path} : {e}")
+    remove_thumbnails(prepared_folder, stem)
+    for ext in (".jpg", ".mp4"):
+        remove_media(prepared_folder.name, f"{stem}{ext}")
 
 def prepare_all_photos_with_progress(screen_width=None, screen_height=None, source_type="unknown", description_map=None):
     """Prépare les photos et retourne des objets structurés pour le suivi."""
@@ -363,13 +1001,7 @@ def prepare_all_photos_with_progress(screen_width=None, screen_height=None, sour
         description_map = {}
     
     # Charger les textes saisis par l'utilisateur
-    user_text_map = {}
-    if USER_TEXT_MAP_CACHE_FILE.exists():
-        try:
-            with open(USER_TEXT_MAP_CACHE_FILE, 'r', encoding='utf-8') as f:
-                user_text_map = json.load(f)
-        except (json.JSONDecodeError, IOError):
-            print(f"Avertissement: Impossible de charger le fichier de textes utilisateur {USER_TEXT_MAP_CACHE_FILE}")
+    user_text_map = _load_user_text_map()
     
     actual_output_width = screen_width if screen_width is not None else DEFAULT_OUTPUT_WIDTH
     actual_output_height = screen_height if screen_height is not None else DEFAULT_OUTPUT_HEIGHT
@@ -410,7 +1042,7 @@ def prepare_all_photos_with_progress(screen_width=None, screen_height=None, sour
     if PREPARED_SOURCE_DIR.exists():
         for f in PREPARED_SOURCE_DIR.iterdir():
             if f.is_file():
-                base = re.sub(r'(_polaroid|_postcard|_thumbnail)$', '', f.stem)
+                base = re.sub(r'(_polaroid|_postcard|_thumbnail|_panzoom)$', '', f.stem)
                 all_prepared_basenames_on_disk.add(base)
     
     # Delete obsolete media (except for smartphone source)
@@ -431,9 +1063,11 @@ def prepare_all_photos_with_progress(screen_width=None, screen_height=None, sour
                 try:
                     if file_to_delete.is_file():
                         file_to_delete.unlink()
+                        remove_media(source_type, file_to_delete.name)
                 except OSError as e:
                     yield yield_and_log("warning", f"Impossible de supprimer {file_to_delete.name} : {e}")
             
+            remove_thumbnails(PREPARED_SOURCE_DIR, basename)
             backup_dir = PREPARED_SOURCE_DIR.parent.parent / '.backups' / source_type
             if backup_dir.exists():
                 for backup_file_to_delete in backup_dir.glob(f"{basename}*"):
@@ -443,7 +1077,14 @@ def prepare_all_photos_with_progress(screen_width=None, screen_height=None, sour
     # Determine files to prepare (new ones)
     basenames_to_prepare = source_basenames - prepared_basenames
     files_to_prepare = [f for f, basename in source_files.items() if basename in basenames_to_prepare]
-    total = len(files_to_prepare)
+
+    prep_config = load_config()
+    # Versions pan/zoom manquantes ou à un autre facteur de zoom (les nouvelles photos ont la leur)
+    pan_zoom_tasks = []
+    pan_zoom_factor = get_pan_zoom_factor(prep_config)
+    if pan_zoom_factor:
+        pan_zoom_tasks = _build_pan_zoom_tasks(source_files, prepared_basenames, SOURCE_DIR_FOR_PREP, PREPARED_SOURCE_DIR, actual_output_width, actual_output_height, pan_zoom_factor)
+    total = len(files_to_prepare) + len(pan_zoom_tasks)
     
     if total == 0:
         yield yield_and_log("info", "Aucune nouvelle photo à préparer. Le dossier est à jour.")
@@ -455,72 +1096,65 @@ def prepare_all_photos_with_progress(screen_width=None, screen_height=None, sour
         )
         return
     
+    stats_message = f"Début de la préparation de {len(files_to_prepare)} nouvelles photos..."
+    if pan_zoom_tasks:
+        stats_message += f" ({len(pan_zoom_tasks)} version(s) pan/zoom à régénérer)"
     yield yield_and_log(
         "stats",
-        f"Début de la préparation de {total} nouvelles photos...",
+        stats_message,
         stage="PREPARING_START",
         percent=22,
         extra={"total": total}
     )
     
-    for i, filename in enumerate(files_to_prepare, start=1):
-        # Check for cancellation
-        if CANCEL_FLAG.exists():
-            yield yield_and_log("warning", "Préparation annulée par l'utilisateur.")
-            return
-        
-        src_path = os.path.join(SOURCE_DIR_FOR_PREP, filename)
-        
-        try:
-            base_name, extension = os.path.splitext(filename)
-            current_preview = ""
-            
-            if extension.lower() in VIDEO_EXTENSIONS:
-                # Video processing
-                dest_filename = f"{base_name}.mp4"
-                dest_path = PREPARED_SOURCE_DIR / dest_filename
-                prepare_video(src_path, str(dest_path), actual_output_width, actual_output_height)
-                message_type = "vidéo"
-                current_preview = f"{base_name}_thumbnail.jpg"
+    # Construire la liste des tâches (les légendes sont résolues ici, dans le processus parent)
+    tasks = [
+        _build_prepare_task(filename, SOURCE_DIR_FOR_PREP, PREPARED_SOURCE_DIR, actual_output_width, actual_output_height, source_type, description_map, user_text_map)
+        for filename in files_to_prepare
+    ] + pan_zoom_tasks
+
+    worker_count = min(get_prepare_worker_count(prep_config), total)
+    memory_limit_mb = _get_prepare_memory_limit(prep_config)
+    if worker_count > 1:
+        logger.info(f"Préparation parallèle sur {worker_count} processus (budget {memory_limit_mb} Mo par processus).")
+
+    results = _run_prepare_tasks(tasks, worker_count, memory_limit_mb, get_prepare_video_worker_count(prep_config))
+    try:
+        for i, (task, error) in enumerate(results, start=1):
+            # Check for cancellation
+            if CANCEL_FLAG.exists():
+                yield yield_and_log("warning", "Préparation annulée par l'utilisateur.")
+                return
+
+            filename = task["filename"]
+            if error is not None:
+                yield yield_and_log("warning", f"Erreur lors de la préparation de {filename}: {error}")
+                continue
+            if task["kind"] == "pan_zoom":
+                message_type = "version pan/zoom"
             else:
-                # Image processing
-                dest_filename = f"{base_name}.jpg"
-                dest_path = PREPARED_SOURCE_DIR / dest_filename
-                relative_path_key = f"{source_type}/{dest_filename}"
-                
-                # Modification Sigalou 25/01/2026 - Utilisation des métadonnées du JSON uniquement
-                # Priority 1: User text
-                caption = user_text_map.get(relative_path_key)
-                
-                # Priority 2: Immich description (if no user text)
-                if caption is None:
-                    immich_data = description_map.get(filename)
-                    if immich_data and isinstance(immich_data, dict):
-                        caption = immich_data.get("description")
-                    elif isinstance(immich_data, str):
-                        caption = immich_data  # Backward compatibility
-                # Fin Modification Sigalou 25/01/2026
-                
-                prepare_photo(src_path, str(dest_path), actual_output_width, actual_output_height, source_type=source_type, caption=caption)
-                message_type = "photo"
-                current_preview = f"{base_name}.jpg"
-            
+                index_media(source_type, os.path.basename(task["dest_path"]))
+                message_type = "vidéo" if task["kind"] == "video" else "photo"
+
             if i == 1:
                 percent = 25  # Modif Sigalou, Début boucle après cleaning 21%
             else:
                 percent = 25 + int(((i - 1) / total) * 75)  # Modif Sigalou 25 à 100%
-            
+
             yield yield_and_log(
                 "progress",
                 f"Nouveau média préparé ({message_type}) : {filename} ({i}/{total})",
                 stage="PREPARING_PHOTO",
                 percent=percent,
-                extra={"current": i, "total": total, "current_photo_path": current_preview}
+                extra={"current": i, "total": total, "current_photo_path": task["preview"]}
             )
-        
-        except Exception as e:
-            yield yield_and_log("warning", f"Erreur lors de la préparation de {filename}: {e}")
-    
+    finally:
+        results.close()
+
+    if CANCEL_FLAG.exists():
+        yield yield_and_log("warning", "Préparation annulée par l'utilisateur.")
+        return
+
     yield yield_and_log(
         "done",
         "Préparation des nouvelles photos terminée.",
@@ -528,6 +1162,48 @@ def prepare_all_photos_with_progress(screen_width=None, screen_height=None, sour
         percent=100
     )
 
+def refresh_pan_zoom_masters(screen_width=None, screen_height=None):
+    """
+    Régénère, pour toutes les sources, les versions pan/zoom absentes ou générées pour un autre
+    facteur de zoom (appelée après un changement du facteur dans la configuration).
+    Retourne le nombre de versions générées.
+    """
+    config = load_config()
+    zoom_factor = get_pan_zoom_factor(config)
+    if not zoom_factor:
+        return 0
+    width = screen_width if screen_width is not None else DEFAULT_OUTPUT_WIDTH
+    height = screen_height if screen_height is not None else DEFAULT_OUTPUT_HEIGHT
+
+    prepared_root = Path("static") / "prepared"
+    if not prepared_root.is_dir():
+        return 0
+    tasks = []
+    for prepared_dir in sorted(d for d in prepared_root.iterdir() if d.is_dir()):
+        source_dir = Path(SOURCE_DIR) / prepared_dir.name
+        if not source_dir.is_dir():
+            continue
+        source_files = {f: os.path.splitext(f)[0] for f in os.listdir(source_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.heic', '.heif'))}
+        prepared_basenames = {basename for basename in source_files.values() if (prepared_dir / f"{basename}.jpg").is_file()}
+        tasks += _build_pan_zoom_tasks(source_files, prepared_basenames, source_dir, prepared_dir, width, height, zoom_factor)
+    if not tasks:
+        return 0
+
+    worker_count = min(get_prepare_worker_count(config), len(tasks))
+    logger.info(f"Régénération de {len(tasks)} version(s) pan/zoom (facteur {zoom_factor}).")
+    generated = 0
+    results = _run_prepare_tasks(tasks, worker_count, _get_prepare_memory_limit(config))
+    try:
+        for task, error in results:
+            if error is not None:
+                logger.warning(f"Version pan/zoom de {task['filename']} non générée : {error}")
+            else:
+                generated += 1
+    finally:
+        results.close()
+    logger.info(f"{generated} version(s) pan/zoom régénérée(s).")
+    return generated
+
 def prepare_all_photos(status_callback=None):
     """Version originale avec callback pour compatibilité"""
     for update in prepare_all_photos_with_progress():
@@ -0,0 +1,87 @@
+# Télémétrie du rendu du diaporama.
+#
+# Chaque phase (décodage, mise à l'échelle, conversion en surface, overlay, flip, frame de transition,
+# frame de pan/zoom) garde ses dernières durées dans une fenêtre glissante ; les percentiles sont
+# calculés à la demande. Les intervalles renvoyés par clock.tick() révèlent les frames perdues :
+# un intervalle de 50 ms à 60 FPS compte pour deux frames manquées.
+import time
+import threading
+import collections
+from contextlib import contextmanager
+
+PHASES = ("decode", "scale", "convert", "overlay", "flip", "transition_frame", "pan_zoom_frame")
+# Nombre de mesures conservées par phase (environ 10 s de frames à 60 FPS)
+WINDOW_SIZE = 600
+# Un intervalle au-delà de 1,5 budget compte comme au moins une frame perdue (gigue normale de clock.tick)
+DROP_TOLERANCE = 1.5
+# Au-delà, l'intervalle correspond à une pause ou à un chargement, pas à des frames perdues
+MAX_FRAME_INTERVAL_MS = 1000
+
+def _percentile(sorted_values, percent):
+    index = int(round(percent / 100 * (len(sorted_values) - 1)))
+    return sorted_values[min(len(sorted_values) - 1, index)]
+
+class RenderTelemetry:
+    """Mesures du rendu. Utilisable depuis plusieurs threads (le décodage a lieu dans le pré-chargement)."""
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self._samples = {phase: collections.deque(maxlen=window_size) for phase in PHASES}
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.dropped_frames = 0
+
+    def record(self, phase, seconds):
+        with self._lock:
+            self._samples[phase].append(seconds)
+
+    @contextmanager
+    def measure(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start)
+
+    def frame_interval(self, interval_ms, fps):
+        """À appeler avec le retour de clock.tick(fps) : compte les frames que cet intervalle a fait manquer."""
+        if interval_ms > MAX_FRAME_INTERVAL_MS:
+            return
+        budget_ms = 1000.0 / fps
+        with self._lock:
+            self.frames += 1
+            if interval_ms > budget_ms * DROP_TOLERANCE:
+                self.dropped_frames += max(1, round(interval_ms / budget_ms) - 1)
+
+    def snapshot(self):
+        """Percentiles (en ms) par phase mesurée et compteurs de frames, prêts à être sérialisés en JSON."""
+        with self._lock:
+            samples = {phase: sorted(values) for phase, values in self._samples.items() if values}
+            frames, dropped = self.frames, self.dropped_frames
+        phases = {}
+        for phase, values in samples.items():
+            phases[phase] = {
+                "count": len(values),
+                "p50": round(_percentile(values, 50) * 1000, 1),
+                "p95": round(_percentile(values, 95) * 1000, 1),
+                "p99": round(_percentile(values, 99) * 1000, 1),
+                "max": round(values[-1] * 1000, 1),
+            }
+        return {"phases": phases, "frames": frames, "dropped_frames": dropped}
+
+    def hud_lines(self):
+        """Lignes courtes pour l'affichage de débogage à l'écran."""
+        snapshot = self.snapshot()
+        phases = snapshot["phases"]
+
+        def p95(phase):
+            return f"{phases[phase]['p95']:.1f}" if phase in phases else "-"
+
+        def p50(phase):
+            return f"{phases[phase]['p50']:.0f}" if phase in phases else "-"
+
+        return [
+            f"frame p95 {p95('pan_zoom_frame')} ms | transition p95 {p95('transition_frame')} ms",
+            f"overlay p95 {p95('overlay')} ms | flip p95 {p95('flip')} ms | conversion p95 {p95('convert')} ms",
+            f"décodage p50 {p50('decode')} ms | redim. p50 {p50('scale')} ms",
+            f"frames perdues {snapshot['dropped_frames']} / {snapshot['frames']}",
+        ]
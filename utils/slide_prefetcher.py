@@ -0,0 +1,224 @@
+# Pré-chargement des prochaines diapositives du diaporama.
+#
+# Un thread décode, convertit en RGB et pré-redimensionne (image de transition et image agrandie
+# du pan/zoom, lue dans la version pan/zoom préparée quand elle existe) les N prochaines entrées
+# de la playlist pendant que la diapositive courante est affichée. Le thread ne manipule que du PIL et des octets : les surfaces Pygame sont créées par
+# le thread principal, seul autorisé à toucher à l'affichage.
+import os
+import time
+import logging
+import threading
+import collections
+from PIL import Image
+from utils.pan_zoom_master import pan_zoom_size, open_pan_zoom_master
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+PrefetchedSlide = collections.namedtuple(
+    "PrefetchedSlide",
+    ["path", "image", "base_bytes", "fit_size", "fit_bytes", "zoom_size", "zoom_bytes", "nbytes"],
+)
+
+def _slide_key(path, zoom_factor):
+    """Clé d'une diapositive : un fichier modifié ou un autre facteur de zoom invalide l'entrée."""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    return (path, mtime_ns, zoom_factor)
+
+def load_slide(path, screen_width, screen_height, zoom_factor=None, telemetry=None):
+    """
+    Décode une image et calcule tout ce dont l'affichage a besoin.
+    zoom_factor vaut None si le pan/zoom est désactivé (pas d'image agrandie).
+    telemetry (RenderTelemetry, optionnel) reçoit les durées de décodage et de redimensionnement.
+    """
+    start = time.perf_counter()
+    with Image.open(path) as img:
+        image = img.convert('RGB') if img.mode != 'RGB' else img.copy()
+    base_bytes = image.tobytes()
+    scale_start = time.perf_counter()
+
+    # Image ajustée à l'écran pour les transitions (identique à la base pour une image préparée)
+    fit_size, fit_bytes = image.size, base_bytes
+    if image.width > screen_width or image.height > screen_height:
+        fit_image = image.copy()
+        fit_image.thumbnail((screen_width, screen_height), Image.Resampling.LANCZOS)
+        fit_size, fit_bytes = fit_image.size, fit_image.tobytes()
+
+    zoom_size, zoom_bytes = None, None
+    if zoom_factor:
+        zoom_size = pan_zoom_size(screen_width, screen_height, zoom_factor)
+        zoom_image = open_pan_zoom_master(path, zoom_size)
+        if zoom_image is None:
+            zoom_image = image.resize(zoom_size, Image.Resampling.LANCZOS)
+        zoom_bytes = zoom_image.tobytes()
+
+    if telemetry is not None:
+        telemetry.record("decode", scale_start - start)
+        telemetry.record("scale", time.perf_counter() - scale_start)
+
+    nbytes = len(base_bytes) * 2 + (len(fit_bytes) if fit_bytes is not base_bytes else 0) + len(zoom_bytes or b"")
+    return PrefetchedSlide(path, image, base_bytes, fit_size, fit_bytes, zoom_size, zoom_bytes, nbytes)
+
+def _estimate_nbytes(path, screen_width, screen_height, zoom_factor):
+    """Estime la mémoire d'une diapositive à partir de l'en-tête, sans décoder l'image."""
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+    except Exception:
+        return 0
+    estimate = width * height * 3 * 2
+    if width > screen_width or height > screen_height:
+        estimate += screen_width * screen_height * 3
+    if zoom_factor:
+        zoom_width, zoom_height = pan_zoom_size(screen_width, screen_height, zoom_factor)
+        estimate += zoom_width * zoom_height * 3
+    return estimate
+
+class SlidePrefetcher:
+    """
+    Charge en arrière-plan les prochaines diapositives dans la limite d'un budget mémoire.
+    schedule() donne la liste ordonnée des chemins attendus : toute entrée absente de cette liste
+    (navigation suivant/précédent, nouvelle playlist, zoom modifié) est abandonnée.
+    """
+
+    def __init__(self, screen_width, screen_height, max_items=2, memory_budget_mb=96, telemetry=None):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.max_items = max(0, int(max_items))
+        self.memory_budget = max(0, int(memory_budget_mb)) * 1024 * 1024
+        self.telemetry = telemetry
+        self._cond = threading.Condition()
+        self._wanted = []          # clés attendues, par priorité
+        self._ready = {}           # clé -> PrefetchedSlide
+        self._in_progress = None   # clé en cours de décodage
+        self._estimates = {}       # clé -> mémoire estimée, lue hors verrou
+        self._stopped = False
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.max_items > 0 and self.memory_budget > 0
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="slide-prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._ready.clear()
+            self._wanted = []
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def configure(self, max_items, memory_budget_mb):
+        """Applique de nouvelles limites (configuration modifiée) sans reconstruire le pré-chargement."""
+        with self._cond:
+            self.max_items = max(0, int(max_items))
+            self.memory_budget = max(0, int(memory_budget_mb)) * 1024 * 1024
+            if not self.enabled:
+                self._wanted = []
+                self._ready.clear()
+            self._cond.notify_all()
+        self.start()
+
+    def schedule(self, paths, zoom_factor=None):
+        """Définit les prochaines diapositives à préparer (les vidéos sont ignorées)."""
+        if not self.enabled:
+            return
+        wanted = []
+        for path in paths:
+            if len(wanted) >= self.max_items:
+                break
+            if not str(path).lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            key = _slide_key(str(path), zoom_factor)
+            if key is not None and key not in wanted:
+                wanted.append(key)
+        with self._cond:
+            self._wanted = wanted
+            self._estimates = {key: nbytes for key, nbytes in self._estimates.items() if key in wanted}
+            for key in list(self._ready):
+                if key not in wanted:
+                    del self._ready[key]
+            self._cond.notify_all()
+
+    def take(self, path, zoom_factor=None, timeout=5.0):
+        """
+        Retourne la diapositive pré-chargée pour ce chemin (et la retire du cache), ou None.
+        Si elle est en cours de décodage, on attend la fin plutôt que de la décoder une seconde fois.
+        """
+        if not self.enabled:
+            return None
+        key = _slide_key(str(path), zoom_factor)
+        if key is None:
+            return None
+        with self._cond:
+            self._cond.wait_for(lambda: self._stopped or self._in_progress != key, timeout=timeout)
+            slide = self._ready.pop(key, None)
+            if key in self._wanted:
+                self._wanted.remove(key)
+            self._cond.notify_all()
+        return slide
+
+    def _used_bytes(self):
+        return sum(slide.nbytes for slide in self._ready.values())
+
+    def _next_key(self):
+        """Prochaine clé à décoder, ou None si tout est prêt ou si le budget mémoire est atteint."""
+        for key in self._wanted:
+            if key in self._ready:
+                continue
+            return key
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                key = None
+                estimate = None
+                while not self._stopped:
+                    key = self._next_key()
+                    if key is not None:
+                        estimate = self._estimates.get(key)
+                        if estimate is None:
+                            break
+                        # Une diapositive seule passe toujours, sinon le budget bloquerait tout pré-chargement
+                        if not self._ready or self._used_bytes() + estimate <= self.memory_budget:
+                            break
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                if estimate is not None:
+                    self._in_progress = key
+
+            if estimate is None:
+                # Lecture de l'en-tête hors verrou : take()/schedule() du thread d'affichage n'attendent pas la carte SD
+                estimate = _estimate_nbytes(key[0], self.screen_width, self.screen_height, key[2])
+                with self._cond:
+                    if key in self._wanted:
+                        self._estimates[key] = estimate
+                continue
+
+            slide = None
+            try:
+                slide = load_slide(key[0], self.screen_width, self.screen_height, key[2], telemetry=self.telemetry)
+            except Exception as e:
+                logger.warning(f"[Prefetch] Impossible de pré-charger {key[0]} : {e}")
+
+            with self._cond:
+                self._in_progress = None
+                if slide is not None and key in self._wanted and not self._stopped:
+                    self._ready[key] = slide
+                elif key in self._wanted:
+                    # Échec : on laisse le thread principal charger (et journaliser) l'image lui-même
+                    self._wanted.remove(key)
+                self._cond.notify_all()
@@ -0,0 +1,281 @@
+# Canal de contrôle entre l'application web et le diaporama (socket Unix).
+#
+# Protocole : une ligne JSON par message.
+# - Commande du client : {"cmd": "next" | "prev" | "pause" | "play_playlist" | "jump" | "reload" | "status", ...}
+#   Réponse du diaporama : {"ok": true, "state": {...}} ou {"ok": false, "error": "..."}
+# - {"cmd": "subscribe"} garde la connexion ouverte : le diaporama y pousse l'état courant puis
+#   chaque événement ({"event": "now_showing" | "status", "state": {...}}).
+# Les commandes sont traitées dans le thread du canal ; l'affichage est réveillé immédiatement
+# au lieu d'attendre son prochain tour de boucle. Dans l'autre sens, publish() ne fait que déposer
+# l'événement dans la file de chaque abonné : c'est le thread du canal qui écrit sur les sockets
+# (non bloquantes), et un abonné dont la file déborde est abandonné. Un client lent ne peut donc
+# jamais retarder l'affichage.
+import os
+import json
+import socket
+import select
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = "/tmp/pimmich_slideshow.sock"
+COMMANDS = {"next", "prev", "pause", "play_playlist", "jump", "reload", "status"}
+MAX_LINE_BYTES = 1024 * 1024  # Une playlist de plusieurs milliers de chemins tient largement
+MAX_PENDING_BYTES = 256 * 1024  # File d'un abonné au-delà de laquelle il est jugé bloqué
+
+class SlideshowChannelServer:
+    """
+    Côté diaporama. on_command(message) applique une commande (hors "status" et "subscribe")
+    et peut lever ValueError pour une commande invalide.
+    """
+
+    def __init__(self, on_command, socket_path=SOCKET_PATH):
+        self.socket_path = socket_path
+        self.on_command = on_command
+        self.state = {}
+        self._status_fields = {}  # Champs renvoyés par "status" mais jamais poussés (ex: télémétrie)
+        self._lock = threading.Lock()
+        self._subscribers = {}  # socket -> octets en attente d'envoi
+        self._server = None
+        self._wakeup_r, self._wakeup_w = None, None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        self._server.listen(8)
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_w.setblocking(False)
+        self._thread = threading.Thread(target=self._run, name="slideshow-channel", daemon=True)
+        self._thread.start()
+        logger.info(f"[Channel] Canal de contrôle ouvert sur {self.socket_path}.")
+
+    def stop(self):
+        self._stop.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        with self._lock:
+            for conn in self._subscribers:
+                conn.close()
+            self._subscribers = {}
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if self._wakeup_r is not None:
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+            self._wakeup_r, self._wakeup_w = None, None
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+    def set_state(self, **fields):
+        """Met à jour des champs renvoyés seulement par "status", jamais poussés aux abonnés (données volumineuses ou fréquentes)."""
+        with self._lock:
+            self._status_fields.update(fields)
+
+    def publish(self, event, **fields):
+        """Met à jour l'état partagé et le met en file pour chaque abonné ; l'envoi est fait par le thread du canal."""
+        with self._lock:
+            self.state.update(fields)
+            if not self._subscribers:
+                return
+            payload = self._event_payload(event)
+            for pending in self._subscribers.values():
+                pending += payload
+        self._wake()
+
+    def _event_payload(self, event):
+        return (json.dumps({"event": event, "state": self.state}, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def _wake(self):
+        try:
+            self._wakeup_w.send(b"\0")
+        except (OSError, AttributeError):
+            pass  # Canal arrêté, ou réveil déjà en attente
+
+    def _drop_subscriber(self, conn):
+        with self._lock:
+            self._subscribers.pop(conn, None)
+        conn.close()
+
+    def _flush_subscriber(self, conn):
+        """Envoie ce que la socket accepte sans bloquer ; abandonne l'abonné déconnecté."""
+        with self._lock:
+            pending = self._subscribers.get(conn)
+            if pending is None:
+                return
+            try:
+                del pending[:conn.send(pending)]
+                return
+            except BlockingIOError:
+                return
+            except OSError:
+                pass
+        logger.info("[Channel] Abonné déconnecté, abandonné.")
+        self._drop_subscriber(conn)
+
+    def _run(self):
+        connections = {}  # socket -> tampon de lecture
+        while not self._stop.is_set():
+            with self._lock:
+                overloaded = [conn for conn, pending in self._subscribers.items() if len(pending) > MAX_PENDING_BYTES]
+            for conn in overloaded:
+                logger.info("[Channel] Abonné trop lent, abandonné.")
+                self._drop_subscriber(conn)
+            with self._lock:
+                subscribers = list(self._subscribers)
+                writable = [conn for conn in subscribers if self._subscribers[conn]]
+            try:
+                readable, writable, _ = select.select([self._server, self._wakeup_r, *connections, *subscribers], writable, [], 0.5)
+            except (OSError, ValueError):
+                return
+            for sock in readable:
+                if sock is self._server:
+                    conn, _ = self._server.accept()
+                    connections[conn] = b""
+                    continue
+                if sock is self._wakeup_r:
+                    try:
+                        sock.recv(4096)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    data = sock.recv(65536)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b""
+                if sock in subscribers:
+                    # Un abonné n'envoie plus rien : seule la fermeture de la connexion compte
+                    if not data:
+                        self._drop_subscriber(sock)
+                    continue
+                if not data or len(connections[sock]) + len(data) > MAX_LINE_BYTES:
+                    del connections[sock]
+                    sock.close()
+                    continue
+                buffer = connections[sock] + data
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    if self._handle_line(sock, line):
+                        # Abonné : la connexion ne sert plus qu'aux événements
+                        connections.pop(sock, None)
+                        break
+                else:
+                    connections[sock] = buffer
+            for conn in writable:
+                self._flush_subscriber(conn)
+        for conn in connections:
+            conn.close()
+
+    def _handle_line(self, conn, line):
+        """Traite une commande. Retourne True si la connexion devient un abonnement."""
+        try:
+            message = json.loads(line)
+            command = message.get("cmd")
+        except (ValueError, AttributeError):
+            self._reply(conn, {"ok": False, "error": "Message JSON invalide."})
+            return False
+
+        if command == "subscribe":
+            # Écritures non bloquantes : l'état courant part avec le prochain passage du thread du canal
+            conn.setblocking(False)
+            with self._lock:
+                self._subscribers[conn] = bytearray(self._event_payload("status"))
+            return True
+        if command not in COMMANDS:
+            self._reply(conn, {"ok": False, "error": f"Commande inconnue : {command}"})
+            return False
+        try:
+            if command != "status":
+                self.on_command(message)
+        except ValueError as e:
+            self._reply(conn, {"ok": False, "error": str(e)})
+            return False
+        except Exception as e:
+            logger.error(f"[Channel] Erreur lors de la commande {command} : {e}")
+            self._reply(conn, {"ok": False, "error": str(e)})
+            return False
+        with self._lock:
+            state = {**self.state, **self._status_fields} if command == "status" else self.state
+            payload = (json.dumps({"ok": True, "state": state}, ensure_ascii=False) + "\n").encode("utf-8")
+        try:
+            conn.sendall(payload)
+        except OSError:
+            pass
+        return False
+
+    @staticmethod
+    def _reply(conn, payload):
+        try:
+            conn.sendall((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+        except OSError:
+            pass
+
+def _read_line(sock, buffer=b""):
+    while b"\n" not in buffer:
+        data = sock.recv(65536)
+        if not data:
+            raise ConnectionError("Connexion fermée par le diaporama.")
+        buffer += data
+    line, buffer = buffer.split(b"\n", 1)
+    return json.loads(line), buffer
+
+def send_command(cmd, timeout=1.0, socket_path=SOCKET_PATH, **fields):
+    """
+    Côté application : envoie une commande et retourne la réponse du diaporama,
+    ou None si le canal est injoignable (diaporama arrêté ou d'une version sans canal).
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall((json.dumps({"cmd": cmd, **fields}, ensure_ascii=False) + "\n").encode("utf-8"))
+            response, _ = _read_line(sock)
+            return response
+    except (OSError, ConnectionError, ValueError):
+        return None
+
+def subscribe_events(timeout=15.0, socket_path=SOCKET_PATH):
+    """
+    Côté application : générateur des événements poussés par le diaporama.
+    Produit None à chaque délai sans événement (pour envoyer un keep-alive) et s'arrête si le canal se ferme.
+    """
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+    except OSError:
+        return
+    try:
+        sock.sendall(b'{"cmd": "subscribe"}\n')
+        sock.settimeout(timeout)
+        buffer = b""
+        while True:
+            if b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                yield json.loads(line)
+                continue
+            try:
+                data = sock.recv(65536)
+            except socket.timeout:
+                yield None
+                continue
+            if not data:
+                return
+            buffer += data
+    except (OSError, ConnectionError, ValueError):
+        return
+    finally:
+        sock.close()
@@ -0,0 +1,107 @@
+# Fabrique de surfaces Pygame pour le rendu du diaporama.
+#
+# Les octets RGB produits par le pré-chargement sont exposés à Pygame sans copie (frombuffer) ;
+# les surfaces au format de l'écran (image de transition, image agrandie du pan/zoom, overlay,
+# capture de la diapositive précédente) sont réutilisées d'une diapositive à l'autre au lieu
+# d'être allouées puis converties à chaque fois. Les allocations sont comptées par diapositive
+# pour mesurer le gain.
+import logging
+import pygame
+
+logger = logging.getLogger(__name__)
+
+# Surfaces libres conservées par taille (transition + pan/zoom + capture suffisent en pratique)
+MAX_POOLED_PER_KEY = 2
+
+class SurfaceFactory:
+    """
+    À créer après pygame.display.set_mode() : les surfaces du pool sont au format de l'écran,
+    ce qui évite toute conversion de pixels au moment du blit.
+    """
+
+    def __init__(self):
+        self._pool = {}  # (largeur, hauteur, alpha) -> surfaces libres
+        self._slide = self._empty_stats()
+        self._totals = self._empty_stats()
+        self.slides = 0
+
+    @staticmethod
+    def _empty_stats():
+        return {"allocated": 0, "allocated_bytes": 0, "reused": 0, "views": 0}
+
+    def _count(self, field, amount=1):
+        self._slide[field] += amount
+        self._totals[field] += amount
+
+    # --- Surfaces partagées ---
+    def wrap(self, data, size):
+        """
+        Surface 24 bits qui lit directement les octets RGB fournis (aucune copie).
+        L'appelant garde `data` en vie tant que la surface est utilisée.
+        """
+        self._count("views")
+        return pygame.image.frombuffer(data, size, 'RGB')
+
+    def acquire(self, size, alpha=False):
+        """Surface au format de l'écran, reprise du pool si possible. Son contenu est indéfini."""
+        key = (size[0], size[1], alpha)
+        free = self._pool.get(key)
+        if free:
+            surface = free.pop()
+            surface.set_alpha(None)
+            self._count("reused")
+            return surface
+        if alpha:
+            surface = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+        else:
+            surface = pygame.Surface(size).convert()
+        self._count("allocated")
+        self._count("allocated_bytes", size[0] * size[1] * surface.get_bytesize())
+        return surface
+
+    def release(self, surface):
+        """Rend une surface au pool (ignorée si le pool de cette taille est plein)."""
+        if surface is None:
+            return
+        key = (surface.get_width(), surface.get_height(), bool(surface.get_flags() & pygame.SRCALPHA))
+        free = self._pool.setdefault(key, [])
+        if len(free) < MAX_POOLED_PER_KEY and all(s is not surface for s in free):
+            free.append(surface)
+
+    def from_buffer(self, data, size):
+        """Surface au format de l'écran remplie depuis des octets RGB : une seule conversion, dans une mémoire réutilisée."""
+        surface = self.acquire(size)
+        surface.blit(self.wrap(data, size), (0, 0))
+        return surface
+
+    def snapshot(self, screen, previous=None):
+        """Capture l'écran, en réécrivant la capture précédente plutôt qu'en allouant une copie."""
+        if previous is None or previous.get_size() != screen.get_size():
+            self.release(previous)
+            previous = self.acquire(screen.get_size())
+        previous.blit(screen, (0, 0))
+        return previous
+
+    # --- Suivi des allocations ---
+    def begin_slide(self):
+        """Clôt les compteurs de la diapositive précédente (journalisés) et démarre ceux de la suivante."""
+        if self.slides:
+            stats = self._slide
+            logger.debug(
+                f"[Surfaces] Diapositive {self.slides} : {stats['allocated']} surface(s) allouée(s) "
+                f"({stats['allocated_bytes'] / (1024 * 1024):.1f} Mo), {stats['reused']} réutilisée(s), "
+                f"{stats['views']} vue(s) sans copie."
+            )
+        self.slides += 1
+        self._slide = self._empty_stats()
+
+    @property
+    def totals(self):
+        return dict(self._totals, slides=self.slides)
+
+    def log_summary(self):
+        totals = self._totals
+        logger.info(
+            f"[Surfaces] {self.slides} diapositives : {totals['allocated']} surface(s) allouée(s) "
+            f"({totals['allocated_bytes'] / (1024 * 1024):.1f} Mo), {totals['reused']} réutilisation(s)."
+        )
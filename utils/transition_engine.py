@@ -0,0 +1,213 @@
+# Moteur de transitions du diaporama.
+#
+# La progression d'une transition dépend du temps écoulé et non du numéro de frame : elle se termine
+# toujours en `duration` secondes, une frame en retard est simplement sautée. Le temps de rendu de
+# chaque frame est mesuré ; s'il dépasse le budget (1/fps), le rendu passe à une résolution réduite,
+# agrandie ensuite à l'écran, et remonte d'un cran à la transition suivante quand la marge le permet.
+# Les effets dessinent dans un canevas à la résolution courante à partir de surfaces préparées une
+# seule fois par résolution (ancienne et nouvelle image réduites, surface de travail, blocs du fondu
+# en mosaïque).
+import time
+import random
+import logging
+import pygame
+
+logger = logging.getLogger(__name__)
+
+# Résolutions de rendu successives (fraction de la taille de l'écran)
+RENDER_SCALES = (1.0, 0.75, 0.5, 0.35)
+# Temps de rendu moyen (en fraction du budget) au-delà duquel la résolution est réduite
+OVER_BUDGET_RATIO = 1.15
+# Marge nécessaire pour remonter d'un cran à la transition suivante
+RECOVERY_RATIO = 0.5
+# Frames observées avant de juger une résolution (évite de réagir à un pic isolé)
+MIN_FRAMES_PER_SCALE = 3
+# Taille des blocs du fondu en mosaïque, en pixels à pleine résolution
+DISSOLVE_BLOCK = 40
+# Agrandissement atteint par l'ancienne image (et de départ de la nouvelle) pour le zoom traversant
+ZOOM_THROUGH_FACTOR = 1.3
+
+def _slide_offset(direction, size, remaining):
+    """Décalage de la nouvelle image pour un glissement : `remaining` vaut 1 au début, 0 à la fin."""
+    width, height = size
+    if direction == "left":
+        return int(width * remaining), 0    # Arrive par la droite, glisse vers la gauche
+    if direction == "right":
+        return int(-width * remaining), 0   # Arrive par la gauche, glisse vers la droite
+    if direction == "up":
+        return 0, int(height * remaining)   # Arrive par le bas, glisse vers le haut
+    return 0, int(-height * remaining)      # "down" : arrive par le haut, glisse vers le bas
+
+def _centered_rect(size, fraction):
+    """Rectangle centré couvrant `fraction` de la surface (recadrage pour un zoom)."""
+    width, height = size
+    crop_w, crop_h = max(1, int(width * fraction)), max(1, int(height * fraction))
+    return pygame.Rect((width - crop_w) // 2, (height - crop_h) // 2, crop_w, crop_h)
+
+# --- Effets : dessinent la frame `progress` (0 -> 1) dans `canvas` à partir des surfaces de `target` ---
+
+def _fade(target, canvas, progress):
+    canvas.blit(target.old, (0, 0))
+    target.new.set_alpha(int(255 * progress))
+    canvas.blit(target.new, (0, 0))
+
+def _slide(direction):
+    def effect(target, canvas, progress):
+        canvas.blit(target.old, (0, 0))
+        canvas.blit(target.new, _slide_offset(direction, target.size, 1 - progress))
+    return effect
+
+def _push(direction):
+    def effect(target, canvas, progress):
+        new_x, new_y = _slide_offset(direction, target.size, 1 - progress)
+        full_x, full_y = _slide_offset(direction, target.size, 1)
+        # L'ancienne image est poussée hors de l'écran, collée à la nouvelle
+        canvas.blit(target.old, (new_x - full_x, new_y - full_y))
+        canvas.blit(target.new, (new_x, new_y))
+    return effect
+
+def _dissolve(target, canvas, progress):
+    blocks = target.dissolve_blocks()
+    canvas.blit(target.old, (0, 0))
+    canvas.blits(blocks[:int(len(blocks) * progress)], doreturn=False)
+
+def _zoom_through(target, canvas, progress):
+    # L'ancienne image grossit comme si l'on passait au travers...
+    old_zoom = 1 + (ZOOM_THROUGH_FACTOR - 1) * progress
+    pygame.transform.scale(target.old.subsurface(_centered_rect(target.size, 1 / old_zoom)), target.size, canvas)
+    # ...pendant que la nouvelle, d'abord agrandie, se pose à sa taille en apparaissant
+    new_zoom = ZOOM_THROUGH_FACTOR - (ZOOM_THROUGH_FACTOR - 1) * progress
+    scratch = target.scratch()
+    pygame.transform.scale(target.new.subsurface(_centered_rect(target.size, 1 / new_zoom)), target.size, scratch)
+    scratch.set_alpha(int(255 * progress))
+    canvas.blit(scratch, (0, 0))
+
+EFFECTS = {
+    "fade": _fade,
+    "dissolve": _dissolve,
+    "zoom_through": _zoom_through,
+    **{f"slide_{d}": _slide(d) for d in ("left", "right", "up", "down")},
+    **{f"push_{d}": _push(d) for d in ("left", "right", "up", "down")},
+}
+
+class _RenderTarget:
+    """Surfaces d'une transition à une résolution donnée (l'écran lui-même à pleine résolution)."""
+
+    def __init__(self, engine, screen, old_surface, new_surface, scale):
+        self._engine = engine
+        self.scale = scale
+        screen_w, screen_h = screen.get_size()
+        if scale >= 1.0:
+            self.size = (screen_w, screen_h)
+            self.canvas = None  # Dessin direct à l'écran
+            self.old, self.new = old_surface, new_surface
+        else:
+            self.size = (max(1, int(screen_w * scale)), max(1, int(screen_h * scale)))
+            self.canvas = engine._surface("canvas", self.size)
+            self.old = engine._surface("old", self.size)
+            self.new = engine._surface("new", self.size)
+            pygame.transform.scale(old_surface, self.size, self.old)
+            pygame.transform.scale(new_surface, self.size, self.new)
+        self.new.set_alpha(None)
+        self._blocks = None
+
+    def scratch(self):
+        return self._engine._surface("scratch", self.size)
+
+    def dissolve_blocks(self):
+        """Blocs de la nouvelle image dans un ordre aléatoire, prêts pour Surface.blits()."""
+        if self._blocks is None:
+            block = max(4, int(DISSOLVE_BLOCK * self.scale))
+            width, height = self.size
+            rects = [pygame.Rect(x, y, block, block) for y in range(0, height, block) for x in range(0, width, block)]
+            random.shuffle(rects)
+            self._blocks = [(self.new, rect.topleft, rect) for rect in rects]
+        return self._blocks
+
+class TransitionEngine:
+    """
+    Joue les transitions dans un budget de temps par frame. Conserve d'une transition à l'autre
+    la résolution de rendu retenue et les surfaces réduites (allouées une fois par résolution).
+    """
+
+    def __init__(self, initial_scale=1.0, telemetry=None):
+        self.telemetry = telemetry
+        self._level = min(range(len(RENDER_SCALES)), key=lambda i: abs(RENDER_SCALES[i] - initial_scale))
+        self._last_frame_time = None
+        self._last_budget = None
+        self._surfaces = {}
+        self.last_stats = None
+
+    def _surface(self, name, size):
+        key = (name, size)
+        surface = self._surfaces.get(key)
+        if surface is None:
+            surface = pygame.Surface(size).convert()
+            self._surfaces[key] = surface
+        return surface
+
+    def run(self, screen, old_surface, new_surface, overlay_surface, transition_type, duration, fps):
+        """
+        Joue la transition vers new_surface (au format de l'écran), overlay par-dessus à pleine résolution.
+        La dernière frame n'est pas dessinée : l'appelant affiche l'image finale nette.
+        """
+        effect = EFFECTS.get(transition_type, _fade)
+        budget = 1.0 / fps
+        clock = pygame.time.Clock()
+        start = time.perf_counter()
+
+        # La transition précédente avait de la marge : on retente une résolution plus haute
+        level = self._level
+        if level > 0 and self._last_frame_time is not None and self._last_frame_time < self._last_budget * RECOVERY_RATIO:
+            level -= 1
+        target = _RenderTarget(self, screen, old_surface, new_surface, RENDER_SCALES[level])
+
+        frames = 0
+        downscales = 0
+        average = None
+        frames_at_level = 0
+        while True:
+            progress = (time.perf_counter() - start) / duration
+            if progress >= 1.0:
+                break
+            frame_start = time.perf_counter()
+            effect(target, target.canvas or screen, progress)
+            if target.canvas is not None:
+                pygame.transform.scale(target.canvas, screen.get_size(), screen)
+            screen.blit(overlay_surface, (0, 0))
+            flip_start = time.perf_counter()
+            pygame.display.flip()
+
+            frame_time = time.perf_counter() - frame_start
+            if self.telemetry is not None:
+                self.telemetry.record("flip", frame_time - (flip_start - frame_start))
+                self.telemetry.record("transition_frame", frame_time)
+            average = frame_time if average is None else 0.7 * average + 0.3 * frame_time
+            frames += 1
+            frames_at_level += 1
+            if average > budget * OVER_BUDGET_RATIO and frames_at_level >= MIN_FRAMES_PER_SCALE and level < len(RENDER_SCALES) - 1:
+                level += 1
+                downscales += 1
+                target = _RenderTarget(self, screen, old_surface, new_surface, RENDER_SCALES[level])
+                average = None
+                frames_at_level = 0
+            interval = clock.tick(fps)
+            if self.telemetry is not None and frames > 1: # Le premier intervalle inclut la préparation
+                self.telemetry.frame_interval(interval, fps)
+
+        new_surface.set_alpha(None)
+        self._level = level
+        self._last_frame_time = average
+        self._last_budget = budget
+        self.last_stats = {
+            "frames": frames,
+            "expected_frames": int(duration * fps),
+            "scale": RENDER_SCALES[level],
+            "downscales": downscales,
+            "frame_ms": round(average * 1000, 1) if average is not None else None,
+        }
+        logger.debug(
+            f"[Transition] {transition_type} : {frames}/{self.last_stats['expected_frames']} frames, "
+            f"résolution {RENDER_SCALES[level]:.0%}, {self.last_stats['frame_ms']} ms/frame."
+        )
+        return self.last_stats
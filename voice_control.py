@@ -2,6 +2,7 @@ import os
 import json
 import sys
 import time
+import threading
 import traceback
 from pathlib import Path
 import re
@@ -15,12 +16,16 @@ from vosk import KaldiRecognizer, Model
 from thefuzz import process
 from num2words import num2words
 
-from utils.config_manager import load_config
+from utils.config_manager import load_config, get_config, config_store
 from utils.voice_control_manager import PID_FILE as VOICE_PID_FILE, update_status_file
 
 # --- NOUVEAU: Gestion des sons ---
 sounds = {}
 
+# Réglages chargés au démarrage (modèle de langue, micro, mot-clé) : leur modification relance le service
+RESTART_KEYS = ('voice_control_language', 'voice_control_device_index', 'porcupine_access_key')
+restart_requested = threading.Event()
+
 # --- I18N Command Definitions ---
 COMMANDS = {
     'fr': {
@@ -67,7 +72,7 @@ COMMANDS = {
 
 def play_sound(sound_name):
     """Joue un son préchargé depuis le dictionnaire 'sounds'."""
-    config = load_config()
+    config = get_config()
     volume = int(config.get('notification_sound_volume', 80)) / 100.0 # Convertir % en 0.0-1.0
 
     if sound_name in sounds and sounds[sound_name]:
@@ -304,6 +309,14 @@ def main():
         config = load_config()
         lang = config.get('voice_control_language', 'fr')
         lang_commands = COMMANDS.get(lang, COMMANDS['fr'])
+
+        # Suivre les modifications faites depuis l'interface web (autre processus)
+        startup_settings = {key: config.get(key) for key in RESTART_KEYS}
+        def on_config_change(snapshot):
+            if any(snapshot.get(key) != value for key, value in startup_settings.items()):
+                restart_requested.set()
+        config_store.subscribe(on_config_change)
+        config_store.watch()
         
         # --- NOUVEAU: Initialisation de Pygame et chargement des sons ---
         pygame.mixer.init()
@@ -489,7 +502,7 @@ def main():
             audio_buffer = []
             command_timeout = 0
 
-            while True:
+            while not restart_requested.is_set():
                 # Lire un bloc de données audio
                 pcm_bytes, _ = stream.read(read_frame_length)
 
@@ -563,15 +576,21 @@ def main():
     finally:
         if 'porcupine' in locals() and porcupine:
             porcupine.delete()
-        if os.path.exists(VOICE_PID_FILE):
-            os.remove(VOICE_PID_FILE)
-        print("[Voice] Service arrêté.")
+        if restart_requested.is_set():
+            # Même PID après execv : le fichier PID reste valable pour le gestionnaire
+            print("[Voice] Configuration vocale modifiée, redémarrage du service...")
+        else:
+            if os.path.exists(VOICE_PID_FILE):
+                os.remove(VOICE_PID_FILE)
+            print("[Voice] Service arrêté.")
 
 if __name__ == "__main__":
     try:
         with open(VOICE_PID_FILE, "w") as f:
             f.write(str(os.getpid()))
         main()
+        if restart_requested.is_set():
+            os.execv(sys.executable, [sys.executable] + sys.argv)
     except Exception as e:
         update_status_file({"status": "error", "message": f"Erreur au lancement: {e}"})
         if os.path.exists(VOICE_PID_FILE):